@@ -0,0 +1,69 @@
+"""
+Benchmark: batched bootstrap of the Act 3 correlations vs. worker count
+
+    python bench_bootstrap.py --rows 160000 --resamples 2000 --jobs 1 2 4 8
+
+Also times a naive per-resample loop (np.corrcoef on fancy-indexed copies) on a
+few resamples and extrapolates it, as a baseline for the batched version.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from era_bootstrap import bootstrap_correlations
+
+
+def naive_bootstrap(X, y, n_resamples, seed=42):
+    rng = np.random.default_rng(seed)
+    n = len(y)
+    out = np.empty((n_resamples, X.shape[1]))
+    for b in range(n_resamples):
+        idx = rng.integers(0, n, size=n)
+        Xb, yb = X[idx], y[idx]
+        out[b] = [np.corrcoef(Xb[:, j], yb)[0, 1] for j in range(X.shape[1])]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=160_000)
+    parser.add_argument('--features', type=int, default=9)
+    parser.add_argument('--resamples', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--naive-resamples', type=int, default=20)
+    parser.add_argument('--json', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = rng.random((args.rows, args.features))
+    y = X @ rng.normal(size=args.features) + rng.normal(size=args.rows)
+
+    start = time.perf_counter()
+    naive_bootstrap(X, y, args.naive_resamples)
+    naive_per_resample = (time.perf_counter() - start) / args.naive_resamples
+    print(f"naive loop: {naive_per_resample * 1e3:.1f} ms/resample "
+          f"(~{naive_per_resample * args.resamples:.1f} s for {args.resamples} resamples)")
+
+    results = {'rows': args.rows, 'features': args.features, 'resamples': args.resamples,
+               'naive_seconds_estimate': naive_per_resample * args.resamples, 'batched': []}
+    base = None
+    print(f"{'jobs':>5} {'seconds':>9} {'speedup':>8}")
+    for jobs in args.jobs:
+        start = time.perf_counter()
+        bootstrap_correlations(X, y, args.resamples, args.batch_size, n_jobs=jobs)
+        elapsed = time.perf_counter() - start
+        base = base or elapsed
+        results['batched'].append({'jobs': jobs, 'seconds': elapsed, 'speedup': base / elapsed})
+        print(f"{jobs:>5} {elapsed:9.2f} {base / elapsed:8.2f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark: wall-clock time of the Act 4 k-selection sweep vs. worker count
+
+    python bench_ksweep.py --rows 160000 --k-max 20 --jobs 1 2 4 8 16
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from clustering import sweep_k
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=160_000)
+    parser.add_argument('--features', type=int, default=9)
+    parser.add_argument('--k-max', type=int, default=20)
+    parser.add_argument('--seeds', type=int, default=1)
+    parser.add_argument('--backend', default='kmeans', choices=['kmeans', 'minibatch'])
+    parser.add_argument('--silhouette-sample', type=int, default=5000)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--json', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    # Blobs around 8 centres, standardized like the real features
+    rng = np.random.default_rng(0)
+    centres = rng.normal(scale=3, size=(8, args.features))
+    X = centres[rng.integers(0, 8, args.rows)] + rng.normal(size=(args.rows, args.features))
+    X = (X - X.mean(axis=0)) / X.std(axis=0)
+
+    results = []
+    base = None
+    print(f"{'jobs':>5} {'seconds':>9} {'speedup':>8} {'best k':>7}")
+    for jobs in args.jobs:
+        start = time.perf_counter()
+        _, best_k, _ = sweep_k(X, range(2, args.k_max + 1), seeds=tuple(range(args.seeds)),
+                               backend=args.backend, silhouette_sample=args.silhouette_sample, n_jobs=jobs)
+        elapsed = time.perf_counter() - start
+        base = base or elapsed
+        results.append({'jobs': jobs, 'seconds': elapsed, 'speedup': base / elapsed, 'best_k': best_k})
+        print(f"{jobs:>5} {elapsed:9.2f} {base / elapsed:8.2f} {best_k:>7}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'rows': args.rows, 'k_max': args.k_max, 'backend': args.backend, 'runs': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: Act 4 "songs like this" index - build time, query latency and memory
+
+    python bench_neighbours.py --rows 160000 1000000 --kinds kdtree balltree brute
+
+For each catalogue size (synthetic_data.spotify_tracks) and index kind: build
+time, index size and traced peak memory of the build, save/load time, p50/p99
+latency of single top-k queries and the throughput of one batch query.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from similarity_index import KINDS, SimilarityIndex
+from synthetic_data import spotify_tracks
+
+FEATURES = ['danceability', 'energy', 'acousticness', 'valence', 'speechiness',
+            'instrumentalness', 'liveness', 'loudness', 'tempo']
+
+
+def bench_kind(df, kind, k, queries, batch):
+    tracemalloc.start()
+    index = SimilarityIndex.build(df, FEATURES, kind=kind)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'index.pkl')
+        start = time.perf_counter()
+        index.save(path)
+        save_seconds = time.perf_counter() - start
+        file_mb = os.path.getsize(path) / 1e6
+        start = time.perf_counter()
+        index = SimilarityIndex.load(path)
+        load_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    samples = []
+    for row in rng.integers(0, len(df), queries):
+        start = time.perf_counter()
+        index.neighbours_of([row], k)
+        samples.append((time.perf_counter() - start) * 1e3)
+
+    rows = rng.integers(0, len(df), batch)
+    start = time.perf_counter()
+    index.neighbours_of(rows, k)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        'kind': kind,
+        'build_seconds': index.build_seconds,
+        'index_mb': index.nbytes / 1e6,
+        'build_peak_mb': peak / 1e6,
+        'file_mb': file_mb,
+        'save_seconds': save_seconds,
+        'load_seconds': load_seconds,
+        'query_p50_ms': float(np.percentile(samples, 50)),
+        'query_p99_ms': float(np.percentile(samples, 99)),
+        'batch_queries_per_s': batch / batch_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[160_000, 1_000_000])
+    parser.add_argument('--kinds', nargs='+', default=list(KINDS), choices=list(KINDS))
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=500, help='single queries timed for the latency')
+    parser.add_argument('--batch', type=int, default=20_000, help='rows of the batch query')
+    parser.add_argument('--json', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'rows':>9} {'kind':<9} {'build s':>8} {'index MB':>9} {'peak MB':>8} {'load s':>7} "
+          f"{'p50 ms':>7} {'p99 ms':>7} {'batch q/s':>10}")
+    for n_rows in args.rows:
+        df = spotify_tracks(n_rows)
+        for kind in args.kinds:
+            row = dict(rows=n_rows, **bench_kind(df, kind, args.k, args.queries, args.batch))
+            results.append(row)
+            print(f"{n_rows:>9} {kind:<9} {row['build_seconds']:8.2f} {row['index_mb']:9.1f} "
+                  f"{row['build_peak_mb']:8.1f} {row['load_seconds']:7.2f} {row['query_p50_ms']:7.3f} "
+                  f"{row['query_p99_ms']:7.3f} {row['batch_queries_per_s']:10.0f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'k': args.k, 'runs': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
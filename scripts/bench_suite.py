@@ -0,0 +1,252 @@
+"""
+Benchmark: every act's hot path on synthetic data of increasing size
+
+    python bench_suite.py --sizes 10000 100000 1000000 --json bench.json
+    python bench_suite.py --sizes 10000 100000 --baseline bench.json   # compare with an earlier revision
+
+Act 1: genre mapping, yearly aggregation, grid completion/interpolation, genre cube,
+       appending a 1% batch to the incremental state
+Act 2: genre mapping, country aggregation, figure prerender, callback latency,
+       country similarity matrix
+Act 3: era correlations (classic eras and 10-year rolling windows), prefix-sum index
+       build and range-query latency
+Act 4: scaling, clustering (exact and mini-batch), naming, predict-only labelling,
+       rendering, neighbour index
+
+The inputs come from synthetic_data.py, so every size has the schema of the
+real files. Each stage is run --repeats times; the JSON holds the median and
+the fastest run together with the git revision, so results from different
+revisions can be compared with --baseline.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import plotly
+import sklearn
+from sklearn.preprocessing import StandardScaler
+
+from chart_export import figure_div
+from cluster_model import ClusterModel
+from country_similarity import similarity_table
+from clustering import fit_clusters, name_clusters
+from dashboard_figures import FigureCache, genre_share_table, index_by_country
+from era_correlation import CLASSIC_ERAS, PrefixIndex, era_correlations, rolling_eras
+from genre_cube import GenreCube
+from genre_grid import aggregate_genre_years, pivot_genre_grid
+from genre_rules import ACT1_GENRE_RULES, ACT2_GENRE_RULES, GenreClassifier
+from genre_state import GenreShareState
+from similarity_index import SimilarityIndex
+from synthetic_data import classic_hits, spotify_tracks, top50_by_country
+from universe_render import universe_figure
+
+FEATURES = ['danceability', 'energy', 'acousticness', 'valence', 'speechiness',
+            'instrumentalness', 'liveness', 'loudness', 'tempo']
+
+
+def measure(fn, repeats):
+    """Run fn `repeats` times; returns (median seconds, fastest seconds, last result)"""
+    times = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), float(min(times)), result
+
+
+def latency(fn, calls):
+    """p50/p99 latency in milliseconds of `calls` calls of fn(i)"""
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1e3)
+    return {'p50_ms': float(np.percentile(samples, 50)), 'p99_ms': float(np.percentile(samples, 99))}
+
+
+def bench_act1(n_rows, repeats, record):
+    df = classic_hits(n_rows)
+    median, best, main_genre = measure(lambda: GenreClassifier(ACT1_GENRE_RULES).classify(df['Genre']), repeats)
+    record('genre_mapping', median, best)
+
+    df = df.assign(main_genre=main_genre)
+    df = df[(df['Year'] >= 1923) & (df['Year'] <= 2023)]
+    median, best, df_agg = measure(lambda: aggregate_genre_years(df), repeats)
+    record('aggregation', median, best)
+
+    genres = df_agg['main_genre'].unique()
+    median, best, _ = measure(lambda: pivot_genre_grid(df_agg, range(1923, 2024), genres), repeats)
+    record('completion_interpolation', median, best)
+
+    median, best, cube = measure(lambda: GenreCube.build(df, range(1923, 2024), genres), repeats)
+    record('cube', median, best)
+    median, best, _ = measure(lambda: [cube.shares(width) for width in (1, 5, 10)], repeats)
+    record('cube_views', median, best)
+
+    # Ingesting the last 1% of the rows into the state of the first 99% (each repeat appends it again)
+    split = len(df) - max(1, len(df) // 100)
+    state = GenreShareState(range(1923, 2024))
+    state.ingest(df.iloc[:split])
+    median, best, _ = measure(lambda: state.ingest(df.iloc[split:]), repeats)
+    record('append_ingest', median, best, batch_rows=len(df) - split)
+
+
+def bench_act2(n_rows, repeats, record, calls=1000):
+    df = top50_by_country(n_rows)
+    median, best, meta_genre = measure(lambda: GenreClassifier(ACT2_GENRE_RULES).classify(df['top genre']), repeats)
+    record('genre_mapping', median, best)
+
+    df = df.assign(meta_genre=meta_genre)
+    median, best, df_plot = measure(lambda: genre_share_table(df), repeats)
+    record('aggregation', median, best)
+
+    country_frames = index_by_country(df_plot)
+    countries = list(country_frames)
+    figure_cache = FigureCache(country_frames)
+    median, best, _ = measure(figure_cache.prerender, repeats)
+    record('prerender', median, best, countries=len(countries))
+
+    record('callback_cached', None, None, **latency(lambda i: figure_cache.get(countries[i % len(countries)]), calls))
+    record('callback_cold', None, None,
+           **latency(lambda i: figure_cache.render(countries[i % len(countries)]), min(calls, 100)))
+
+    median, best, similarity = measure(lambda: similarity_table(df_plot), repeats)
+    record('similarity', median, best, countries=len(similarity['countries']))
+
+
+def bench_act3(n_rows, repeats, record):
+    df = spotify_tracks(n_rows)
+    median, best, _ = measure(lambda: era_correlations(df, FEATURES, CLASSIC_ERAS), repeats)
+    record('correlation', median, best, eras=len(CLASSIC_ERAS))
+
+    eras = rolling_eras(1921, 2020, 10)
+    median, best, _ = measure(lambda: era_correlations(df, FEATURES, eras), repeats)
+    record('correlation_rolling', median, best, eras=len(eras))
+
+    median, best, index = measure(lambda: PrefixIndex.from_frame(df, FEATURES), repeats)
+    record('prefix_index', median, best)
+    rng = np.random.default_rng(0)
+    starts = rng.integers(1921, 2020, 1000)
+    record('range_query', None, None,
+           **latency(lambda i: index.correlation(starts[i], starts[i] + i % 30), len(starts)))
+
+
+def bench_act4(n_rows, repeats, record):
+    df = spotify_tracks(n_rows)
+    median, best, _ = measure(lambda: StandardScaler().fit_transform(df[FEATURES]), repeats)
+    record('scaling', median, best)
+
+    for backend in ('kmeans', 'minibatch'):
+        median, best, result = measure(lambda: fit_clusters(df, FEATURES, backend=backend), repeats)
+        record(f'clustering_{backend}', median, best, rows_labelled=result.report['rows_labelled'],
+               peak_memory_mb=result.report['peak_memory_mb'])
+
+    frame = result.frame
+    median, best, (_, name_map) = measure(lambda: name_clusters(frame, FEATURES), repeats)
+    record('naming', median, best)
+
+    model = ClusterModel.from_fit(frame, FEATURES, result.scaler, result.model.cluster_centers_, name_map)
+    median, best, _ = measure(lambda: model.predict(df), repeats)
+    record('predict_only', median, best)
+
+    frame = frame.assign(Cluster_Name=frame['Cluster_ID'].map(name_map),
+                         artists_cleaned=frame['artists'].astype(str).str.replace(r"[\"\[\]\']", "", regex=True))
+
+    def render():
+        fig, post_script, mode = universe_figure(frame)
+        return mode, len(figure_div(fig, post_script=post_script))
+
+    median, best, (mode, page_bytes) = measure(render, repeats)
+    record('rendering', median, best, mode=mode, page_bytes=page_bytes)
+
+    median, best, index = measure(lambda: SimilarityIndex.build(df, FEATURES), repeats)
+    record('neighbour_index', median, best, index_mb=index.nbytes / 1e6)
+    record('neighbour_query', None, None,
+           **latency(lambda i: index.neighbours_of([i * 7919 % len(df)], 10), min(n_rows, 1000)))
+    rows = np.arange(min(n_rows, 10_000))
+    median, best, _ = measure(lambda: index.neighbours_of(rows, 10), repeats)
+    record('neighbour_batch', median, best, queries=len(rows))
+
+
+ACTS = {1: bench_act1, 2: bench_act2, 3: bench_act3, 4: bench_act4}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print new/old time ratios for the stages present in both runs; returns the number of regressions"""
+    key = lambda r: (r['act'], r['stage'], r['rows'])
+    old = {key(r): r for r in baseline['results']}
+    regressions = 0
+    print(f"\nvs. baseline {baseline.get('revision')}:")
+    print(f"{'act':>3} {'stage':<26} {'rows':>10} {'old':>10} {'new':>10} {'ratio':>7}")
+    for row in results:
+        before = old.get(key(row))
+        metric = 'seconds' if row.get('seconds') is not None else 'p50_ms'
+        if before is None or not before.get(metric):
+            continue
+        ratio = row[metric] / before[metric]
+        flag = '  << slower' if ratio > threshold else ''
+        regressions += bool(flag)
+        print(f"{row['act']:>3} {row['stage']:<26} {row['rows']:>10} {before[metric]:>10.4f} "
+              f"{row[metric]:>10.4f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--acts', type=int, nargs='+', default=list(ACTS), choices=list(ACTS))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--json', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='flag stages slower than the baseline by more than this factor')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'act':>3} {'stage':<26} {'rows':>10} {'median s':>10} {'best s':>10}  extra")
+    for n_rows in args.sizes:
+        for act in args.acts:
+            def record(stage, median, best, **extra):
+                row = {'act': act, 'stage': stage, 'rows': n_rows, 'seconds': median, 'seconds_min': best, **extra}
+                results.append(row)
+                timing = (f"{median:>10.4f} {best:>10.4f}" if median is not None else f"{'':>10} {'':>10}")
+                print(f"{act:>3} {stage:<26} {n_rows:>10} {timing}  "
+                      + ', '.join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in extra.items()))
+            ACTS[act](n_rows, args.repeats, record)
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'versions': {'numpy': np.__version__, 'pandas': pd.__version__, 'plotly': plotly.__version__,
+                     'scikit-learn': sklearn.__version__},
+        'sizes': args.sizes,
+        'repeats': args.repeats,
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            compare(results, json.load(f), args.threshold)
+
+
+if __name__ == '__main__':
+    main()
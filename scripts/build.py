@@ -0,0 +1,269 @@
+"""
+构建入口：把四幕的生成脚本建模为依赖图，增量、并行地重建所有交付页面
+数据集 → 列式缓存 → 各幕脚本（聚合、作图、导出 HTML）
+输入文件、代码与参数的内容哈希都没变的阶段直接跳过；互不依赖的阶段在进程池中并行运行
+
+用法（在 scripts 目录下）:
+    python build.py                  # 构建全部
+    python build.py act3 act4        # 只构建指定阶段（自动包含其依赖）
+    python build.py --force --jobs 2
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import runpy
+import sys
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stderr, redirect_stdout
+
+import data_cache
+from data_cache import file_hash, file_signature, load_dataset
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPTS_DIR)
+DEFAULT_DATA_DIR = os.path.join(REPO_DIR, 'data')
+# 默认写入不纳入版本控制的 build/，不覆盖已提交的 output/html_charts（需要时用 --out-dir 指定）
+DEFAULT_OUT_DIR = os.path.join(REPO_DIR, 'build')
+
+# 构建状态（各阶段上次成功时的哈希）与各阶段日志，放在输出目录中
+STATE_FILE = '.build_state.json'
+LOG_DIR = '.build_logs'
+
+# kind='data'：把数据集解析进列式缓存（之后各幕只读取自己需要的列）
+# kind='act'：运行一幕的脚本；target 是脚本文件名，argv 是传给脚本的参数
+# env: 会影响输出的环境变量前缀，其取值计入哈希
+Stage = namedtuple('Stage', ['name', 'kind', 'target', 'deps', 'inputs', 'env', 'outputs', 'argv'])
+
+STAGES = [
+    Stage('data:classic_hits', 'data', 'ClassicHit.csv', (), ('ClassicHit.csv',), (), (), ()),
+    Stage('data:top50', 'data', 'top50contry.csv', (), ('top50contry.csv',), (), (), ()),
+    Stage('data:spotify', 'data', 'data.csv', (), ('data.csv',), (), (), ()),
+    Stage('act1', 'act', 'dv_1.py', ('data:classic_hits',), ('ClassicHit.csv',), ('ACT1_', 'CHART_'),
+          ('genre_trends_stacked.html', 'genre_trends_interactive.html', 'plotly.min.js'), ('--interactive',)),
+    Stage('act2', 'act', 'dv_2-5.py', ('data:top50',), ('top50contry.csv',), (),
+          ('top50_music_dashboard_standalone.html', 'top50_dashboard.json'), ('--standalone', '--artifact')),
+    Stage('act3', 'act', 'dv_3-2.py', ('data:spotify',), ('data.csv',), ('ACT3_', 'CHART_'),
+          ('hit_song_formula_heatmap.html', 'hit_song_formula_interactive.html', 'plotly.min.js'), ('--interactive',)),
+    Stage('act4', 'act', 'dv_4-2.py', ('data:spotify',), ('data.csv',), ('ACT4_', 'CHART_'),
+          ('music_universe_named_clusters.html', 'plotly.min.js', 'music_universe_model.json'), ()),
+]
+STAGE_BY_NAME = {stage.name: stage for stage in STAGES}
+
+
+def local_modules(script, seen=None):
+    """脚本及其（递归）导入的 scripts 目录内模块的文件路径"""
+    seen = set() if seen is None else seen
+    path = os.path.join(SCRIPTS_DIR, script)
+    if path in seen or not os.path.exists(path):
+        return seen
+    seen.add(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            local_modules(name.split('.')[0] + '.py', seen)
+    return seen
+
+
+def cached_file_hash(path, file_hashes):
+    """文件内容的 SHA-1；大小和修改时间没变时沿用上次构建记录的值"""
+    signature = file_signature(path)
+    entry = file_hashes.get(path)
+    if entry is None or entry['size'] != signature['size'] or entry['mtime_ns'] != signature['mtime_ns']:
+        entry = dict(signature, sha1=file_hash(path))
+        file_hashes[path] = entry
+    return entry['sha1']
+
+
+def stage_key(stage, data_dir, file_hashes, dep_keys):
+    """
+    阶段的内容哈希：代码、输入数据、相关环境变量、参数以及依赖阶段的哈希
+
+    输入文件缺失时返回 None。
+    """
+    code_files = local_modules('data_cache.py' if stage.kind == 'data' else stage.target)
+    inputs = {}
+    for name in stage.inputs:
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path):
+            return None
+        inputs[name] = cached_file_hash(path, file_hashes)
+    payload = {
+        'code': {os.path.basename(p): cached_file_hash(p, file_hashes) for p in sorted(code_files)},
+        'inputs': inputs,
+        'env': {k: v for k, v in sorted(os.environ.items()) if k.startswith(stage.env)} if stage.env else {},
+        'argv': list(stage.argv),
+        'deps': [dep_keys[dep] for dep in stage.deps],
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def run_stage(name, data_dir, out_dir):
+    """在工作进程中运行一个阶段，输出写入日志文件；返回用时（秒）"""
+    stage = STAGE_BY_NAME[name]
+    os.environ['MUSIC_DATA_DIR'] = data_dir
+    data_cache.DATA_DIR = data_dir
+    os.chdir(out_dir)
+    log_path = os.path.join(out_dir, LOG_DIR, name.replace(':', '_') + '.log')
+
+    start = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log, redirect_stdout(log), redirect_stderr(log):
+        try:
+            if stage.kind == 'data':
+                df = load_dataset(stage.target)
+                print(f"{stage.target}: {len(df)} 行, {df.shape[1]} 列")
+            else:
+                sys.argv = [stage.target, *stage.argv]
+                # stage_trace 在子进程中默认不记录，这里为本阶段显式开启（MUSIC_TRACE 开启时）；
+                # 只在工作进程中导入，构建主进程本身不记录
+                import stage_trace
+                stage_trace.enable()
+                runpy.run_path(os.path.join(SCRIPTS_DIR, stage.target), run_name='__main__')
+                # 工作进程退出时不执行 atexit，在这里写出阶段耗时记录
+                stage_trace.finish()
+        except BaseException:
+            traceback.print_exc()
+            raise
+    return time.perf_counter() - start
+
+
+def with_dependencies(names):
+    """所选阶段加上它们（递归）依赖的阶段，按 STAGES 中的拓扑顺序排列"""
+    selected = set()
+
+    def visit(name):
+        if name not in STAGE_BY_NAME:
+            raise ValueError(f"unknown stage {name!r}, expected one of {list(STAGE_BY_NAME)}")
+        if name not in selected:
+            selected.add(name)
+            for dep in STAGE_BY_NAME[name].deps:
+                visit(dep)
+
+    for name in names:
+        visit(name)
+    return [stage for stage in STAGES if stage.name in selected]
+
+
+def load_state(out_dir):
+    path = os.path.join(out_dir, STATE_FILE)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {'stages': {}, 'files': {}}
+
+
+def save_state(out_dir, state):
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def build(names=None, data_dir=DEFAULT_DATA_DIR, out_dir=DEFAULT_OUT_DIR, jobs=None, force=False):
+    """
+    按依赖图构建所选阶段（默认全部）
+
+    返回 {阶段: 'built' | 'skipped' | 'failed' | 'blocked' | 'missing input'}。
+    """
+    data_dir = os.path.abspath(data_dir)
+    out_dir = os.path.abspath(out_dir)
+    os.makedirs(os.path.join(out_dir, LOG_DIR), exist_ok=True)
+    stages = with_dependencies(names or [stage.name for stage in STAGES])
+    state = load_state(out_dir)
+
+    keys = {}
+    for stage in stages:
+        keys[stage.name] = stage_key(stage, data_dir, state['files'], keys)
+
+    status = {}
+    pending = list(stages)
+    running = {}
+    timings = {}
+    build_start = time.perf_counter()
+    # Python 3.11 起每个阶段使用一个新的工作进程（内存随之释放）；更早的版本复用工作进程，
+    # 各阶段的脚本由 runpy 重新执行，耗时记录由 stage_trace.enable() 重新开始
+    pool_options = {'max_tasks_per_child': 1} if sys.version_info >= (3, 11) else {}
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count(), **pool_options) as pool:
+        while pending or running:
+            # 提交所有依赖已完成的阶段；哈希未变的阶段直接标记为跳过
+            progressed = True
+            while progressed:
+                progressed = False
+                for stage in list(pending):
+                    dep_status = [status.get(dep) for dep in stage.deps]
+                    if any(s not in (None, 'built', 'skipped') for s in dep_status):
+                        status[stage.name] = 'blocked'
+                    elif keys[stage.name] is None:
+                        status[stage.name] = 'missing input'
+                    elif all(s in ('built', 'skipped') for s in dep_status):
+                        up_to_date = (not force and state['stages'].get(stage.name) == keys[stage.name]
+                                      and all(os.path.exists(os.path.join(out_dir, o)) for o in stage.outputs))
+                        if up_to_date:
+                            status[stage.name] = 'skipped'
+                        else:
+                            running[pool.submit(run_stage, stage.name, data_dir, out_dir)] = stage.name
+                            print(f"▶ {stage.name}")
+                    else:
+                        continue
+                    pending.remove(stage)
+                    progressed = True
+
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    timings[name] = future.result()
+                except Exception as exc:
+                    status[name] = 'failed'
+                    print(f"✗ {name}: {exc!r}（日志见 {os.path.join(LOG_DIR, name.replace(':', '_') + '.log')}）")
+                    continue
+                status[name] = 'built'
+                state['stages'][name] = keys[name]
+                save_state(out_dir, state)
+                print(f"✓ {name} ({timings[name]:.1f} 秒)")
+
+    save_state(out_dir, state)
+    print(f"\n构建完成，用时 {time.perf_counter() - build_start:.1f} 秒，输出目录 {out_dir}")
+    for stage in stages:
+        detail = f" ({timings[stage.name]:.1f} 秒)" if stage.name in timings else ''
+        print(f"  {stage.name:<18} {status[stage.name]}{detail}")
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental, parallel build of all four acts")
+    parser.add_argument('stages', nargs='*', help="stages to build (default: all); dependencies are included")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="folder with the CSV inputs")
+    parser.add_argument('--out-dir', default=DEFAULT_OUT_DIR, help="folder the HTML pages are written to")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="rebuild even if nothing changed")
+    parser.add_argument('--list', action='store_true', help="list the stages and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for stage in STAGES:
+            deps = ', '.join(stage.deps) or '-'
+            print(f"{stage.name:<18} {stage.target:<16} depends on: {deps}")
+        return
+
+    status = build(args.stages, args.data_dir, args.out_dir, args.jobs, args.force)
+    if any(s not in ('built', 'skipped') for s in status.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+图表导出：所有幕共用的紧凑 HTML 输出
+plotly.js 只作为共享的本地文件写出一次，数值数组以降低精度的 base64 类型数组嵌入，
+可选地预先生成 .gz / .br 压缩版本，并报告每个页面导出前后的字节数
+"""
+
+import base64
+import gzip
+import os
+
+import numpy as np
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+# 与页面放在同一目录的共享 plotly.js；页面用相对路径引用，本地双击打开同样可用
+PLOTLYJS_NAME = 'plotly.min.js'
+
+# 坐标等浮点数保留的小数位数（之后以 float32 存储）
+DECIMALS = 4
+
+# 短于此长度的数组保留 JSON 文本，编码反而更长
+MIN_ARRAY_LENGTH = 8
+
+# 设置 CHART_PRECOMPRESS=1 时同时写出 .gz / .br 文件，供静态服务器直接发送
+PRECOMPRESS = os.environ.get('CHART_PRECOMPRESS', '0') == '1'
+
+# plotly.js 支持的整数类型数组，按位宽从小到大
+_INT_DTYPES = [np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32]
+
+
+def _typed_array(values, decimals):
+    """数值数组 → plotly.js 类型数组 {dtype, bdata[, shape]}；整数取最小宽度，浮点四舍五入后转 float32"""
+    if values.dtype.kind == 'f':
+        values = np.round(values, decimals).astype(np.float32)
+    else:
+        lo, hi = (int(values.min()), int(values.max())) if values.size else (0, 0)
+        dtype = next((t for t in _INT_DTYPES if np.iinfo(t).min <= lo and hi <= np.iinfo(t).max), np.float64)
+        values = values.astype(dtype)
+    spec = {'dtype': values.dtype.str[1:], 'bdata': base64.b64encode(np.ascontiguousarray(values).tobytes()).decode('ascii')}
+    if values.ndim > 1:
+        spec['shape'] = ', '.join(str(n) for n in values.shape)
+    return spec
+
+
+def _as_numeric(value):
+    """把图表 JSON 中的数值数组（已编码的 typed array 或数字列表）转为 ndarray；其它值返回 None"""
+    if isinstance(value, dict) and 'bdata' in value and 'dtype' in value:
+        values = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+        if 'shape' in value:
+            values = values.reshape([int(n) for n in str(value['shape']).split(',')])
+        return values
+    if isinstance(value, (list, tuple)) and len(value) >= MIN_ARRAY_LENGTH:
+        if any(isinstance(v, bool) for v in value):
+            return None
+        try:
+            values = np.asarray(value)
+        except ValueError:  # 长度不一的嵌套列表
+            return None
+        if values.dtype.kind in 'iuf':
+            return values
+    return None
+
+
+def _compact(node, decimals):
+    if isinstance(node, dict) and 'bdata' not in node:
+        return {key: _compact(value, decimals) for key, value in node.items()}
+    values = _as_numeric(node)
+    if values is not None:
+        return _typed_array(values, decimals)
+    if isinstance(node, (list, tuple)):
+        return [_compact(value, decimals) for value in node]
+    return node
+
+
+def compact_figure(fig, decimals=DECIMALS):
+    """
+    图表的 JSON 结构，其中各 trace 的数值数组改为 base64 类型数组
+
+    浮点数四舍五入到 `decimals` 位后以 float32 存储，整数取能容纳取值范围的最小类型。
+    布局（包括模板）保持原样。
+    """
+    fig_dict = fig.to_plotly_json()
+    fig_dict['data'] = [_compact(trace, decimals) for trace in fig_dict['data']]
+    return fig_dict
+
+
+def ensure_plotlyjs(directory):
+    """在 `directory` 中写出共享的 plotly.js（缺失或版本不同时才写），返回其路径"""
+    path = os.path.join(directory, PLOTLYJS_NAME)
+    source = get_plotlyjs().encode('utf-8')
+    if os.path.exists(path) and os.path.getsize(path) == len(source):
+        with open(path, 'rb') as f:
+            if f.read() == source:
+                return path
+    with open(path, 'wb') as f:
+        f.write(source)
+    return path
+
+
+def precompress(path):
+    """写出 path.gz（以及安装了 brotli 时的 path.br），返回各版本的字节数"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    sizes = {}
+    # mtime=0：内容不变时压缩文件也逐字节不变
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    with open(path + '.gz', 'wb') as f:
+        f.write(gz)
+    sizes['gzip'] = len(gz)
+    if HAS_BROTLI:
+        br = brotli.compress(data, quality=11)
+        with open(path + '.br', 'wb') as f:
+            f.write(br)
+        sizes['brotli'] = len(br)
+    return sizes
+
+
+def figure_div(fig, div_id=None, post_script=None, decimals=DECIMALS):
+    """图表的 <div> 片段，引用共享的 plotly.js（用于自定义页面外壳）"""
+    return pio.to_html(compact_figure(fig, decimals), validate=False, full_html=False,
+                       include_plotlyjs=PLOTLYJS_NAME, div_id=div_id, post_script=post_script)
+
+
+def _format_bytes(n):
+    for unit in ('B', 'KB', 'MB'):
+        if n < 1024 or unit == 'MB':
+            return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def export_figure(fig, path, post_script=None, div_id=None, page=None, decimals=DECIMALS, compress=None):
+    """
+    写出一个图表页面，并返回字节数报告
+
+    page: 可选的函数，接收图表 <div> 片段、返回完整页面（自定义外壳）；默认使用 Plotly 的整页模板。
+    报告中的 'before' 是同一页面内嵌 plotly.js 与 JSON 文本数组时大小的估计值
+    （plotly.js + 未压缩的图表 JSON + post_script），不再渲染第二个完整页面。
+    """
+    compress = PRECOMPRESS if compress is None else compress
+    if page is None:
+        html = pio.to_html(compact_figure(fig, decimals), validate=False, include_plotlyjs=PLOTLYJS_NAME,
+                           div_id=div_id, post_script=post_script)
+    else:
+        html = page(figure_div(fig, div_id, post_script, decimals))
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    asset = ensure_plotlyjs(os.path.dirname(os.path.abspath(path)))
+
+    shared_size = os.path.getsize(asset)
+    report = {
+        'path': path,
+        'before': shared_size + len(fig.to_json().encode('utf-8')) + len((post_script or '').encode('utf-8')),
+        'after': os.path.getsize(path),
+        'shared_plotlyjs': shared_size,
+    }
+    if compress:
+        report.update(precompress(path))
+        if not os.path.exists(asset + '.gz') or os.path.getmtime(asset + '.gz') < os.path.getmtime(asset):
+            precompress(asset)
+    print(format_report(report))
+    return report
+
+
+def format_report(report):
+    """一行字节数报告：导出前（估计）→ 导出后（压缩版本），以及共享 plotly.js 的大小"""
+    line = (f"{os.path.basename(report['path'])}: ~{_format_bytes(report['before'])} → "
+            f"{_format_bytes(report['after'])}")
+    compressed = [f"{name} {_format_bytes(report[name])}" for name in ('gzip', 'brotli') if name in report]
+    if compressed:
+        line += f" ({', '.join(compressed)})"
+    return line + f"，共享 {PLOTLYJS_NAME} {_format_bytes(report['shared_plotlyjs'])}"
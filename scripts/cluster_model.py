@@ -0,0 +1,202 @@
+"""
+Act 4: Persisted clustering model - fit once, then label new tracks without refitting
+
+The artifact (JSON, versioned) holds the scaler statistics, the centroids, the
+per-cluster profile statistics (track counts, feature sums and sums of squares)
+and the cluster names. predict() assigns labels by nearest centroid with a few
+vectorized matrix operations; ingest() also folds the new tracks into the profile
+statistics while the IDs and names stay as they are.
+
+    python cluster_model.py new_releases.csv --out new_releases_labelled.csv
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+
+# Bumped whenever the artifact layout changes; older files are refitted
+MODEL_FORMAT = 1
+MODEL_PATH = 'music_universe_model.json'
+
+# Rows per block of the nearest-centroid computation
+PREDICT_CHUNK = 1_000_000
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+class ClusterModel:
+    """Scaler statistics, centroids (in scaled space), profile statistics and names of a fitted clustering"""
+
+    def __init__(self, features, mean, scale, centroids, names, counts, sums, sums_sq,
+                 backend=None, version=1, fitted_at=None, updated_at=None, tracks_ingested=0):
+        self.features = list(features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.names = {int(k): v for k, v in names.items()}
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.sums = np.asarray(sums, dtype=np.float64)
+        self.sums_sq = np.asarray(sums_sq, dtype=np.float64)
+        self.backend = backend
+        self.version = version
+        self.fitted_at = fitted_at or _now()
+        self.updated_at = updated_at or self.fitted_at
+        self.tracks_ingested = tracks_ingested
+        self._centroid_sq = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+    @classmethod
+    def from_fit(cls, frame, features, scaler, centroids, names, **metadata):
+        """Model of a fitted clustering; frame holds the clustered tracks with their Cluster_ID"""
+        X = frame[features].to_numpy(dtype=np.float64)
+        labels = frame['Cluster_ID'].to_numpy()
+        k = len(centroids)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros((k, len(features)))
+        sums_sq = np.zeros((k, len(features)))
+        np.add.at(sums, labels, X)
+        np.add.at(sums_sq, labels, X * X)
+        return cls(features, scaler.mean_, scaler.scale_, centroids, names, counts, sums, sums_sq, **metadata)
+
+    @property
+    def n_clusters(self):
+        return len(self.centroids)
+
+    @property
+    def name_map(self):
+        return dict(self.names)
+
+    def profile(self):
+        """Feature means per Cluster_ID (the cluster_profile of clustering.name_clusters)"""
+        means = self.sums / np.maximum(self.counts, 1)[:, None]
+        return pd.DataFrame(means, index=pd.Index(range(self.n_clusters), name='Cluster_ID'), columns=self.features)
+
+    def profile_std(self):
+        """Feature standard deviations per Cluster_ID"""
+        n = np.maximum(self.counts, 1)[:, None]
+        var = np.maximum(self.sums_sq / n - (self.sums / n) ** 2, 0)
+        return pd.DataFrame(np.sqrt(var), index=pd.Index(range(self.n_clusters), name='Cluster_ID'),
+                            columns=self.features)
+
+    def _features(self, X):
+        if hasattr(X, 'columns'):
+            X = X[self.features]
+        return np.asarray(X, dtype=np.float64).reshape(-1, len(self.features))
+
+    def predict(self, X, chunksize=PREDICT_CHUNK):
+        """Cluster_ID of each row of raw feature values: the nearest centroid after scaling"""
+        X = self._features(X)
+        labels = np.empty(len(X), dtype=np.int32)
+        for start in range(0, len(X), chunksize):
+            Z = (X[start:start + chunksize] - self.mean) / self.scale
+            # |z - c|² up to the per-row |z|², which does not change the argmin
+            labels[start:start + chunksize] = (self._centroid_sq - 2 * Z @ self.centroids.T).argmin(axis=1)
+        return labels
+
+    def ingest(self, X):
+        """Label new tracks and add them to the profile statistics; returns the labels"""
+        X = self._features(X)
+        labels = self.predict(X)
+        self.counts += np.bincount(labels, minlength=self.n_clusters)
+        np.add.at(self.sums, labels, X)
+        np.add.at(self.sums_sq, labels, X * X)
+        self.tracks_ingested += len(X)
+        self.updated_at = _now()
+        return labels
+
+    def match(self, centroids, mean, scale):
+        """
+        Relabelling that gives a new fit's clusters the IDs of this model's closest centroids
+
+        centroids are in the new fit's scaled space (its scaler's mean/scale). Both
+        fits must have the same number of clusters; returns an array mapping each
+        new cluster to an ID (the one-to-one assignment with the smallest total
+        squared distance between centroids).
+        """
+        centroids = np.asarray(centroids, dtype=np.float64)
+        if len(centroids) != self.n_clusters:
+            raise ValueError(f"cannot match {len(centroids)} clusters to {self.n_clusters}")
+        # Compare in this model's scaled space
+        centroids = (centroids * scale + mean - self.mean) / self.scale
+        cost = ((centroids[:, None, :] - self.centroids[None, :, :]) ** 2).sum(axis=2)
+        new, old = linear_sum_assignment(cost)
+        mapping = np.empty(len(centroids), dtype=np.int64)
+        mapping[new] = old
+        return mapping
+
+    def to_dict(self):
+        return {
+            'format': MODEL_FORMAT,
+            'version': self.version,
+            'fitted_at': self.fitted_at,
+            'updated_at': self.updated_at,
+            'backend': self.backend,
+            'features': self.features,
+            'scaler': {'mean': self.mean.tolist(), 'scale': self.scale.tolist()},
+            'centroids': self.centroids.tolist(),
+            'names': {str(k): v for k, v in sorted(self.names.items())},
+            'profile': {'counts': self.counts.tolist(), 'sums': self.sums.tolist(), 'sums_sq': self.sums_sq.tolist()},
+            'tracks_ingested': self.tracks_ingested,
+        }
+
+    def save(self, path=MODEL_PATH):
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('format') != MODEL_FORMAT:
+            raise ValueError(f"{path} has format {state.get('format')!r}, expected {MODEL_FORMAT}: refit the model")
+        return cls(state['features'], state['scaler']['mean'], state['scaler']['scale'], state['centroids'],
+                   state['names'], state['profile']['counts'], state['profile']['sums'], state['profile']['sums_sq'],
+                   backend=state.get('backend'), version=state['version'], fitted_at=state['fitted_at'],
+                   updated_at=state['updated_at'], tracks_ingested=state.get('tracks_ingested', 0))
+
+
+def load_model(path=MODEL_PATH):
+    """The saved model, or None when there is none or it was written in another format"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return ClusterModel.load(path)
+    except (ValueError, KeyError) as exc:
+        print(f"忽略已保存的模型 {path}: {exc}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('tracks', help='CSV of new tracks with the model features (same columns as data.csv)')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--out', help='write the tracks with Cluster_ID / Cluster_Name to this CSV')
+    parser.add_argument('--dry-run', action='store_true', help='label only; leave the model file unchanged')
+    args = parser.parse_args()
+
+    model = ClusterModel.load(args.model)
+    tracks = pd.read_csv(args.tracks)
+    start = time.perf_counter()
+    labels = model.predict(tracks) if args.dry_run else model.ingest(tracks)
+    elapsed = time.perf_counter() - start
+    print(f"{len(tracks)} 首新歌曲, 模型版本 {model.version}, 用时 {elapsed * 1e3:.2f} 毫秒")
+    for cluster_id, count in zip(*np.unique(labels, return_counts=True)):
+        print(f"  {model.names[cluster_id]}: {count} 首歌曲")
+
+    if not args.dry_run:
+        model.save(args.model)
+    if args.out:
+        tracks.assign(Cluster_ID=labels, Cluster_Name=[model.names[label] for label in labels]).to_csv(
+            args.out, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""
+Act 4: Clustering backends for the music universe
+'kmeans'    - exact k-means on a random sample (the original behaviour)
+'minibatch' - streaming mini-batch k-means fitted chunk by chunk on every track
+plus a parallel sweep over k (and seeds) to choose the number of clusters
+"""
+
+import os
+import time
+import tracemalloc
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+from threadpoolctl import threadpool_limits
+
+# frame: the clustered rows with a Cluster_ID column; report: fit statistics
+ClusterResult = namedtuple('ClusterResult', ['frame', 'scaler', 'model', 'report'])
+
+BACKENDS = ('kmeans', 'minibatch')
+
+
+def iter_chunks(n_rows, chunksize, random_state=None):
+    """Row-index chunks covering range(n_rows); shuffled when random_state is given"""
+    order = np.arange(n_rows)
+    if random_state is not None:
+        order = np.random.default_rng(random_state).permutation(n_rows)
+    for start in range(0, n_rows, chunksize):
+        yield order[start:start + chunksize]
+
+
+def sample_tracks(df, sample_size=10000, random_state=42):
+    """The random sample of tracks the 'kmeans' backend clusters"""
+    return df.sample(n=min(sample_size, len(df)), random_state=random_state).copy()
+
+
+def fit_exact_kmeans(df, features, n_clusters=8, random_state=42, sample_size=10000):
+    """Standardize and run exact k-means on a random sample of `sample_size` tracks"""
+    frame = sample_tracks(df, sample_size, random_state)
+    scaler = StandardScaler()
+    features_scaled = scaler.fit_transform(frame[features])
+    model = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=10)
+    frame['Cluster_ID'] = model.fit_predict(features_scaled)
+    return frame, scaler, model, float(model.inertia_)
+
+
+def fit_minibatch_kmeans(df, features, n_clusters=8, random_state=42, chunksize=100_000,
+                         batch_size=4096, epochs=3):
+    """
+    Mini-batch k-means over every track, one chunk of rows at a time
+
+    The scaler and the model are both fitted incrementally (partial_fit), then
+    every track is labelled in a final pass; only one chunk is scaled at a time.
+    """
+    X = df[features]
+    scaler = StandardScaler()
+    for rows in iter_chunks(len(df), chunksize):
+        scaler.partial_fit(X.iloc[rows])
+
+    model = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state,
+                            batch_size=batch_size, n_init=3)
+    for epoch in range(epochs):
+        for rows in iter_chunks(len(df), chunksize, random_state + epoch):
+            chunk = scaler.transform(X.iloc[rows])
+            # partial_fit takes one mini-batch per call
+            for start in range(0, len(chunk), batch_size):
+                batch = chunk[start:start + batch_size]
+                if len(batch) >= n_clusters:
+                    model.partial_fit(batch)
+
+    labels = np.empty(len(df), dtype=np.int32)
+    inertia = 0.0
+    for rows in iter_chunks(len(df), chunksize):
+        chunk = scaler.transform(X.iloc[rows])
+        labels[rows] = model.predict(chunk)
+        inertia -= model.score(chunk)
+
+    frame = df.copy()
+    frame['Cluster_ID'] = labels
+    return frame, scaler, model, inertia
+
+
+def fit_clusters(df, features, backend='kmeans', n_clusters=8, random_state=42, **options):
+    """
+    Cluster the tracks with the chosen backend
+
+    Returns a ClusterResult whose report holds the fit time, inertia, number of
+    labelled tracks and the peak traced memory of the fit.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown clustering backend {backend!r}, expected one of {BACKENDS}")
+
+    # An enclosing trace (stage_trace with MUSIC_TRACE=...,malloc) keeps running; the
+    # peak it reached before the reset is handed back so its stage is not understated
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # Imported only when tracing, so clustering itself does not depend on stage_trace
+        from stage_trace import note_malloc_peak
+        base, outer_peak = tracemalloc.get_traced_memory()
+        note_malloc_peak(outer_peak)
+        tracemalloc.reset_peak()
+    else:
+        base = 0
+        tracemalloc.start()
+    start = time.perf_counter()
+    if backend == 'kmeans':
+        frame, scaler, model, inertia = fit_exact_kmeans(df, features, n_clusters, random_state, **options)
+    else:
+        frame, scaler, model, inertia = fit_minibatch_kmeans(df, features, n_clusters, random_state, **options)
+    fit_seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    if not tracing:
+        tracemalloc.stop()
+
+    report = {
+        'backend': backend,
+        'n_clusters': n_clusters,
+        'rows_labelled': len(frame),
+        'fit_seconds': fit_seconds,
+        'inertia': inertia,
+        'peak_memory_mb': (peak - base) / 1e6,
+    }
+    return ClusterResult(frame, scaler, model, report)
+
+
+# ---- naming: describe each cluster by its standout features ----
+
+def get_descriptive_cluster_name(cluster_id, cluster_row, overall_means, top_n=2, threshold_multiplier=0.1):
+    """
+    创建更具描述性的聚类名称
+    """
+    # Calculate deviation from overall mean for each feature
+    deviations = (cluster_row - overall_means) / overall_means.std()
+
+    # Find features that are significantly above the overall mean
+    significant_features = deviations[deviations > threshold_multiplier].sort_values(ascending=False)
+
+    if len(significant_features) >= 2:
+        # Take the top N most significant features
+        top_features = significant_features.head(top_n).index.tolist()
+        feature_names_formatted = [f"High {f.title()}" for f in top_features]
+        return f"Cluster {cluster_id} ({', '.join(feature_names_formatted)})"
+    elif len(significant_features) == 1:
+        # Only one significant feature
+        feature_name = significant_features.index[0]
+        return f"Cluster {cluster_id} (High {feature_name.title()})"
+    else:
+        # Fallback: use the highest feature relative to overall mean
+        relative_scores = (cluster_row - overall_means) / overall_means.std()
+        highest_feature = relative_scores.idxmax()
+        return f"Cluster {cluster_id} (High {highest_feature.title()})"
+
+
+def name_clusters(frame, features, top_n=2, threshold_multiplier=0.1):
+    """Feature means per Cluster_ID and a descriptive name for each cluster; returns (profile, name_map)"""
+    # Profile: Calculate the mean of all features grouped by Cluster_ID
+    cluster_profile = frame.groupby('Cluster_ID')[features].mean()
+    # Overall feature means for comparison
+    overall_feature_means = frame[features].mean()
+    name_map = {
+        cluster_id: get_descriptive_cluster_name(cluster_id, cluster_row, overall_feature_means,
+                                                 top_n=top_n, threshold_multiplier=threshold_multiplier)
+        for cluster_id, cluster_row in cluster_profile.iterrows()
+    }
+    return cluster_profile, name_map
+
+
+# ---- k selection: parallel sweep over (k, seed) ----
+
+# Scaled feature matrix shared with the sweep workers, set once per process
+_sweep_X = None
+
+
+def _init_sweep_worker(X):
+    global _sweep_X
+    _sweep_X = X
+
+
+def _sweep_model(k, seed, backend):
+    """Unfitted model of one (k, seed) pair of the sweep"""
+    if backend == 'minibatch':
+        return MiniBatchKMeans(n_clusters=k, random_state=seed, batch_size=4096, n_init=3)
+    return KMeans(n_clusters=k, random_state=seed, n_init=1)
+
+
+def _fit_one_k(k, seed, backend, silhouette_sample):
+    """Fit one (k, seed) pair and score it with inertia and a sampled silhouette; returns only the scores"""
+    X = _sweep_X
+    # One BLAS/OpenMP thread per worker: the pool already uses every core
+    with threadpool_limits(limits=1):
+        start = time.perf_counter()
+        model = _sweep_model(k, seed, backend)
+        labels = model.fit_predict(X)
+        fit_seconds = time.perf_counter() - start
+        silhouette = silhouette_score(X, labels, sample_size=min(silhouette_sample, len(X)), random_state=seed)
+    return {'k': k, 'seed': seed, 'inertia': float(model.inertia_), 'silhouette': float(silhouette),
+            'fit_seconds': fit_seconds}
+
+
+def sweep_k(X, k_values=range(2, 21), seeds=(42,), backend='kmeans', silhouette_sample=5000, n_jobs=None):
+    """
+    Fit k-means for every (k, seed) in a process pool and score each fit
+
+    The silhouette is computed on a random subsample (O(sample²) instead of
+    O(n²)). The chosen k has the best mean silhouette across seeds. Workers
+    only send back their scores (not the fitted models and their per-track
+    labels); the best seed of the chosen k is refitted here with the same
+    random state. Returns (report DataFrame, best_k, best_model).
+    """
+    tasks = [(k, seed) for k in k_values for seed in seeds]
+    n_jobs = n_jobs or os.cpu_count()
+    args = ([k for k, _ in tasks], [seed for _, seed in tasks],
+            [backend] * len(tasks), [silhouette_sample] * len(tasks))
+
+    if n_jobs == 1:
+        _init_sweep_worker(X)
+        rows = list(map(_fit_one_k, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_sweep_worker, initargs=(X,)) as pool:
+            rows = list(pool.map(_fit_one_k, *args))
+
+    report = pd.DataFrame(rows)
+    mean_silhouette = report.groupby('k')['silhouette'].mean()
+    best_k = int(mean_silhouette.idxmax())
+    best_seed = int(report.loc[report[report['k'] == best_k]['silhouette'].idxmax(), 'seed'])
+    return report, best_k, _sweep_model(best_k, best_seed, backend).fit(X)
+
+
+def sweep_figure(report, best_k):
+    """Elbow (inertia) and silhouette curves of a k sweep, with the chosen k marked"""
+    summary = report.groupby('k')[['inertia', 'silhouette']].mean().reset_index()
+    fig = make_subplots(specs=[[{'secondary_y': True}]])
+    fig.add_trace(go.Scatter(x=summary['k'], y=summary['inertia'], mode='lines+markers', name='Inertia'),
+                  secondary_y=False)
+    fig.add_trace(go.Scatter(x=summary['k'], y=summary['silhouette'], mode='lines+markers', name='Silhouette'),
+                  secondary_y=True)
+    fig.add_vline(x=best_k, line_dash='dash', line_color='gray', annotation_text=f"k = {best_k}")
+    fig.update_layout(
+        template='simple_white',
+        title=dict(text="<b>Choosing k: Inertia and Sampled Silhouette</b>", x=0.5),
+        xaxis_title="Number of clusters (k)",
+        font=dict(family="Arial", size=12)
+    )
+    fig.update_yaxes(title_text="Inertia", secondary_y=False)
+    fig.update_yaxes(title_text="Silhouette (sampled)", secondary_y=True)
+    return fig
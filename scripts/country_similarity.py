@@ -0,0 +1,121 @@
+"""
+Act 2: 国家之间的音乐口味相似度
+各国家的 meta_genre 占比展开为稠密的 国家×流派 矩阵，一次矩阵运算算出所有国家两两之间的
+余弦距离与 Jensen–Shannon 距离，再按层次聚类排好热力图的顺序。结果写入仪表盘的嵌入数据
+（构建产物），服务进程与浏览器端只读取这份缓存
+"""
+
+import numpy as np
+from scipy.cluster.hierarchy import leaves_list, linkage
+from scipy.spatial.distance import squareform
+from scipy.special import xlogy
+
+# 度量：键 → 显示名称
+METRICS = {
+    'cosine': 'Cosine',
+    'jensenshannon': 'Jensen–Shannon',
+}
+
+# 每个国家保存的最相似国家数
+TOP_SIMILAR = 10
+
+# Jensen–Shannon 距离分块计算时每块的 国家对×流派 元素数上限
+JS_BLOCK = 1 << 22
+
+GLOBAL_AVERAGE = 'Global Average'
+
+
+def share_matrix(df_plot, reference=GLOBAL_AVERAGE):
+    """
+    由 genre_share_table 的长表得到 (国家×流派 占比矩阵, 参照分布)
+
+    行按国家名排序，未出现的流派记为 0；reference（全球平均）单独返回，不参与两两比较。
+    """
+    countries = df_plot[df_plot['Country'] != reference]
+    matrix = countries.pivot(index='Country', columns='Genre', values='Percentage').fillna(0).sort_index()
+    matrix = matrix.astype('float64')
+    overall = df_plot[df_plot['Country'] == reference].set_index('Genre')['Percentage']
+    return matrix, overall.reindex(matrix.columns).fillna(0).to_numpy(dtype=np.float64)
+
+
+def cosine_distances(P, Q=None):
+    """P 每一行与 Q（默认 P）每一行之间的余弦距离 1 - cos"""
+    Q = P if Q is None else Q
+    Pn = P / np.linalg.norm(P, axis=1, keepdims=True)
+    Qn = Q / np.linalg.norm(Q, axis=1, keepdims=True)
+    return np.clip(1 - Pn @ Qn.T, 0, 2)
+
+
+def jensenshannon_distances(P, Q=None):
+    """
+    P 每一行与 Q（默认 P）每一行之间的 Jensen–Shannon 距离（以 2 为底，取值 0..1）
+
+    JSD(p, q) = H((p + q) / 2) - (H(p) + H(q)) / 2；混合分布的熵按 P 的行分块广播计算。
+    """
+    Q = P if Q is None else Q
+    P = P / P.sum(axis=1, keepdims=True)
+    Q = Q / Q.sum(axis=1, keepdims=True)
+    h_p = -xlogy(P, P).sum(axis=1)
+    h_q = -xlogy(Q, Q).sum(axis=1)
+    out = np.empty((len(P), len(Q)))
+    step = max(1, JS_BLOCK // max(1, Q.size))
+    for start in range(0, len(P), step):
+        M = (P[start:start + step, None, :] + Q[None, :, :]) / 2
+        h_m = -xlogy(M, M).sum(axis=2)
+        out[start:start + step] = h_m - (h_p[start:start + step, None] + h_q[None, :]) / 2
+    return np.sqrt(np.maximum(out, 0) / np.log(2))
+
+
+DISTANCES = {
+    'cosine': cosine_distances,
+    'jensenshannon': jensenshannon_distances,
+}
+
+
+def cluster_order(distances):
+    """层次聚类（平均连接）叶子顺序：相似的国家在热力图中相邻"""
+    if len(distances) < 3:
+        return np.arange(len(distances))
+    condensed = squareform(distances, checks=False)
+    return leaves_list(linkage(condensed, method='average', optimal_ordering=True))
+
+
+def most_similar(distances, names, k=TOP_SIMILAR, exclude_self=True):
+    """每一行最相似的 k 个国家：[(国家, 相似度 1 - 距离), ...]，最相似的在前"""
+    k = min(k, distances.shape[1] - int(exclude_self))
+    order = np.argsort(distances, axis=1, kind='stable')
+    result = []
+    for i, row in enumerate(order):
+        if exclude_self:
+            row = row[row != i]
+        row = row[:k]
+        result.append([(names[j], 1 - distances[i, j]) for j in row])
+    return result
+
+
+def similarity_table(df_plot, metrics=tuple(METRICS), k=TOP_SIMILAR, decimals=4):
+    """
+    嵌入页面的相似度数据
+
+    {'countries': [...], 'labels': [...], 'default': 度量,
+     'metrics': {度量: {'name', 'matrix' (相似度), 'order' (聚类顺序), 'nearest': {国家: [[国家, 相似度], ...]}}}}
+    'Global Average' 的最相似国家即最接近全球平均口味的国家。
+    """
+    matrix, overall = share_matrix(df_plot)
+    countries = [str(c) for c in matrix.index]
+    P = matrix.to_numpy()
+    table = {'countries': countries, 'labels': [c.title() for c in countries], 'default': metrics[0], 'metrics': {}}
+    for metric in metrics:
+        distances = DISTANCES[metric](P)
+        np.fill_diagonal(distances, 0)
+        nearest = dict(zip(countries, most_similar(distances, countries, k)))
+        nearest[GLOBAL_AVERAGE] = most_similar(DISTANCES[metric](overall[None, :], P), countries, k,
+                                               exclude_self=False)[0]
+        table['metrics'][metric] = {
+            'name': METRICS[metric],
+            'matrix': np.round(1 - distances, decimals).tolist(),
+            'order': cluster_order(distances).tolist(),
+            'nearest': {country: [[other, round(float(s), decimals)] for other, s in pairs]
+                        for country, pairs in nearest.items()},
+        }
+    return table
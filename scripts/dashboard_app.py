@@ -0,0 +1,143 @@
+"""
+Act 2: 仪表盘应用（布局与回调）与构建产物
+只依赖 dash / dash-bootstrap-components 和标准库，不导入 pandas、plotly.express，
+数据处理脚本 dv_2-5.py 与精简服务入口 dashboard_server.py 共用这里的代码
+（图表的渲染代码见 dashboard_render）
+"""
+
+import json
+import os
+
+import dash
+import dash_bootstrap_components as dbc
+from dash import dcc, html, Input, Output, State
+
+from dashboard_render import (RENDER_GENRE_FIGURE_JS, RENDER_SIMILAR_FIGURE_JS, RENDER_SIMILARITY_HEATMAP_JS,
+                              render_similar_figure, render_similarity_heatmap)
+
+# 客户端模式：各国数据一次性嵌入页面，切换国家在浏览器中完成（ACT2_CLIENTSIDE=1 开启）
+CLIENTSIDE_MODE = os.environ.get('ACT2_CLIENTSIDE', '0') == '1'
+
+# 运行环境：ACT2_ENV=production 时关闭调试、开启压缩与静态资源缓存（见 wsgi.py）
+PRODUCTION = os.environ.get('ACT2_ENV', 'development') == 'production'
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+# 构建产物：各国家的流派占比、trace 模板、布局与下拉选项（dv_2-5.py --artifact 写出）
+ARTIFACT_PATH = os.environ.get('ACT2_ARTIFACT', 'top50_dashboard.json')
+ARTIFACT_FORMAT = 2
+
+DEFAULT_COUNTRY = 'Global Average'
+
+
+def write_artifact(store, options, path=ARTIFACT_PATH, default=DEFAULT_COUNTRY):
+    """写出服务进程启动所需的全部数据（紧凑 JSON，先写临时文件再替换）"""
+    artifact = {'format': ARTIFACT_FORMAT, 'default': default, 'options': options, 'store': store}
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(artifact, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+
+def load_artifact(path=ARTIFACT_PATH):
+    """读取构建产物；不存在时提示先运行构建"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found: run 'python dv_2-5.py --artifact' (or build.py) first")
+    with open(path, 'r', encoding='utf-8') as f:
+        artifact = json.load(f)
+    if artifact.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"{path} has format {artifact.get('format')!r}, expected {ARTIFACT_FORMAT}: rebuild it")
+    return artifact
+
+
+def create_app(options, store, get_figure, clientside=CLIENTSIDE_MODE, production=PRODUCTION,
+               default=DEFAULT_COUNTRY):
+    """
+    创建仪表盘应用
+
+    get_figure(country) 返回服务器端回调使用的图表 JSON；clientside=True 时
+    store 嵌入页面，由浏览器端渲染。相似度面板与热力图总是由 store['similarity'] 拼出。
+    """
+    similarity = store['similarity']
+    metric_options = [{'label': f" {entry['name']}  ", 'value': metric}
+                      for metric, entry in similarity['metrics'].items()]
+    app = dash.Dash(
+        __name__,
+        external_stylesheets=[dbc.themes.BOOTSTRAP],
+        compress=production,  # gzip/brotli 压缩响应（需要 flask-compress）
+        serve_locally=True    # 组件 JS 由本服务器提供，URL 带版本指纹
+    )
+    if production:
+        # 带指纹的 assets 可以长期缓存，内容变化时 URL 随之变化
+        app.server.config['SEND_FILE_MAX_AGE_DEFAULT'] = STATIC_MAX_AGE
+
+    # 应用布局 (App Layout - 英文)
+    app.layout = dbc.Container([
+        html.H1("Top 50 Music Tastes: A Global Dashboard (2019)", style={'textAlign': 'center', 'marginTop': '20px'}),
+        html.Hr(),
+        dbc.Row([
+            dbc.Col([
+                html.H4("Select a Country:"),
+                dcc.Dropdown(
+                    id='country-dropdown',
+                    options=options,
+                    value=default,  # 默认值
+                    clearable=False
+                )
+            ], width=4),
+            dbc.Col([
+                dcc.Graph(id='genre-detail-chart')
+            ], width=8)
+        ]),
+        html.Hr(),
+        dbc.Row([
+            dbc.Col([
+                html.H4("Countries with a Similar Taste:"),
+                dcc.RadioItems(id='similarity-metric', options=metric_options, value=similarity['default'],
+                               inline=True),
+                dcc.Graph(id='similar-countries-chart')
+            ], width=4),
+            dbc.Col([
+                dcc.Graph(id='similarity-heatmap')
+            ], width=8)
+        ]),
+        dcc.Store(id='genre-store', data=store if clientside else None)
+    ], fluid=True)
+
+    # 回调函数 (The Callback - 英文)
+    if clientside:
+        # 浏览器端根据嵌入的数据拼出图表，不再请求服务器
+        app.clientside_callback(
+            RENDER_GENRE_FIGURE_JS,
+            Output('genre-detail-chart', 'figure'),
+            Input('country-dropdown', 'value'),
+            State('genre-store', 'data')
+        )
+        app.clientside_callback(
+            RENDER_SIMILAR_FIGURE_JS,
+            Output('similar-countries-chart', 'figure'),
+            Input('country-dropdown', 'value'),
+            Input('similarity-metric', 'value'),
+            State('genre-store', 'data')
+        )
+        app.clientside_callback(
+            RENDER_SIMILARITY_HEATMAP_JS,
+            Output('similarity-heatmap', 'figure'),
+            Input('similarity-metric', 'value'),
+            State('genre-store', 'data')
+        )
+    else:
+        app.callback(
+            Output('genre-detail-chart', 'figure'),
+            Input('country-dropdown', 'value')
+        )(get_figure)
+        # 每个度量的热力图只拼一次；相似国家条形图很小，按需拼出
+        heatmaps = {metric: render_similarity_heatmap(metric, store) for metric in similarity['metrics']}
+        app.callback(
+            Output('similar-countries-chart', 'figure'),
+            Input('country-dropdown', 'value'),
+            Input('similarity-metric', 'value')
+        )(lambda country, metric: render_similar_figure(country, metric, store))
+        app.callback(
+            Output('similarity-heatmap', 'figure'),
+            Input('similarity-metric', 'value')
+        )(lambda metric: heatmaps.get(metric) or heatmaps[similarity['default']])
+    return app
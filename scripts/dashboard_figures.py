@@ -0,0 +1,238 @@
+"""
+Act 2: 仪表盘图表的构建与缓存
+每个国家的图表只渲染一次，之后回调直接返回缓存的图表 JSON
+"""
+
+import json
+from html import escape
+
+import pandas as pd
+import plotly.express as px
+
+from dashboard_render import (RENDER_GENRE_FIGURE_JS, RENDER_SIMILAR_FIGURE_JS, RENDER_SIMILARITY_HEATMAP_JS,
+                              LRUFigureCache)
+
+# (关键) 美化字典：颜色和图例顺序，全局只定义一次
+COLOR_MAP = {
+    'Other': 'lightgrey',
+    'Pop': 'gold',
+    'Hip Hop / Rap': 'deepskyblue',
+    'Latin': 'red',
+    'Electronic / Dance': 'purple',
+    'R&B': 'orange',
+    'Rock': 'darkred',
+    'Indie / Alternative': 'green',
+    'Brazilian': 'yellowgreen',
+    'K-Pop': 'pink',
+    'J-Pop': 'magenta',
+    'South Asian': 'brown'
+}
+
+
+def make_genre_figure(data_to_plot, selected_country):
+    """为一个国家（或 'Global Average'）创建流派占比堆叠条形图"""
+    title_text = f"Top 50 Genre Share: {selected_country.title()}"
+
+    # 创建图表 (fig)
+    fig = px.bar(
+        data_to_plot,
+        x='Percentage',
+        y='Country',  # 这将是 'Global Average' 或 'Japan' 等
+        color='Genre',
+        orientation='h',
+        barmode='stack',
+        title=title_text,
+        template='simple_white',
+        color_discrete_map=COLOR_MAP,
+        category_orders={'Genre': list(COLOR_MAP.keys())}  # 确保颜色和顺序一致
+    )
+
+    # 美化图表 (Aesthetics - 英文)
+    fig.update_layout(
+        xaxis=dict(ticksuffix='%', range=[0, 1], title='Percentage of Top 50 Songs'),
+        yaxis=dict(showticklabels=False, title=''),  # 隐藏Y轴标签
+        legend_title_text='Meta-Genre',
+        font=dict(family="Arial", size=12),
+        margin=dict(l=10, r=10, t=50, b=10),  # 调整边距
+        height=400  # 设置固定高度
+    )
+    fig.update_traces(hovertemplate='<b>%{data.name}</b>: %{x:.1%}<extra></extra>')
+
+    return fig
+
+
+def genre_share_table(df, country_col='country', genre_col='meta_genre'):
+    """各国家的流派占比，加上全球平均（作为虚拟国家 'Global Average'），列为 Country/Genre/Percentage"""
+    # (关键) 聚合国家数据
+    df_countries_agg = df.groupby(country_col)[genre_col].value_counts(normalize=True).reset_index(name='Percentage')
+
+    # (关键) 聚合全球平均
+    df_global_avg = df[genre_col].value_counts(normalize=True).reset_index()
+    df_global_avg.columns = ['Genre', 'Percentage']
+    df_global_avg['Country'] = 'Global Average'  # 添加一个虚拟的国家名
+
+    # 合并数据
+    return pd.concat([
+        df_countries_agg.rename(columns={country_col: 'Country', genre_col: 'Genre'}),
+        df_global_avg
+    ], ignore_index=True)
+
+
+def index_by_country(df_plot):
+    """按国家分组建立索引，代替每次回调时对整表做布尔过滤"""
+    return {country: frame for country, frame in df_plot.groupby('Country', sort=False)}
+
+
+class FigureCache(LRUFigureCache):
+    """
+    有容量上限的 LRU 图表缓存（见 dashboard_render.LRUFigureCache）
+
+    由各国家的分组数据经 plotly 渲染图表 JSON；prerender() 渲染全部国家。
+    """
+
+    def __init__(self, country_frames, maxsize=128):
+        super().__init__(maxsize=maxsize, countries=country_frames)
+        self.country_frames = country_frames
+        # 未知国家时使用的空表（与其它分组结构相同）
+        self._empty = next(iter(country_frames.values())).iloc[:0] if country_frames else None
+
+    def render(self, country):
+        """渲染一个国家的图表 JSON（不经过缓存）"""
+        data_to_plot = self.country_frames.get(country, self._empty)
+        return json.loads(make_genre_figure(data_to_plot, country).to_json())
+
+
+# ---- 客户端渲染模式：数据一次性嵌入页面，切换国家不再请求服务器 ----
+# （浏览器端的渲染代码 RENDER_GENRE_FIGURE_JS 见 dashboard_render）
+
+def build_clientside_store(country_frames, figure_cache, similarity):
+    """
+    生成嵌入页面的数据：各国家的流派占比，加上一份共享的 trace 模板和布局，
+    以及国家相似度（country_similarity.similarity_table 的结果）
+
+    模板和布局取自服务器端渲染的图表，保证两种模式的外观一致。
+    """
+    reference = figure_cache.render('Global Average')
+    trace = {k: v for k, v in reference['data'][0].items() if k not in ('name', 'legendgroup', 'x', 'y')}
+    trace['marker'] = {k: v for k, v in trace['marker'].items() if k != 'color'}
+    layout = {k: v for k, v in reference['layout'].items() if k != 'title'}
+
+    shares = {}
+    titles = {}
+    for country, frame in country_frames.items():
+        shares[country] = {genre: float(pct) for genre, pct in zip(frame['Genre'], frame['Percentage'])}
+        titles[country] = f"Top 50 Genre Share: {country.title()}"
+
+    # 规则表之外出现的流派排在最后（与 category_orders 的行为一致）
+    genres = list(COLOR_MAP.keys())
+    for country_shares in shares.values():
+        genres += [g for g in country_shares if g not in genres]
+
+    return {
+        'genres': genres,
+        'colors': COLOR_MAP,
+        'shares': shares,
+        'titles': titles,
+        'trace': trace,
+        'layout': layout,
+        'similarity': similarity,
+    }
+
+
+STANDALONE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Top 50 Music Tastes: A Global Dashboard (2019)</title>
+    <script src="https://cdn.plot.ly/plotly-2.35.2.min.js"></script>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 20px; background-color: #f8f9fa; }}
+        h1 {{ text-align: center; color: #2c3e50; }}
+        .container {{ display: flex; gap: 20px; }}
+        .sidebar {{ width: 300px; background: white; padding: 20px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
+        .main-content {{ flex: 1; background: white; padding: 20px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
+        select {{ width: 100%; padding: 6px; font-size: 14px; }}
+        .metric {{ margin: 10px 0; }}
+    </style>
+</head>
+<body>
+    <h1>Top 50 Music Tastes: A Global Dashboard (2019)</h1>
+    <hr>
+    <div class="container">
+        <div class="sidebar">
+            <h4>Select a Country:</h4>
+            <select id="country-dropdown">{options}</select>
+        </div>
+        <div class="main-content">
+            <div id="genre-detail-chart"></div>
+        </div>
+    </div>
+    <hr>
+    <div class="container">
+        <div class="sidebar">
+            <h4>Countries with a Similar Taste:</h4>
+            <div class="metric" id="similarity-metric">{metric_options}</div>
+            <div id="similar-countries-chart"></div>
+        </div>
+        <div class="main-content">
+            <div id="similarity-heatmap"></div>
+        </div>
+    </div>
+    <script>
+        const store = {store};
+        const renderGenreFigure = {render_js};
+        const renderSimilarFigure = {similar_js};
+        const renderSimilarityHeatmap = {heatmap_js};
+
+        function draw(id, figure) {{
+            Plotly.react(id, figure.data, figure.layout, {{responsive: true}});
+        }}
+
+        function selectedMetric() {{
+            return document.querySelector('input[name="similarity-metric"]:checked').value;
+        }}
+
+        function updateChart(country) {{
+            draw('genre-detail-chart', renderGenreFigure(country, store));
+            draw('similar-countries-chart', renderSimilarFigure(country, selectedMetric(), store));
+        }}
+
+        function updateMetric() {{
+            draw('similarity-heatmap', renderSimilarityHeatmap(selectedMetric(), store));
+            updateChart(dropdown.value);
+        }}
+
+        const dropdown = document.getElementById('country-dropdown');
+        dropdown.addEventListener('change', function() {{ updateChart(this.value); }});
+        document.querySelectorAll('input[name="similarity-metric"]').forEach(function(input) {{
+            input.addEventListener('change', updateMetric);
+        }});
+        updateMetric();
+    </script>
+</body>
+</html>
+"""
+
+
+def write_standalone_html(store, options, path, default='Global Average'):
+    """写出不依赖 Python 服务器的独立仪表盘页面（数据与渲染逻辑同客户端模式）"""
+    option_tags = ''.join(
+        f'<option value="{escape(o["value"])}"{" selected" if o["value"] == default else ""}>{escape(o["label"])}</option>'
+        for o in options
+    )
+    similarity = store['similarity']
+    metric_tags = ''.join(
+        f'<label><input type="radio" name="similarity-metric" value="{escape(metric)}"'
+        f'{" checked" if metric == similarity["default"] else ""}> {escape(entry["name"])}</label> '
+        for metric, entry in similarity['metrics'].items()
+    )
+    page = STANDALONE_TEMPLATE.format(
+        options=option_tags,
+        metric_options=metric_tags,
+        store=json.dumps(store, ensure_ascii=False).replace('</', '<\\/'),
+        render_js=RENDER_GENRE_FIGURE_JS.strip(),
+        similar_js=RENDER_SIMILAR_FIGURE_JS.strip(),
+        heatmap_js=RENDER_SIMILARITY_HEATMAP_JS.strip(),
+    )
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(page)
@@ -0,0 +1,215 @@
+"""
+Act 2: 仪表盘图表的渲染代码与 LRU 图表缓存
+只依赖标准库：浏览器端渲染用的 JS 与其 Python 版本（由嵌入数据拼出图表 JSON），
+供 dashboard_app（dash）、dashboard_figures（pandas / plotly）与 dashboard_server 共用
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+
+# 由聚合数据在浏览器端拼出图表；Dash 的 clientside callback 与独立 HTML 共用这一段代码
+RENDER_GENRE_FIGURE_JS = """
+function(country, store) {
+    var shares = store.shares[country] || {};
+    var data = store.genres.filter(function(genre) {
+        return shares.hasOwnProperty(genre);
+    }).map(function(genre) {
+        var trace = JSON.parse(JSON.stringify(store.trace));
+        trace.name = genre;
+        trace.legendgroup = genre;
+        trace.marker.color = store.colors[genre];
+        trace.x = [shares[genre]];
+        trace.y = [country];
+        return trace;
+    });
+    var layout = Object.assign({}, store.layout, {
+        title: {text: store.titles[country] || country}
+    });
+    return {data: data, layout: layout};
+}
+"""
+
+
+# 国家相似度面板与聚类热力图（数据见 country_similarity.similarity_table，嵌入在 store['similarity']）
+RENDER_SIMILAR_FIGURE_JS = """
+function(country, metric, store) {
+    var sim = store.similarity;
+    var entry = sim.metrics[metric] || sim.metrics[sim.default];
+    var pairs = (entry.nearest[country] || []).slice().reverse();
+    var labels = {};
+    sim.countries.forEach(function(name, i) { labels[name] = sim.labels[i]; });
+    var data = [{
+        type: 'bar', orientation: 'h', marker: {color: 'steelblue'},
+        x: pairs.map(function(pair) { return pair[1]; }),
+        y: pairs.map(function(pair) { return labels[pair[0]] || pair[0]; }),
+        hovertemplate: '<b>%{y}</b>: %{x:.3f}<extra></extra>'
+    }];
+    var layout = {
+        template: store.layout.template,
+        title: {text: 'Most Similar to ' + (labels[country] || country)},
+        xaxis: {range: [0, 1], title: {text: entry.name + ' similarity'}},
+        font: {family: 'Arial', size: 12},
+        margin: {l: 10, r: 10, t: 50, b: 40},
+        yaxis: {automargin: true},
+        height: 400
+    };
+    return {data: data, layout: layout};
+}
+"""
+
+RENDER_SIMILARITY_HEATMAP_JS = """
+function(metric, store) {
+    var sim = store.similarity;
+    var entry = sim.metrics[metric] || sim.metrics[sim.default];
+    var names = entry.order.map(function(i) { return sim.labels[i]; });
+    var data = [{
+        type: 'heatmap', x: names, y: names, zmin: 0, zmax: 1, colorscale: 'Viridis',
+        z: entry.order.map(function(i) { return entry.order.map(function(j) { return entry.matrix[i][j]; }); }),
+        colorbar: {title: {text: 'Similarity'}},
+        hovertemplate: '%{y} / %{x}: %{z:.3f}<extra></extra>'
+    }];
+    var layout = {
+        template: store.layout.template,
+        title: {text: 'Taste Similarity Between Countries (' + entry.name + ', clustered)'},
+        xaxis: {tickangle: -45, automargin: true},
+        yaxis: {autorange: 'reversed', automargin: true},
+        font: {family: 'Arial', size: 12},
+        margin: {l: 10, r: 10, t: 50, b: 10},
+        height: 650
+    };
+    return {data: data, layout: layout};
+}
+"""
+
+
+def render_genre_figure(country, store):
+    """RENDER_GENRE_FIGURE_JS 的 Python 版本：由嵌入数据拼出图表 JSON，无需 plotly"""
+    shares = store['shares'].get(country, {})
+    data = []
+    for genre in store['genres']:
+        if genre not in shares:
+            continue
+        trace = copy.deepcopy(store['trace'])
+        trace['name'] = genre
+        trace['legendgroup'] = genre
+        if genre in store['colors']:
+            trace['marker']['color'] = store['colors'][genre]
+        trace['x'] = [shares[genre]]
+        trace['y'] = [country]
+        data.append(trace)
+    layout = dict(store['layout'], title={'text': store['titles'].get(country, country)})
+    return {'data': data, 'layout': layout}
+
+
+def _similarity_entry(metric, store):
+    sim = store['similarity']
+    return sim['metrics'].get(metric) or sim['metrics'][sim['default']]
+
+
+def render_similar_figure(country, metric, store):
+    """RENDER_SIMILAR_FIGURE_JS 的 Python 版本：与 country 最相似的国家条形图"""
+    sim = store['similarity']
+    entry = _similarity_entry(metric, store)
+    labels = dict(zip(sim['countries'], sim['labels']))
+    pairs = entry['nearest'].get(country, [])[::-1]
+    data = [{
+        'type': 'bar', 'orientation': 'h', 'marker': {'color': 'steelblue'},
+        'x': [similarity for _, similarity in pairs],
+        'y': [labels.get(name, name) for name, _ in pairs],
+        'hovertemplate': '<b>%{y}</b>: %{x:.3f}<extra></extra>',
+    }]
+    layout = {
+        'template': store['layout'].get('template'),
+        'title': {'text': f"Most Similar to {labels.get(country, country)}"},
+        'xaxis': {'range': [0, 1], 'title': {'text': f"{entry['name']} similarity"}},
+        'font': {'family': 'Arial', 'size': 12},
+        'margin': {'l': 10, 'r': 10, 't': 50, 'b': 40},
+        'yaxis': {'automargin': True},
+        'height': 400,
+    }
+    return {'data': data, 'layout': layout}
+
+
+def render_similarity_heatmap(metric, store):
+    """RENDER_SIMILARITY_HEATMAP_JS 的 Python 版本：按聚类顺序排列的国家相似度热力图"""
+    sim = store['similarity']
+    entry = _similarity_entry(metric, store)
+    order = entry['order']
+    names = [sim['labels'][i] for i in order]
+    data = [{
+        'type': 'heatmap', 'x': names, 'y': names, 'zmin': 0, 'zmax': 1, 'colorscale': 'Viridis',
+        'z': [[entry['matrix'][i][j] for j in order] for i in order],
+        'colorbar': {'title': {'text': 'Similarity'}},
+        'hovertemplate': '%{y} / %{x}: %{z:.3f}<extra></extra>',
+    }]
+    layout = {
+        'template': store['layout'].get('template'),
+        'title': {'text': f"Taste Similarity Between Countries ({entry['name']}, clustered)"},
+        'xaxis': {'tickangle': -45, 'automargin': True},
+        'yaxis': {'autorange': 'reversed', 'automargin': True},
+        'font': {'family': 'Arial', 'size': 12},
+        'margin': {'l': 10, 'r': 10, 't': 50, 'b': 10},
+        'height': 650,
+    }
+    return {'data': data, 'layout': layout}
+
+
+class LRUFigureCache:
+    """
+    有容量上限的 LRU 图表缓存，带命中统计
+
+    缓存的是图表的 JSON 结构（纯 dict/list），回调返回时无需再从 Figure 对象转换。
+    render(country) 由构造参数或子类提供；prerender() 默认渲染 countries 中的全部国家。
+    """
+
+    def __init__(self, render=None, maxsize=128, countries=()):
+        if render is not None:
+            self.render = render
+        self.countries = countries
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(self, country):
+        """渲染一个国家的图表 JSON（不经过缓存）"""
+        raise NotImplementedError
+
+    def get(self, country):
+        """返回缓存的图表，未命中时渲染并放入缓存"""
+        with self._lock:
+            figure = self._figures.get(country)
+            if figure is not None:
+                self._figures.move_to_end(country)
+                self.hits += 1
+                return figure
+            self.misses += 1
+
+        figure = self.render(country)
+        self._put(country, figure)
+        return figure
+
+    def _put(self, country, figure):
+        with self._lock:
+            self._figures[country] = figure
+            if len(self._figures) > self.maxsize:
+                self._figures.popitem(last=False)
+
+    def prerender(self, countries=None):
+        """启动时预先渲染所有（或指定）国家的图表"""
+        for country in (self.countries if countries is None else countries):
+            self._put(country, self.render(country))
+
+    def stats(self):
+        """缓存命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._figures),
+                'maxsize': self.maxsize,
+            }
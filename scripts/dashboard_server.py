@@ -0,0 +1,36 @@
+"""
+Act 2 仪表盘的精简服务入口
+只读取构建产物（python dv_2-5.py --artifact 写出的 JSON），不导入 pandas / plotly.express，
+也不读取原始 CSV：worker 启动更快、内存更少
+
+    python dashboard_server.py          # 开发服务器
+    gunicorn -c gunicorn.conf.py wsgi:server
+"""
+
+from dashboard_app import ARTIFACT_PATH, PRODUCTION, create_app, load_artifact
+from dashboard_render import LRUFigureCache, render_genre_figure
+
+# 图表缓存容量上限（与 dv_2-5.py 相同）；未知的国家值不会让缓存无限增长
+FIGURE_CACHE_SIZE = 128
+
+artifact = load_artifact(ARTIFACT_PATH)
+store = artifact['store']
+
+# 启动时由嵌入数据拼出每个国家的图表 JSON（纯 Python，与浏览器端渲染一致）
+figure_cache = LRUFigureCache(lambda country: render_genre_figure(country, store), maxsize=FIGURE_CACHE_SIZE,
+                              countries=store['shares'])
+figure_cache.prerender()
+
+app = create_app(artifact['options'], store, figure_cache.get, default=artifact['default'])
+# 供 gunicorn/waitress 等 WSGI 服务器使用
+server = app.server
+
+
+# 缓存命中统计（运维查看）
+@server.route('/cache-stats')
+def cache_stats():
+    return dict(figure_cache.stats(), artifact=ARTIFACT_PATH)
+
+
+if __name__ == '__main__':
+    app.run(debug=not PRODUCTION)
@@ -0,0 +1,155 @@
+"""
+数据加载：CSV → 列式缓存 (Parquet)
+首次读取时把 CSV 解析并压缩类型后写入缓存，之后只读取脚本声明的列
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Parquet 读写依赖 pyarrow；只检查是否安装，不在这里导入
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+CACHE_DIR_NAME = '.data_cache'
+
+# 数据目录：设置 MUSIC_DATA_DIR 后相对路径的数据集从该目录读取（build.py 使用），否则相对当前目录
+DATA_DIR = os.environ.get('MUSIC_DATA_DIR', '')
+
+# 各数据集的读取参数：编码以及需要转成 category 的文本列
+DATASETS = {
+    'ClassicHit.csv': dict(categorical=['Artist', 'Genre']),
+    'top50contry.csv': dict(encoding='latin1', categorical=['artist', 'top genre', 'country']),
+    'data.csv': dict(categorical=['artists']),
+}
+
+
+def file_signature(path):
+    """源文件的大小与修改时间，用于快速判断缓存是否过期"""
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """源文件内容的 SHA-1；大小/修改时间变化时用它确认内容是否真的改变"""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_signature(path):
+    """写入派生缓存元数据的源文件签名：大小、修改时间与内容哈希"""
+    return dict(file_signature(path), sha1=file_hash(path))
+
+
+def source_unchanged(meta, path):
+    """元数据中记录的源文件签名是否仍对应当前文件：先比大小/修改时间，不一致再比内容哈希"""
+    signature = file_signature(path)
+    if meta.get('size') != signature['size']:
+        return False
+    return meta.get('mtime_ns') == signature['mtime_ns'] or meta.get('sha1') == file_hash(path)
+
+
+def derived_path(path, suffix, cache_dir=None):
+    """数据集派生缓存（近邻索引、投影坐标等）的文件路径前缀，与列式缓存放在同一目录"""
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    return os.path.join(cache_dir, f"{os.path.basename(path)}.{suffix}")
+
+
+def downcast_frame(df, categorical=()):
+    """压缩数据类型：浮点转 float32，整数取最小宽度，指定文本列转 category"""
+    for col in df.columns:
+        dtype = df[col].dtype
+        if col in categorical:
+            df[col] = df[col].astype('category')
+        elif pd.api.types.is_float_dtype(dtype):
+            df[col] = df[col].astype(np.float32)
+        elif pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+def _cache_paths(path, cache_dir):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    stem = os.path.basename(path)
+    return cache_dir, os.path.join(cache_dir, stem + '.parquet'), os.path.join(cache_dir, stem + '.meta.json')
+
+
+def _cache_is_fresh(path, data_path, meta_path, downcast):
+    """缓存是否仍对应当前的源文件：先比大小/修改时间，不一致再比内容哈希"""
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return False
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('downcast') != downcast:
+        return False
+
+    signature = file_signature(path)
+    if meta.get('size') == signature['size'] and meta.get('mtime_ns') == signature['mtime_ns']:
+        return True
+    if meta.get('size') != signature['size'] or meta.get('sha1') != file_hash(path):
+        return False
+
+    # 内容没变（例如只是被 touch 过），更新签名后继续使用缓存
+    meta.update(signature)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return True
+
+
+def build_cache(path, encoding='utf-8', categorical=(), downcast=True, cache_dir=None):
+    """解析整个 CSV 并写入列式缓存，返回解析后的 DataFrame"""
+    cache_dir, data_path, meta_path = _cache_paths(path, cache_dir)
+    df = pd.read_csv(path, encoding=encoding)
+    if downcast:
+        df = downcast_frame(df, categorical)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = data_path + '.tmp'
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, data_path)
+
+    meta = dict(file_signature(path), sha1=file_hash(path), downcast=downcast, rows=len(df))
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return df
+
+
+def load_csv(path, columns=None, encoding='utf-8', categorical=(), downcast=True, cache_dir=None):
+    """
+    通过列式缓存读取 CSV
+
+    缓存不存在或已过期时先重建；只返回 columns 中声明的列（None 表示全部）。
+    没有安装 pyarrow 时直接读取 CSV，同样只解析声明的列并压缩类型。
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+
+    if not HAS_PYARROW:
+        df = pd.read_csv(path, encoding=encoding, usecols=columns)
+        return downcast_frame(df, categorical) if downcast else df
+
+    cache_dir, data_path, meta_path = _cache_paths(path, cache_dir)
+    if not _cache_is_fresh(path, data_path, meta_path, downcast):
+        df = build_cache(path, encoding, categorical, downcast, cache_dir)
+        return df[columns].copy() if columns is not None else df
+
+    return pd.read_parquet(data_path, columns=columns)
+
+
+def dataset_path(path):
+    """数据集文件的实际路径：相对路径按 DATA_DIR 解析"""
+    return os.path.join(DATA_DIR, path) if DATA_DIR and not os.path.isabs(path) else path
+
+
+def load_dataset(path, columns=None, downcast=True, cache_dir=None):
+    """按 DATASETS 中登记的参数读取已知数据集"""
+    spec = DATASETS.get(os.path.basename(path), {})
+    return load_csv(dataset_path(path), columns=columns, downcast=downcast, cache_dir=cache_dir, **spec)
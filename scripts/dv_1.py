@@ -1,142 +1,102 @@
 # 导入所需的库
-import pandas as pd
+import json
+import os
+import sys
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
-import numpy as np
+
+from chart_export import export_figure
+from data_cache import dataset_path, load_dataset
+from genre_cube import GenreCube
+from genre_grid import aggregate_genre_years, genre_series_table, pivot_genre_grid
+from genre_rules import ACT1_GENRE_RULES, GenreClassifier
+from genre_state import GenreShareState, load_genre_state, state_path
+from stage_trace import record, step
+
+# 交互模式（python dv_1.py --interactive）：另外写出 genre_trends_interactive.html，
+# 页面内嵌预聚合的 年份×流派 计数立方体，切换分辨率（逐年 / 5 年 / 10 年）与流派子集都在浏览器中完成
+INTERACTIVE = '--interactive' in sys.argv
+# ACT1_CUBE_ARTISTS=1 时立方体同时保存按艺人的计数，交互页面可按艺人筛选
+CUBE_ARTISTS = os.environ.get('ACT1_CUBE_ARTISTS', '0') == '1'
+# ACT1_INCREMENTAL=1 时在 .data_cache 中保存 年份×流派 计数与占比（见 genre_state.py）：
+# ClassicHit.csv 只是追加了新行时，只解析、归类并累加新行，只重算受影响的年份与插值区间；
+# 已摄入部分的开头或末尾被改写、规则或格式变化时自动全量重建（改动了中间的行时删除
+# .data_cache 中的 ClassicHit.csv.genre-state.json）。增量模式下不按艺人计数
+INCREMENTAL = os.environ.get('ACT1_INCREMENTAL', '0') == '1'
+SOURCE_PATH = dataset_path('ClassicHit.csv')
+STATE_PATH = state_path(SOURCE_PATH)
+all_years = range(1923, 2024)
 
 # 第1步：导入与加载
-print("正在加载数据...")
+step('load', "正在加载数据...")
+state = load_genre_state(STATE_PATH, SOURCE_PATH, all_years, ACT1_GENRE_RULES) if INCREMENTAL else None
 try:
-    df = pd.read_csv('ClassicHit.csv')
-    print(f"数据加载成功，共 {len(df)} 行数据")
+    if state is not None:
+        df, source_end = state.read_appended(SOURCE_PATH, ['Year', 'Genre'])
+        record(rows=len(df), ingested=state.rows_ingested)
+        print(f"增量模式：读取新追加的 {len(df)} 行数据（此前已摄入 {state.rows_ingested} 行）")
+    else:
+        source_end = os.path.getsize(SOURCE_PATH) if INCREMENTAL else None
+        df = load_dataset('ClassicHit.csv', columns=['Year', 'Genre'] + (
+            ['Artist'] if INTERACTIVE and CUBE_ARTISTS and not INCREMENTAL else []))
+        record(rows=len(df))
+        print(f"数据加载成功，共 {len(df)} 行数据")
 except FileNotFoundError:
-    print("错误：'ClassicHit.csv' 文件未找到。请确保该文件与脚本在同一目录下。")
+    print(f"错误：数据文件未找到：{SOURCE_PATH}（可用 MUSIC_DATA_DIR 指定数据目录）")
     raise
 
 # 第2步：数据清洗与流派细分 (关键步骤)
-print("正在处理数据...")
+step('classify', "正在处理数据...")
 
 # 过滤时间：筛选 1923-2023 年的数据（横跨一个世纪）
 df = df.dropna(subset=['Year', 'Genre'])
 df = df[(df['Year'] >= 1923) & (df['Year'] <= 2023)]
 
-# 创建"高保真"流派映射函数
-def high_fidelity_genre_mapping(genre):
-    """高保真流派映射，几乎消除 'Other' 类别"""
-    if not isinstance(genre, str):
-        return 'Other'
-    
-    genre_lower = genre.lower()
-    
-    # 精确匹配规则
-    if 'pop' in genre_lower and 'soft rock' not in genre_lower:
-        return 'Pop'
-    elif 'soft rock' in genre_lower:
-        return 'Soft Rock'
-    elif 'alt' in genre_lower and 'rock' in genre_lower:
-        return 'Alternative Rock'
-    elif 'hard rock' in genre_lower:
-        return 'Hard Rock'
-    elif 'punk' in genre_lower:
-        return 'Punk'
-    elif 'hip hop' in genre_lower or 'hip-hop' in genre_lower:
-        return 'Hip Hop'
-    elif 'r&b' in genre_lower or 'rnb' in genre_lower:
-        return 'R&B'
-    elif 'funk' in genre_lower:
-        return 'Funk'
-    elif 'jazz' in genre_lower:
-        return 'Jazz'
-    elif 'blues' in genre_lower:
-        return 'Blues'
-    elif 'country' in genre_lower:
-        return 'Country'
-    elif 'electronic' in genre_lower or 'edm' in genre_lower:
-        return 'Electronic'
-    elif 'rock' in genre_lower:
-        return 'Rock'  # 通用 Rock 类别
-    elif 'soul' in genre_lower:
-        return 'Soul'
-    elif 'disco' in genre_lower:
-        return 'Disco'
-    elif 'reggae' in genre_lower:
-        return 'Reggae'
-    elif 'folk' in genre_lower:
-        return 'Folk'
-    else:
-        return 'Other'
+# 应用"高保真"流派映射（规则表见 genre_rules.ACT1_GENRE_RULES），几乎消除 'Other' 类别
+genre_classifier = GenreClassifier(ACT1_GENRE_RULES)
+df['main_genre'] = genre_classifier.classify(df['Genre'])
 
-# 应用流派映射
-df['main_genre'] = df['Genre'].apply(high_fidelity_genre_mapping)
+if INCREMENTAL:
+    # 累加这批歌曲的计数，只重算受影响的年份与插值区间（首次运行时整份数据就是第一批）
+    step('ingest', "正在累加新数据...")
+    if state is None:
+        state = GenreShareState(all_years, rules=ACT1_GENRE_RULES)
+    affected_years = state.ingest(df)
+    state.mark_read(SOURCE_PATH, source_end)
+    state.save(STATE_PATH)
+    record(rows=len(df), years=len(affected_years))
+    print(f"更新了 {len(affected_years)} 个年份，累计 {state.rows_ingested} 首歌曲")
+    df_counts, df_shares = state.frames()
+else:
+    # 聚合数据
+    df_agg = aggregate_genre_years(df)
 
-# 聚合数据
-df_agg = df.groupby(['Year', 'main_genre']).size().reset_index(name='Count')
-total_yearly_count = df_agg.groupby('Year')['Count'].transform('sum')
-df_agg['Percentage'] = df_agg['Count'] / total_yearly_count
+    # 处理缺失值：一次性构建完整的 年份×流派 矩阵并按流派线性插值
+    step('complete_grid', "正在处理缺失值...")
+    all_genres = df_agg['main_genre'].unique()
 
-# 处理缺失值：为每个流派创建完整的年份序列
-print("正在处理缺失值...")
-all_years = range(1923, 2024)
-all_genres = df_agg['main_genre'].unique()
-
-# 创建完整的年份-流派组合
-complete_data = []
-for year in all_years:
-    for genre in all_genres:
-        existing = df_agg[(df_agg['Year'] == year) & (df_agg['main_genre'] == genre)]
-        if len(existing) > 0:
-            complete_data.append({
-                'Year': year,
-                'main_genre': genre,
-                'Count': existing.iloc[0]['Count'],
-                'Percentage': existing.iloc[0]['Percentage']
-            })
-        else:
-            # 缺失值处理：使用线性插值或设为0
-            complete_data.append({
-                'Year': year,
-                'main_genre': genre,
-                'Count': 0,
-                'Percentage': 0.0
-            })
-
-df_complete = pd.DataFrame(complete_data)
-
-# 对每个流派进行线性插值处理缺失值
-for genre in all_genres:
-    genre_data = df_complete[df_complete['main_genre'] == genre].copy()
-    genre_data = genre_data.sort_values('Year')
-    
-    # 使用线性插值填充缺失的百分比值
-    genre_data['Percentage'] = genre_data['Percentage'].replace(0, np.nan)
-    genre_data['Percentage'] = genre_data['Percentage'].interpolate(method='linear', limit_direction='both')
-    genre_data['Percentage'] = genre_data['Percentage'].fillna(0)
-    
-    # 更新完整数据
-    df_complete.loc[df_complete['main_genre'] == genre, 'Percentage'] = genre_data['Percentage'].values
+    # 宽表：行是年份，列是流派，可直接用于堆叠面积图
+    df_counts, df_shares = pivot_genre_grid(df_agg, all_years, all_genres)
 
 # 获取所有独特流派
-unique_genres = df_complete['main_genre'].unique()
+unique_genres = df_shares.columns
 print(f"发现 {len(unique_genres)} 个独特流派: {list(unique_genres)}")
 
 # 第3步：创建堆叠面积图
-print("正在创建堆叠面积图...")
+step('figure', "正在创建堆叠面积图...")
 
 # 使用 plotly.express 创建堆叠面积图
 fig = px.area(
-    df_complete,
-    x='Year',
-    y='Percentage',
-    color='main_genre',
+    df_shares,
     title='The Evolution of Music Genres (1923-2023)',
-    labels={'Percentage': 'Share %', 'Year': 'Year', 'main_genre': 'Genre'},
+    labels={'value': 'Share %', 'Year': 'Year', 'main_genre': 'Genre'},
     template='simple_white',
     color_discrete_sequence=px.colors.qualitative.Set3
 )
 
 # 第4步：美化与交互性
-print("正在美化图表...")
+step('style', "正在美化图表...")
 
 fig.update_layout(
     template='simple_white',
@@ -172,77 +132,70 @@ fig.update_traces(
 )
 
 # 第5步：添加点击弹窗功能
-print("正在添加交互功能...")
-
-# 添加自定义 JavaScript 来实现点击弹窗
-custom_js = """
-<script>
-// 添加点击事件监听器
-document.addEventListener('DOMContentLoaded', function() {
-    const plotDiv = document.querySelector('.plotly-graph-div');
-    
-    plotDiv.on('plotly_click', function(data) {
-        const point = data.points[0];
-        const genre = point.data.name;
-        
-        // 创建弹窗内容
-        const popupContent = `
-            <div style="position: fixed; top: 50%; left: 50%; transform: translate(-50%, -50%); 
-                       background: white; border: 2px solid #333; border-radius: 10px; 
-                       padding: 20px; box-shadow: 0 4px 20px rgba(0,0,0,0.3); z-index: 1000;
-                       max-width: 80%; max-height: 80%; overflow: auto;">
-                <h3 style="margin-top: 0; color: #333;">${genre} - Individual Trend</h3>
-                <div id="individual-chart" style="width: 100%; height: 400px;"></div>
-                <button onclick="this.parentElement.remove()" 
-                        style="position: absolute; top: 10px; right: 10px; 
-                               background: #ff4444; color: white; border: none; 
-                               border-radius: 50%; width: 30px; height: 30px; cursor: pointer;">×</button>
-            </div>
-        `;
-        
-        // 添加弹窗到页面
-        document.body.insertAdjacentHTML('beforeend', popupContent);
-        
-        // 创建单独的趋势图
-        const genreData = ${JSON.stringify(df_complete.filter(d => d.main_genre === genre))};
-        
-        const individualTrace = {
-            x: genreData.map(d => d.Year),
-            y: genreData.map(d => d.Percentage),
-            type: 'scatter',
-            mode: 'lines+markers',
-            name: genre,
-            line: {color: point.data.line.color, width: 3},
-            marker: {size: 6}
-        };
-        
-        const layout = {
-            title: `${genre} Trend (1923-2023)`,
-            xaxis: {title: 'Year'},
-            yaxis: {title: 'Share %', ticksuffix: '%'},
-            template: 'simple_white',
-            height: 400
-        };
-        
-        Plotly.newPlot('individual-chart', [individualTrace], layout);
-    });
-});
-</script>
-"""
+step('popup', "正在添加交互功能...")
 
-# 第6步：保存文件
-print("正在保存文件...")
-fig.write_html("genre_trends_stacked.html")
+# 点击弹窗：每个流派的 (年份, 占比) 序列预先算好，作为查找表嵌入页面，
+# 通过 post_script 在图表创建后绑定点击事件（{plot_id} 由 Plotly 替换为图表 div 的 id）
+popup_js = """
+const plotDiv = document.getElementById('{plot_id}');
+const genreSeries = %s;
+
+plotDiv.on('plotly_click', function(data) {
+    const point = data.points[0];
+    const genre = point.data.name;
+    const shares = genreSeries.shares[genre];
+    if (!shares) return;
+
+    // 同一时间只保留一个弹窗
+    const previous = document.getElementById('genre-popup');
+    if (previous) previous.remove();
+
+    // 创建弹窗内容
+    const popupContent = `
+        <div id="genre-popup" style="position: fixed; top: 50%%; left: 50%%; transform: translate(-50%%, -50%%);
+                   background: white; border: 2px solid #333; border-radius: 10px;
+                   padding: 20px; box-shadow: 0 4px 20px rgba(0,0,0,0.3); z-index: 1000;
+                   width: 80%%; max-height: 80%%; overflow: auto;">
+            <h3 style="margin-top: 0; color: #333;">${genre} - Individual Trend</h3>
+            <div id="individual-chart" style="width: 100%%; height: 400px;"></div>
+            <button onclick="this.parentElement.remove()"
+                    style="position: absolute; top: 10px; right: 10px;
+                           background: #ff4444; color: white; border: none;
+                           border-radius: 50%%; width: 30px; height: 30px; cursor: pointer;">×</button>
+        </div>
+    `;
+
+    // 添加弹窗到页面
+    document.body.insertAdjacentHTML('beforeend', popupContent);
 
-# 添加自定义 JavaScript 到 HTML 文件
-with open("genre_trends_stacked.html", "r", encoding="utf-8") as f:
-    html_content = f.read()
+    // 直接使用内存中的序列创建单独的趋势图
+    const individualTrace = {
+        x: genreSeries.years,
+        y: shares,
+        type: 'scatter',
+        mode: 'lines+markers',
+        name: genre,
+        line: {color: point.data.line.color, width: 3},
+        marker: {size: 6},
+        hovertemplate: 'Year: %%{x}<br>Share: %%{y:.1%%}<extra></extra>'
+    };
 
-# 在 </body> 标签前插入自定义 JavaScript
-html_content = html_content.replace("</body>", custom_js + "</body>")
+    const layout = {
+        title: {text: `${genre} Trend (1923-2023)`},
+        xaxis: {title: {text: 'Year'}},
+        yaxis: {title: {text: 'Share %%'}, tickformat: '.0%%'},
+        template: 'simple_white',
+        height: 400
+    };
 
-with open("genre_trends_stacked.html", "w", encoding="utf-8") as f:
-    f.write(html_content)
+    Plotly.newPlot('individual-chart', [individualTrace], layout);
+});
+""" % json.dumps(genre_series_table(df_shares), ensure_ascii=False).replace('</', '<\\/')
+
+# 第6步：保存文件
+step('export', "正在保存文件...")
+# 图表与弹窗脚本一次写出；plotly.js 作为共享文件放在同一目录
+export_figure(fig, "genre_trends_stacked.html", post_script=popup_js)
 
 print("✅ 堆叠面积图已成功保存为 genre_trends_stacked.html")
 print("🎵 图表特性：")
@@ -251,4 +204,193 @@ print("   - 1923-2023 年完整世纪跨度")
 print("   - 缺失值线性插值处理")
 print("   - 点击流派图例可筛选显示")
 print("   - 点击数据点可弹出单独趋势图")
-print("   - 统一悬停显示所有流派数据")
\ No newline at end of file
+print("   - 统一悬停显示所有流派数据")
+# 第7步（交互模式）：预聚合立方体与交互页面
+if INTERACTIVE:
+    step('cube', "正在构建 年份×流派 计数立方体...")
+    # 一次向量化计数得到逐年计数，并汇总为 5 年、10 年分辨率；流派顺序与静态图一致
+    # （增量模式下 df 只有新追加的行，直接用累计的逐年计数）
+    if INCREMENTAL:
+        cube = GenreCube(all_years, unique_genres, df_counts.to_numpy())
+    else:
+        cube = GenreCube.build(df, all_years, genres=list(unique_genres),
+                               artist_col='Artist' if CUBE_ARTISTS else None)
+    record(rows=len(df), genres=len(cube.genres), artists=len(cube.artists) if cube.artists else 0)
+
+    step('interactive', "正在创建交互页面...")
+    genre_colors = {genre: px.colors.qualitative.Set3[i % len(px.colors.qualitative.Set3)]
+                    for i, genre in enumerate(cube.genres)}
+    cube_shares = cube.shares(1)
+    fig_interactive = go.Figure([
+        go.Scatter(x=cube_shares.index, y=cube_shares[genre], name=genre, mode='lines', stackgroup='one',
+                   line=dict(color=genre_colors[genre]), text=[str(y) for y in cube_shares.index],
+                   hovertemplate="<b>%{data.name}</b><br>Period: %{text}<br>Share: %{y:.1%}<extra></extra>")
+        for genre in cube.genres
+    ])
+    fig_interactive.update_layout(
+        template='simple_white',
+        title=dict(text='<b>The Evolution of Music Genres (1923-2023)</b><br><sub>Resolution: Year</sub>',
+                   font=dict(size=24), x=0.5),
+        font=dict(family="Arial", size=12, color="black"),
+        legend=dict(orientation="h", yanchor="bottom", y=-0.15, xanchor="center", x=0.5),
+        hovermode="x unified",
+        height=600,
+        xaxis=dict(title=dict(text='Year')),
+        yaxis=dict(title=dict(text='Share %'), tickformat='.0%', range=[0, 1])
+    )
+
+    # 控件：分辨率、流派子集与（可选的）艺人筛选；每次切换只在立方体上做除法与插值，不重新聚合
+    cube_js = """
+const plotDiv = document.getElementById('{plot_id}');
+const cube = %s;
+const genreColors = %s;
+const resolutionLabels = {'1': 'Year', '5': '5 years', '10': 'Decade'};
+const state = {width: '1', genres: new Set(cube.genres), artist: null};
+const G = cube.genres.length;
+
+// 按艺人分组的稀疏计数 (艺人, 年份下标, 流派下标, 计数)
+const byArtist = {};
+const artistIndex = {};
+if (cube.artists) {
+    cube.artists.forEach(function(name, a) { artistIndex[name] = a; });
+    for (let i = 0; i < cube.artist_counts.length; i += 4) {
+        const a = cube.artist_counts[i];
+        (byArtist[a] = byArtist[a] || []).push(i);
+    }
+}
+
+// 与 genre_grid.interpolate_shares 相同：0 视为缺失，按位置线性插值，首尾取最近的有效值，整列缺失记为 0
+function interpolate(values) {
+    const valid = [];
+    values.forEach(function(v, i) { if (v > 0) valid.push(i); });
+    if (!valid.length) return values.map(function() { return 0; });
+    let k = 0;
+    return values.map(function(v, i) {
+        if (v > 0) return v;
+        if (i < valid[0]) return values[valid[0]];
+        if (i > valid[valid.length - 1]) return values[valid[valid.length - 1]];
+        while (valid[k + 1] < i) k++;
+        const i0 = valid[k], i1 = valid[k + 1];
+        return values[i0] + (values[i1] - values[i0]) * (i - i0) / (i1 - i0);
+    });
+}
+
+function countsFor(width) {
+    const res = cube.resolutions[width];
+    if (state.artist === null) return res.counts;
+    const counts = new Array(res.bins.length * G).fill(0);
+    const w = Number(width);
+    (byArtist[state.artist] || []).forEach(function(i) {
+        const year = cube.years[cube.artist_counts[i + 1]];
+        const bin = (Math.floor(year / w) * w - res.bins[0]) / w;
+        counts[bin * G + cube.artist_counts[i + 2]] += cube.artist_counts[i + 3];
+    });
+    return counts;
+}
+
+function render() {
+    const res = cube.resolutions[state.width];
+    const w = Number(state.width);
+    const counts = countsFor(state.width);
+    const selected = [];
+    cube.genres.forEach(function(genre, j) { if (state.genres.has(genre)) selected.push(j); });
+    const totals = res.bins.map(function(_, b) {
+        return selected.reduce(function(sum, j) { return sum + counts[b * G + j]; }, 0);
+    });
+    const periods = res.bins.map(function(start) { return w === 1 ? String(start) : start + '-' + (start + w - 1); });
+    const data = selected.map(function(j) {
+        const genre = cube.genres[j];
+        return {
+            type: 'scatter', mode: 'lines', stackgroup: 'one', name: genre, line: {color: genreColors[genre]},
+            x: res.bins, text: periods,
+            y: interpolate(res.bins.map(function(_, b) { return totals[b] ? counts[b * G + j] / totals[b] : 0; })),
+            hovertemplate: '<b>%%{data.name}</b><br>Period: %%{text}<br>Share: %%{y:.1%%}<extra></extra>'
+        };
+    });
+    const subtitle = 'Resolution: ' + resolutionLabels[state.width] +
+        (state.artist !== null ? ' | Artist: ' + cube.artists[state.artist] : '');
+    const layout = Object.assign({}, plotDiv.layout, {
+        title: Object.assign({}, plotDiv.layout.title,
+            {text: '<b>The Evolution of Music Genres (1923-2023)</b><br><sub>' + subtitle + '</sub>'})
+    });
+    Plotly.react(plotDiv, data, layout);
+}
+
+// 控件放在图表上方
+const controls = document.createElement('div');
+controls.style.cssText = 'font-family: Arial; font-size: 13px; margin: 8px 40px; line-height: 1.9;';
+plotDiv.parentNode.insertBefore(controls, plotDiv);
+
+const resolutionRow = document.createElement('div');
+resolutionRow.appendChild(document.createTextNode('Resolution: '));
+Object.keys(resolutionLabels).forEach(function(width) {
+    const label = document.createElement('label');
+    const input = document.createElement('input');
+    input.type = 'radio';
+    input.name = 'cube-resolution';
+    input.checked = width === state.width;
+    input.onchange = function() { state.width = width; render(); };
+    label.appendChild(input);
+    label.appendChild(document.createTextNode(' ' + resolutionLabels[width] + '  '));
+    resolutionRow.appendChild(label);
+});
+controls.appendChild(resolutionRow);
+
+const genreRow = document.createElement('div');
+genreRow.appendChild(document.createTextNode('Genres: '));
+const genreInputs = cube.genres.map(function(genre) {
+    const label = document.createElement('label');
+    label.style.marginRight = '10px';
+    const input = document.createElement('input');
+    input.type = 'checkbox';
+    input.checked = true;
+    input.onchange = function() {
+        if (input.checked) state.genres.add(genre); else state.genres.delete(genre);
+        render();
+    };
+    label.appendChild(input);
+    label.appendChild(document.createTextNode(' ' + genre));
+    genreRow.appendChild(label);
+    return input;
+});
+[['All', true], ['None', false]].forEach(function(option) {
+    const button = document.createElement('button');
+    button.textContent = option[0];
+    button.onclick = function() {
+        genreInputs.forEach(function(input, j) {
+            input.checked = option[1];
+            if (option[1]) state.genres.add(cube.genres[j]); else state.genres.delete(cube.genres[j]);
+        });
+        render();
+    };
+    genreRow.appendChild(button);
+});
+controls.appendChild(genreRow);
+
+if (cube.artists) {
+    const artistRow = document.createElement('div');
+    artistRow.appendChild(document.createTextNode('Artist: '));
+    const input = document.createElement('input');
+    input.setAttribute('list', 'cube-artists');
+    input.placeholder = 'all artists';
+    const options = document.createElement('datalist');
+    options.id = 'cube-artists';
+    cube.artists.forEach(function(name) {
+        const option = document.createElement('option');
+        option.value = name;
+        options.appendChild(option);
+    });
+    input.onchange = function() {
+        state.artist = artistIndex.hasOwnProperty(input.value) ? artistIndex[input.value] : null;
+        render();
+    };
+    artistRow.appendChild(input);
+    artistRow.appendChild(options);
+    controls.appendChild(artistRow);
+}
+""" % (json.dumps(cube.to_json(), ensure_ascii=False).replace('</', '<\\/'),
+       json.dumps(genre_colors))
+
+    step('export_interactive', "正在保存交互页面...")
+    export_figure(fig_interactive, "genre_trends_interactive.html", post_script=cube_js)
+    print("✅ 交互页面已保存为 genre_trends_interactive.html（切换分辨率与流派子集）")
@@ -1,123 +1,78 @@
 # 第1步：导入与设置
-import dash
-import dash_bootstrap_components as dbc
-from dash import dcc, html, Input, Output
-import plotly.express as px
-import pandas as pd
+import sys
 
-# 初始化应用
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+from dashboard_app import ARTIFACT_PATH, PRODUCTION, create_app, write_artifact
+from dashboard_figures import (FigureCache, build_clientside_store, genre_share_table, index_by_country,
+                               write_standalone_html)
+from country_similarity import similarity_table
+from data_cache import load_dataset
+from genre_rules import ACT2_GENRE_RULES, GenreClassifier
+from stage_trace import finish, record, step
 
-# 第2步：数据处理 (关键步骤)
-# 加载 top50contry.csv 文件
-df = pd.read_csv('top50contry.csv', encoding='latin1')
-
-# (关键) 定义“流派归类”函数
-def map_genre(genre_str):
-    genre_str = str(genre_str).lower()
-    if 'pop' in genre_str: return 'Pop'
-    if 'rap' in genre_str or 'hip hop' in genre_str: return 'Hip Hop / Rap'
-    if 'latin' in genre_str or 'reggaeton' in genre_str or 'colombian' in genre_str or 'argentine' in genre_str or 'panamanian' in genre_str or 'espanol' in genre_str: return 'Latin'
-    if 'edm' in genre_str or 'electro' in genre_str or 'house' in genre_str or 'dance' in genre_str: return 'Electronic / Dance'
-    if 'r&b' in genre_str: return 'R&B'
-    if 'rock' in genre_str or 'wave' in genre_str: return 'Rock'
-    if 'indie' in genre_str: return 'Indie / Alternative'
-    if 'sertanejo' in genre_str or 'funk carioca' in genre_str or 'brega funk' in genre_str: return 'Brazilian'
-    if 'k-pop' in genre_str: return 'K-Pop'
-    if 'j-pop' in genre_str: return 'J-Pop'
-    if 'desi' in genre_str or 'bollywood' in genre_str or 'punjabi' in genre_str: return 'South Asian'
-    return 'Other'  # 这个'Other'会很小
+# 图表缓存设置：启动时预渲染所有国家；缓存容量上限
+PRERENDER_FIGURES = True
+FIGURE_CACHE_SIZE = 128
 
-# 应用映射
-df['meta_genre'] = df['top genre'].apply(map_genre)
+# 客户端模式（ACT2_CLIENTSIDE=1）与生产配置（ACT2_ENV=production）见 dashboard_app
+STANDALONE_HTML = 'top50_music_dashboard_standalone.html'
 
-# (关键) 聚合国家数据
-df_countries_agg = df.groupby('country')['meta_genre'].value_counts(normalize=True).reset_index(name='Percentage')
+# 第2步：数据处理 (关键步骤)
+# 加载 top50contry.csv 文件（latin1 编码，经列式缓存读取）
+step('load')
+df = load_dataset('top50contry.csv', columns=['top genre', 'country'])
+record(rows=len(df))
 
-# (关键) 聚合全球平均
-df_global_avg = df['meta_genre'].value_counts(normalize=True).reset_index()
-df_global_avg.columns = ['Genre', 'Percentage']
-df_global_avg['Country'] = 'Global Average'  # 添加一个虚拟的国家名
+# (关键) 流派归类：规则表见 genre_rules.ACT2_GENRE_RULES，未命中的归为 'Other'（这个'Other'会很小）
+step('classify')
+genre_classifier = GenreClassifier(ACT2_GENRE_RULES)
+df['meta_genre'] = genre_classifier.classify(df['top genre'])
 
-# 合并数据
-df_plot = pd.concat([
-    df_countries_agg.rename(columns={'country': 'Country', 'meta_genre': 'Genre'}), 
-    df_global_avg
-], ignore_index=True)
+# (关键) 聚合各国家的流派占比与全球平均（'Global Average' 作为一个虚拟国家）
+step('aggregate')
+df_plot = genre_share_table(df)
 
-# 第3步：应用布局 (App Layout - 英文)
-app.layout = dbc.Container([
-    html.H1("Top 50 Music Tastes: A Global Dashboard (2019)", style={'textAlign': 'center', 'marginTop': '20px'}),
-    html.Hr(),
-    dbc.Row([
-        dbc.Col([
-            html.H4("Select a Country:"),
-            dcc.Dropdown(
-                id='country-dropdown',
-                options=[{'label': country.title(), 'value': country} for country in sorted(df_plot['Country'].unique())],
-                value='Global Average',  # 默认值
-                clearable=False
-            )
-        ], width=4),
-        dbc.Col([
-            dcc.Graph(id='genre-detail-chart')
-        ], width=8)
-    ])
-], fluid=True)
+# (关键) 按国家建立分组索引，并为每个国家预先渲染图表
+step('prerender')
+country_frames = index_by_country(df_plot)
+figure_cache = FigureCache(country_frames, maxsize=FIGURE_CACHE_SIZE)
+if PRERENDER_FIGURES:
+    figure_cache.prerender()
+record(countries=len(country_frames))
 
-# 第4步：回调函数 (The Callback - 英文)
-@app.callback(
-    Output('genre-detail-chart', 'figure'),
-    Input('country-dropdown', 'value')
-)
-def update_chart(selected_country):
-    # (关键) 定义美化字典
-    color_map = {
-        'Other': 'lightgrey',
-        'Pop': 'gold',
-        'Hip Hop / Rap': 'deepskyblue',
-        'Latin': 'red',
-        'Electronic / Dance': 'purple',
-        'R&B': 'orange',
-        'Rock': 'darkred',
-        'Indie / Alternative': 'green',
-        'Brazilian': 'yellowgreen',
-        'K-Pop': 'pink',
-        'J-Pop': 'magenta',
-        'South Asian': 'brown'
-    }
+# 国家之间的口味相似度：国家×流派 占比矩阵上一次算出两两距离（余弦 / Jensen–Shannon）与聚类顺序，
+# 随嵌入数据写入构建产物，"最相似国家"面板与热力图都由它拼出
+step('similarity')
+similarity = similarity_table(df_plot)
+record(countries=len(similarity['countries']))
 
-    # 数据过滤
-    data_to_plot = df_plot[df_plot['Country'] == selected_country]
-    title_text = f"Top 50 Genre Share: {selected_country.title()}"
+# 下拉选项与嵌入页面的数据（客户端模式和独立 HTML 共用）
+step('layout')
+country_options = [{'label': country.title(), 'value': country} for country in sorted(df_plot['Country'].unique())]
+clientside_store = build_clientside_store(country_frames, figure_cache, similarity)
 
-    # 创建图表 (fig)
-    fig = px.bar(
-        data_to_plot,
-        x='Percentage',
-        y='Country',  # 这将是 'Global Average' 或 'Japan' 等
-        color='Genre',
-        orientation='h',
-        barmode='stack',
-        title=title_text,
-        template='simple_white',
-        color_discrete_map=color_map,
-        category_orders={'Genre': list(color_map.keys())} # 确保颜色和顺序一致
-    )
+# 第3步：应用布局与回调（见 dashboard_app；服务器端回调直接返回缓存的图表，未命中时才渲染）
+app = create_app(country_options, clientside_store, figure_cache.get)
+# 供 gunicorn/waitress 等 WSGI 服务器使用（生产环境推荐只读取构建产物的 dashboard_server.py）
+server = app.server
 
-    # 美化图表 (Aesthetics - 英文)
-    fig.update_layout(
-        xaxis=dict(ticksuffix='%', range=[0, 1], title='Percentage of Top 50 Songs'),
-        yaxis=dict(showticklabels=False, title=''),  # 隐藏Y轴标签
-        legend_title_text='Meta-Genre',
-        font=dict(family="Arial", size=12),
-        margin=dict(l=10, r=10, t=50, b=10), # 调整边距
-        height=400  # 设置固定高度
-    )
-    fig.update_traces(hovertemplate='<b>%{data.name}</b>: %{x:.1%}<extra></extra>')
+# 启动阶段到此结束，写出阶段耗时记录（MUSIC_TRACE 开启时）
+finish()
 
-    return fig
+# 缓存命中统计（运维查看）
+@server.route('/cache-stats')
+def cache_stats():
+    return figure_cache.stats()
 
-# 第5步：运行应用
+# 第4步：运行应用
 if __name__ == '__main__':
-    app.run_server(debug=True)
\ No newline at end of file
+    if '--standalone' in sys.argv:
+        # 导出独立 HTML（与客户端模式使用同一份数据和渲染代码）
+        write_standalone_html(clientside_store, country_options, STANDALONE_HTML)
+        print(f"✅ 独立仪表盘已保存为 {STANDALONE_HTML}")
+    if '--artifact' in sys.argv:
+        # 导出构建产物：dashboard_server.py 只读取它，不再处理原始 CSV
+        write_artifact(clientside_store, country_options, ARTIFACT_PATH)
+        print(f"✅ 仪表盘数据已保存为 {ARTIFACT_PATH}")
+    if '--standalone' not in sys.argv and '--artifact' not in sys.argv:
+        # 开发服务器；生产环境请使用 wsgi.py（gunicorn/waitress）
+        app.run(debug=not PRODUCTION)
\ No newline at end of file
@@ -1,170 +1,54 @@
-import pandas as pd
+import json
+import os
+import sys
+
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 
-# Load the data
-df = pd.read_csv('data.csv')
+from chart_export import export_figure
+from data_cache import dataset_path, load_dataset
+from era_bootstrap import bootstrap_intervals, fisher_z_intervals
+from era_correlation import (CLASSIC_ERAS, PrefixIndex, bin_eras, combine_eras, era_edges, stream_year_moments,
+                             year_moments)
+from stage_trace import record, step
 
 # Define the key audio features to analyze
 features = ['danceability', 'energy', 'loudness', 'acousticness', 'valence', 'speechiness', 'instrumentalness', 'liveness', 'tempo']
 
-# Define function to map year to Era
-def map_year_to_era(year):
-    if 1970 <= year <= 1989:
-        return '1970-1989 (Classic Era)'
-    elif 1990 <= year <= 2009:
-        return '1990-2009 (Transition Era)'
-    elif 2010 <= year <= 2020:
-        return '2010-2020 (Modern Era)'
-    else:
-        return None
-
-# Apply the function to create Era column
-df['Era'] = df['year'].apply(map_year_to_era)
-
-# Filter out data not in the defined eras
-df_filtered = df[df['Era'].notna()].copy()
-
-# Initialize empty DataFrame for correlations
-corr_df = pd.DataFrame()
-
-# Loop through each unique Era
-for era in df_filtered['Era'].unique():
-    # Filter data for this era
-    df_era = df_filtered[df_filtered['Era'] == era]
-    
-    # Calculate correlation matrix for this era
-    era_corr = df_era[features + ['popularity']].corr(numeric_only=True)
-    
-    # Extract just the popularity column from this matrix
-    era_pop_corr = era_corr[['popularity']].drop('popularity')
-    
-    # Rename the column to the era name
-    era_pop_corr.columns = [era]
-    
-    # Append this (transposed) to corr_df
-    if corr_df.empty:
-        corr_df = era_pop_corr.T
-    else:
-        corr_df = pd.concat([corr_df, era_pop_corr.T])
-
-# Create the heatmap using plotly.express.imshow
-fig = px.imshow(
-    corr_df,
-    x=corr_df.columns,  # The Eras
-    y=corr_df.index,    # The Features
-    text_auto=False,    # We'll add custom text formatting
-    aspect="auto",      # Make rectangles fit the space
-    title="The Evolving Formula for a Hit Song: Feature Correlation with Popularity",
-    color_continuous_scale='RdBu_r',  # Red-White-Blue divergent scale
-    color_continuous_midpoint=0,       # Set 0 as neutral midpoint
-    labels=dict(x="Time Era", y="Audio Feature", color="Correlation")
-)
-
-# Add custom text with rounded values for better readability
-fig.update_traces(
-    text=[[f"{val:.2f}" for val in row] for row in corr_df.values],
-    texttemplate="%{text}",
-    textfont=dict(size=12, color="white", family="Arial, sans-serif")
-)
-
-# Enhanced hover template with better formatting
-fig.update_traces(
-    hovertemplate="<b>🎵 Feature:</b> %{y}<br><b>📅 Era:</b> %{x}<br><b>📊 Correlation:</b> %{z:.3f}<br><b>💡 Interpretation:</b> %{customdata}<extra></extra>",
-    customdata=[[
-        "Strong positive correlation" if abs(val) > 0.3 and val > 0 else
-        "Strong negative correlation" if abs(val) > 0.3 and val < 0 else
-        "Moderate positive correlation" if abs(val) > 0.1 and val > 0 else
-        "Moderate negative correlation" if abs(val) > 0.1 and val < 0 else
-        "Weak correlation"
-        for val in row
-    ] for row in corr_df.values]
-)
-
-# Enhanced layout with beautiful styling
-fig.update_layout(
-    template='plotly_white',  # Clean white background
-    title={
-        'text': "🎵 The Evolving Formula for a Hit Song: Feature Correlation with Popularity 📈",
-        'x': 0.5,
-        'xanchor': 'center',
-        'font': {
-            'size': 22,
-            'family': 'Arial, sans-serif',
-            'color': '#2c3e50'
-        }
-    },
-    font=dict(
-        family="Arial, sans-serif",
-        size=16,
-        color="#2c3e50"
-    ),
-    width=1000,  # Increased width
-    height=700,  # Increased height
-    margin=dict(l=180, r=100, t=150, b=120),  # Further increased margins for better spacing
-    plot_bgcolor='white',
-    paper_bgcolor='white'
-)
-
-# Enhanced x-axis (Eras) styling with bold labels
-fig.update_xaxes(
-    side="top",
-    tickfont=dict(size=15, family="Arial, sans-serif", color="#34495e"),
-    title_text="<b>Time Era</b>",  # Bold title
-    title_font=dict(size=18, family="Arial, sans-serif", color="#2c3e50"),
-    gridcolor='lightgray',
-    gridwidth=0.5,
-    showgrid=True,
-    tickmode='linear',
-    dtick=1
-)
-
-# Enhanced y-axis (Features) styling with bold labels
-fig.update_yaxes(
-    tickfont=dict(size=15, family="Arial, sans-serif", color="#34495e"),
-    title_text="<b>Audio Feature</b>",  # Bold title
-    title_font=dict(size=18, family="Arial, sans-serif", color="#2c3e50"),
-    gridcolor='lightgray',
-    gridwidth=0.5,
-    showgrid=True,
-    tickangle=0,
-    tickmode='linear',
-    dtick=1
-)
-
-# Enhanced colorbar styling
-fig.update_coloraxes(
-    colorbar=dict(
-        title=dict(
-            text="Correlation Strength",
-            font=dict(size=16, family="Arial, sans-serif", color="#2c3e50")
-        ),
-        tickfont=dict(size=14, family="Arial, sans-serif", color="#34495e"),
-        thickness=25,
-        len=0.7,
-        x=1.05,
-        xanchor="left"
-    )
-)
-
-# Add annotations for better interpretation - moved to bottom right
-fig.add_annotation(
-    text="💡 <b>How to read:</b><br>• Red = Positive correlation<br>• Blue = Negative correlation<br>• White = No correlation<br>• Darker = Stronger",
-    xref="paper", yref="paper",
-    x=0.98, y=0.02,
-    showarrow=False,
-    align="right",
-    bgcolor="rgba(255,255,255,0.9)",
-    bordercolor="gray",
-    borderwidth=1,
-    font=dict(size=12, family="Arial, sans-serif", color="#2c3e50")
-)
-
-# Save the file with custom HTML wrapper for centering
-html_content = fig.to_html(include_plotlyjs=True, div_id="plotly-div")
-
-# Create custom HTML with centering styles
-custom_html = f"""
+# Eras to compare (inclusive year ranges). decade_eras / rolling_eras / bin_eras
+# from era_correlation build other definitions, e.g. ERAS = decade_eras(1950, 2020)
+ERAS = CLASSIC_ERAS
+
+# Streaming mode for catalogues that do not fit in memory: ACT3_CHUNKSIZE=500000
+# reads data.csv in chunks of that many rows instead of loading it all at once
+STREAM_CHUNKSIZE = int(os.environ.get('ACT3_CHUNKSIZE', '0')) or None
+
+# Confidence intervals in the hover text: '' (off), 'fisher' or 'bootstrap' (ACT3_CI)
+CI_METHOD = os.environ.get('ACT3_CI', '')
+CI_METHODS = ('', 'fisher', 'bootstrap')
+CI_LEVEL = 0.95
+CI_RESAMPLES = 1000
+
+# Interactive mode (python dv_3-2.py --interactive): also writes hit_song_formula_interactive.html,
+# where sliders move the era boundaries and the heatmap is recomputed in the browser from a
+# prefix-sum index of per-year statistics (era_correlation.PrefixIndex) over the full dataset
+INTERACTIVE = '--interactive' in sys.argv
+
+
+# Hover text: the strength of a correlation in words
+def interpretation(val):
+    return ("Strong positive correlation" if abs(val) > 0.3 and val > 0 else
+            "Strong negative correlation" if abs(val) > 0.3 and val < 0 else
+            "Moderate positive correlation" if abs(val) > 0.1 and val > 0 else
+            "Moderate negative correlation" if abs(val) > 0.1 and val < 0 else
+            "Weak correlation")
+
+
+# Save the file with custom HTML wrapper for centering; the chart <div>
+# references the shared plotly.min.js written next to the page
+def heatmap_page(html_content):
+    return f"""
 <!DOCTYPE html>
 <html>
 <head>
@@ -199,15 +83,307 @@ custom_html = f"""
 </html>
 """
 
-# Write the custom HTML file
-with open("hit_song_formula_heatmap.html", "w", encoding="utf-8") as f:
-    f.write(custom_html)
-
-print("热图已成功创建并保存为 'hit_song_formula_heatmap.html'")
-print(f"数据概览:")
-print(f"- 总数据点: {len(df_filtered)}")
-print(f"- 时代分布:")
-for era in df_filtered['Era'].unique():
-    count = len(df_filtered[df_filtered['Era'] == era])
-    print(f"  {era}: {count} 首歌曲")
-print(f"- 分析的特征: {', '.join(features)}")
+
+def main():
+    if CI_METHOD not in CI_METHODS:
+        raise ValueError(f"unknown ACT3_CI {CI_METHOD!r}, expected one of {CI_METHODS}")
+
+    # Correlation of each feature with popularity for every era, in one grouped pass
+    step('correlations')
+    if STREAM_CHUNKSIZE:
+        years, moments, row_counts = stream_year_moments(dataset_path('data.csv'), features,
+                                                         chunksize=STREAM_CHUNKSIZE)
+    else:
+        # Load the data (only the columns used below, via the columnar cache)
+        df = load_dataset('data.csv', columns=features + ['popularity', 'year'])
+        years, moments, row_counts = year_moments(df, features)
+    corr_df, era_counts = combine_eras(years, moments, row_counts, ERAS, features)
+    # Tracks inside the union of the eras (overlapping eras, e.g. rolling_eras, count each track once)
+    in_eras = np.zeros(len(years), dtype=bool)
+    for _, start, end in ERAS:
+        in_eras |= (years >= start) & (years <= end)
+    n_tracks = int(row_counts[in_eras].sum())
+    record(rows=n_tracks, eras=len(ERAS))
+
+    # Uncertainty of every (era, feature) cell
+    step('intervals')
+    ci_lower = ci_upper = None
+    if CI_METHOD == 'bootstrap' and not STREAM_CHUNKSIZE:
+        ci_lower, ci_upper = bootstrap_intervals(df, features, ERAS, n_resamples=CI_RESAMPLES, confidence=CI_LEVEL)
+    elif CI_METHOD:
+        # Fisher-z only needs the correlations and counts, so it also works when streaming
+        if CI_METHOD == 'bootstrap':
+            print("警告：流式模式 (ACT3_CHUNKSIZE) 下无法做 bootstrap，置信区间改用 Fisher-z")
+        ci_lower, ci_upper = fisher_z_intervals(corr_df, era_counts, confidence=CI_LEVEL)
+
+    # Create the heatmap using plotly.express.imshow
+    step('figure')
+    fig = px.imshow(
+        corr_df,
+        x=corr_df.columns,  # The Eras
+        y=corr_df.index,    # The Features
+        text_auto=False,    # We'll add custom text formatting
+        aspect="auto",      # Make rectangles fit the space
+        title="The Evolving Formula for a Hit Song: Feature Correlation with Popularity",
+        color_continuous_scale='RdBu_r',  # Red-White-Blue divergent scale
+        color_continuous_midpoint=0,       # Set 0 as neutral midpoint
+        labels=dict(x="Time Era", y="Audio Feature", color="Correlation")
+    )
+
+    # Add custom text with rounded values for better readability
+    fig.update_traces(
+        text=[[f"{val:.2f}" for val in row] for row in corr_df.values],
+        texttemplate="%{text}",
+        textfont=dict(size=12, color="white", family="Arial, sans-serif")
+    )
+
+    # Enhanced hover template with better formatting
+    fig.update_traces(
+        hovertemplate="<b>🎵 Feature:</b> %{y}<br><b>📅 Era:</b> %{x}<br><b>📊 Correlation:</b> %{z:.3f}<br><b>💡 Interpretation:</b> %{customdata}<extra></extra>",
+        customdata=[[interpretation(val) for val in row] for row in corr_df.values]
+    )
+
+    # Append the confidence interval of each cell to its interpretation
+    if ci_lower is not None:
+        fig.update_traces(
+            customdata=[[
+                f"{text}<br><b>📏 {CI_LEVEL:.0%} CI:</b> [{lo:.3f}, {hi:.3f}]"
+                for text, lo, hi in zip(text_row, lo_row, hi_row)
+            ] for text_row, lo_row, hi_row in zip(fig.data[0].customdata, ci_lower.values, ci_upper.values)]
+        )
+
+    # Enhanced layout with beautiful styling
+    fig.update_layout(
+        template='plotly_white',  # Clean white background
+        title={
+            'text': "🎵 The Evolving Formula for a Hit Song: Feature Correlation with Popularity 📈",
+            'x': 0.5,
+            'xanchor': 'center',
+            'font': {
+                'size': 22,
+                'family': 'Arial, sans-serif',
+                'color': '#2c3e50'
+            }
+        },
+        font=dict(
+            family="Arial, sans-serif",
+            size=16,
+            color="#2c3e50"
+        ),
+        width=1000,  # Increased width
+        height=700,  # Increased height
+        margin=dict(l=180, r=100, t=150, b=120),  # Further increased margins for better spacing
+        plot_bgcolor='white',
+        paper_bgcolor='white'
+    )
+
+    # Enhanced x-axis (Eras) styling with bold labels
+    fig.update_xaxes(
+        side="top",
+        tickfont=dict(size=15, family="Arial, sans-serif", color="#34495e"),
+        title_text="<b>Time Era</b>",  # Bold title
+        title_font=dict(size=18, family="Arial, sans-serif", color="#2c3e50"),
+        gridcolor='lightgray',
+        gridwidth=0.5,
+        showgrid=True,
+        tickmode='linear',
+        dtick=1
+    )
+
+    # Enhanced y-axis (Features) styling with bold labels
+    fig.update_yaxes(
+        tickfont=dict(size=15, family="Arial, sans-serif", color="#34495e"),
+        title_text="<b>Audio Feature</b>",  # Bold title
+        title_font=dict(size=18, family="Arial, sans-serif", color="#2c3e50"),
+        gridcolor='lightgray',
+        gridwidth=0.5,
+        showgrid=True,
+        tickangle=0,
+        tickmode='linear',
+        dtick=1
+    )
+
+    # Enhanced colorbar styling
+    fig.update_coloraxes(
+        colorbar=dict(
+            title=dict(
+                text="Correlation Strength",
+                font=dict(size=16, family="Arial, sans-serif", color="#2c3e50")
+            ),
+            tickfont=dict(size=14, family="Arial, sans-serif", color="#34495e"),
+            thickness=25,
+            len=0.7,
+            x=1.05,
+            xanchor="left"
+        )
+    )
+
+    # Add annotations for better interpretation - moved to bottom right
+    fig.add_annotation(
+        text="💡 <b>How to read:</b><br>• Red = Positive correlation<br>• Blue = Negative correlation<br>• White = No correlation<br>• Darker = Stronger",
+        xref="paper", yref="paper",
+        x=0.98, y=0.02,
+        showarrow=False,
+        align="right",
+        bgcolor="rgba(255,255,255,0.9)",
+        bordercolor="gray",
+        borderwidth=1,
+        font=dict(size=12, family="Arial, sans-serif", color="#2c3e50")
+    )
+
+    step('export')
+    export_figure(fig, "hit_song_formula_heatmap.html", div_id="plotly-div", page=heatmap_page)
+
+    print("热图已成功创建并保存为 'hit_song_formula_heatmap.html'")
+    print("数据概览:")
+    print(f"- 总数据点: {n_tracks}")
+    print("- 时代分布:")
+    for era, count in era_counts.items():
+        print(f"  {era}: {count} 首歌曲")
+    print(f"- 分析的特征: {', '.join(features)}")
+
+    # Interactive view: era boundaries on sliders, correlations looked up in the prefix-sum index
+    if INTERACTIVE:
+        step('index')
+        index = PrefixIndex.from_year_moments(years, moments, row_counts, features)
+        # Start from the configured eras when they are contiguous, otherwise from the classic ones
+        edges = era_edges(ERAS) or era_edges(CLASSIC_ERAS)
+        interactive_df, interactive_counts = index.era_correlations(bin_eras(edges))
+        record(years=len(index.row_counts) - 1, eras=len(edges) - 1)
+
+        step('interactive')
+        fig_interactive = go.Figure(fig)
+        fig_interactive.update_traces(
+            z=interactive_df.values,
+            y=list(interactive_df.index),
+            text=[[f"{val:.2f}" for val in row] for row in interactive_df.values],
+            customdata=[[interpretation(val) for val in row] for row in interactive_df.values]
+        )
+        fig_interactive.update_layout(title_text=(
+            "🎵 The Evolving Formula for a Hit Song: Feature Correlation with Popularity 📈"
+            "<br><sub>Drag the sliders to move the era boundaries</sub>"))
+
+        # Each era is [edges[i], edges[i + 1] - 1]; a range is two lookups in the cumulative arrays
+        era_js = """
+const plotDiv = document.getElementById('{plot_id}');
+const index = %s;
+let edges = %s;
+const F = index.features.length;
+const span = index.counts.length - 1;
+
+function bounds(start, end) {
+    const lo = Math.min(Math.max(start - index.first_year, 0), span);
+    return [lo, Math.min(Math.max(end - index.first_year + 1, lo), span)];
+}
+
+// Same as PrefixIndex.correlation
+function correlation(start, end) {
+    const [lo, hi] = bounds(start, end);
+    const r = [];
+    for (let j = 0; j < F; j++) {
+        const d = function(name) { return index[name][hi * F + j] - index[name][lo * F + j]; };
+        const n = d('n'), sx = d('sx'), sy = d('sy');
+        const cov = n * d('sxy') - sx * sy;
+        const v = (n * d('sxx') - sx * sx) * (n * d('syy') - sy * sy);
+        r.push(n > 1 && v > 0 ? Math.min(1, Math.max(-1, cov / Math.sqrt(v))) : NaN);
+    }
+    return {r: r, n: index.counts[hi] - index.counts[lo]};
+}
+
+function interpretation(val) {
+    if (Math.abs(val) > 0.3 && val > 0) return 'Strong positive correlation';
+    if (Math.abs(val) > 0.3 && val < 0) return 'Strong negative correlation';
+    if (Math.abs(val) > 0.1 && val > 0) return 'Moderate positive correlation';
+    if (Math.abs(val) > 0.1 && val < 0) return 'Moderate negative correlation';
+    return 'Weak correlation';
+}
+
+const controls = document.createElement('div');
+controls.style.cssText = 'font-family: Arial, sans-serif; font-size: 14px; color: #2c3e50; margin: 0 0 12px 0;';
+plotDiv.parentNode.insertBefore(controls, plotDiv);
+const eraSelect = document.createElement('select');
+const sliderBox = document.createElement('div');
+const summary = document.createElement('div');
+summary.style.marginTop = '6px';
+
+function update() {
+    const labels = [], z = [], text = [], custom = [], counts = [];
+    for (let i = 0; i + 1 < edges.length; i++) {
+        const start = edges[i], end = edges[i + 1] - 1;
+        const result = correlation(start, end);
+        labels.push(start + '-' + end);
+        z.push(result.r);
+        text.push(result.r.map(function(v) { return isNaN(v) ? 'nan' : v.toFixed(2); }));
+        custom.push(result.r.map(interpretation));
+        counts.push(start + '-' + end + ': ' + result.n.toLocaleString() + ' tracks');
+    }
+    Plotly.restyle(plotDiv, {z: [z], y: [labels], text: [text], customdata: [custom]}, [0]);
+    summary.textContent = counts.join('  |  ');
+}
+
+function buildSliders() {
+    sliderBox.innerHTML = '';
+    edges.forEach(function(edge, i) {
+        const row = document.createElement('div');
+        const label = document.createElement('span');
+        label.style.cssText = 'display: inline-block; width: 190px;';
+        const input = document.createElement('input');
+        input.type = 'range';
+        input.min = index.first_year;
+        input.max = index.last_year + 1;
+        input.value = edge;
+        input.style.width = '60%%';
+        const describe = function() {
+            label.textContent = i === 0 ? 'First era starts: ' + edges[i] :
+                i === edges.length - 1 ? 'Last era ends: ' + (edges[i] - 1) : 'Era ' + (i + 1) + ' starts: ' + edges[i];
+        };
+        input.oninput = function() {
+            // Keep every era at least one year long
+            const lo = i > 0 ? edges[i - 1] + 1 : index.first_year;
+            const hi = i < edges.length - 1 ? edges[i + 1] - 1 : index.last_year + 1;
+            edges[i] = Math.min(Math.max(Number(input.value), lo), hi);
+            input.value = edges[i];
+            describe();
+            update();
+        };
+        describe();
+        row.appendChild(label);
+        row.appendChild(input);
+        sliderBox.appendChild(row);
+    });
+}
+
+// Number of eras: spreads the boundaries evenly over the current range
+const eraRow = document.createElement('div');
+eraRow.appendChild(document.createTextNode('Eras: '));
+for (let k = 2; k <= 8; k++) {
+    const option = document.createElement('option');
+    option.value = k;
+    option.textContent = k;
+    option.selected = k === edges.length - 1;
+    eraSelect.appendChild(option);
+}
+eraSelect.onchange = function() {
+    const k = Math.min(Number(eraSelect.value), edges[edges.length - 1] - edges[0]);
+    const first = edges[0], last = edges[edges.length - 1];
+    edges = [];
+    for (let i = 0; i <= k; i++) edges.push(Math.round(first + (last - first) * i / k));
+    buildSliders();
+    update();
+};
+eraRow.appendChild(eraSelect);
+controls.appendChild(eraRow);
+controls.appendChild(sliderBox);
+controls.appendChild(summary);
+buildSliders();
+update();
+""" % (json.dumps(index.to_json()), json.dumps(edges))
+
+        step('export_interactive')
+        export_figure(fig_interactive, "hit_song_formula_interactive.html", div_id="plotly-div", page=heatmap_page,
+                      post_script=era_js)
+        print("交互页面已保存为 'hit_song_formula_interactive.html'（拖动滑块调整时代边界）")
+
+
+if __name__ == '__main__':
+    main()
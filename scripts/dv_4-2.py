@@ -3,134 +3,209 @@ Act 4: Interactive Scatter Plot with Named Clusters
 音乐宇宙：AI发现的歌曲星系
 """
 
+import os
+import time
+
+import numpy as np
 import pandas as pd
-import plotly.express as px
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
 
-# Load & Prepare Data
-print("正在加载数据...")
-df = pd.read_csv('data.csv')
+from chart_export import export_figure
+from cluster_model import ClusterModel, load_model
+from clustering import fit_clusters, name_clusters, sample_tracks, sweep_figure, sweep_k
+from data_cache import dataset_path, load_dataset
+from projection import load_or_fit_projection
+from similarity_index import load_or_build_index
+from stage_trace import record, step
+from universe_render import SIMILAR_MAX_POINTS, similar_tracks_script, universe_figure
 
 # Define features for clustering
 features = ['danceability', 'energy', 'acousticness', 'valence', 'speechiness', 
            'instrumentalness', 'liveness', 'loudness', 'tempo']
 
-# Sample the data for performance
-print("正在采样数据...")
-df_sample = df.sample(n=10000, random_state=42).copy()
-
-# Standardize the features
-print("正在标准化特征...")
-scaler = StandardScaler()
-features_scaled = scaler.fit_transform(df_sample[features])
-
-# K-Means Clustering
-print("正在执行K-Means聚类...")
-kmeans = KMeans(n_clusters=8, random_state=42, n_init=10)
-df_sample['Cluster_ID'] = kmeans.fit_predict(features_scaled)
-
-# Profile & Rename Clusters (The "Easy to Understand" Step)
-print("正在分析聚类特征...")
-# Profile: Calculate the mean of all features grouped by Cluster_ID
-cluster_profile = df_sample.groupby('Cluster_ID')[features].mean()
-
-# Calculate overall feature means for comparison
-overall_feature_means = df_sample[features].mean()
-
-def get_descriptive_cluster_name(cluster_id, cluster_row, overall_means, top_n=2, threshold_multiplier=0.1):
-    """
-    创建更具描述性的聚类名称
-    """
-    # Calculate deviation from overall mean for each feature
-    deviations = (cluster_row - overall_means) / overall_means.std()
-    
-    # Find features that are significantly above the overall mean
-    significant_features = deviations[deviations > threshold_multiplier].sort_values(ascending=False)
-    
-    if len(significant_features) >= 2:
-        # Take the top N most significant features
-        top_features = significant_features.head(top_n).index.tolist()
-        feature_names_formatted = [f"High {f.title()}" for f in top_features]
-        return f"Cluster {cluster_id} ({', '.join(feature_names_formatted)})"
-    elif len(significant_features) == 1:
-        # Only one significant feature
-        feature_name = significant_features.index[0]
-        return f"Cluster {cluster_id} (High {feature_name.title()})"
+# Clustering backend (ACT4_BACKEND): 'kmeans' = exact k-means on a 10k sample,
+# 'minibatch' = streaming mini-batch k-means over every track
+CLUSTER_BACKEND = os.environ.get('ACT4_BACKEND', 'kmeans')
+N_CLUSTERS = 8
+# k-selection sweep (ACT4_K_SWEEP=1): try k = 2..20 in parallel and label the tracks
+# with the best fit of the sweep (best k, best seed)
+K_SWEEP = os.environ.get('ACT4_K_SWEEP', '0') == '1'
+K_RANGE = range(2, 21)
+K_SEEDS = (42, 7, 2024)
+# Persisted model (ACT4_MODEL): scaler, centroids, cluster profiles and names of the last
+# fit. Later runs label the tracks with it instead of refitting, so IDs and names stay
+# stable; ACT4_REFIT=1, the k sweep, or a different backend/k/feature set fit a new one
+# (whose clusters keep the old IDs where they correspond). See cluster_model.py
+MODEL_PATH = os.environ.get('ACT4_MODEL', 'music_universe_model.json')
+REFIT = os.environ.get('ACT4_REFIT', '0') == '1'
+# Rendering (ACT4_RENDER): 'auto', 'svg', 'webgl' or 'density'; the SVG scatter
+# draws at most PLOT_SAMPLE_SIZE tracks
+RENDER_MODE = os.environ.get('ACT4_RENDER', 'auto')
+PLOT_SAMPLE_SIZE = 10000
+# Map axes (ACT4_AXES): 'features' = raw danceability vs energy, 'pca' = 2-D incremental
+# PCA projection of all nine scaled features, fitted once over every track and cached
+# (see projection.py)
+MAP_AXES = os.environ.get('ACT4_AXES', 'features')
+# "Songs like this": clicking a track lists its ACT4_NEIGHBOURS nearest tracks of the
+# full catalogue (0 turns it off), found with a persisted ACT4_INDEX index
+# ('kdtree', 'balltree' or 'brute', see similarity_index.py)
+NEIGHBOURS_K = int(os.environ.get('ACT4_NEIGHBOURS', '5'))
+INDEX_KIND = os.environ.get('ACT4_INDEX', 'kdtree')
+
+
+def main():
+    # Load & Prepare Data (only the columns used below, via the columnar cache)
+    step('load', "正在加载数据...")
+    df = load_dataset('data.csv', columns=features + ['popularity', 'year', 'name', 'artists', 'id'])
+    record(rows=len(df))
+
+    # Choose k: sweep over K_RANGE on the full (standardized) dataset
+    n_clusters = N_CLUSTERS
+    if K_SWEEP:
+        step('k_sweep', f"正在选择聚类数量 k = {K_RANGE.start}..{K_RANGE.stop - 1}...")
+        sweep_scaler = StandardScaler()
+        features_scaled_all = sweep_scaler.fit_transform(df[features])
+        sweep_report, n_clusters, sweep_model = sweep_k(features_scaled_all, K_RANGE, K_SEEDS,
+                                                        backend=CLUSTER_BACKEND)
+        print(sweep_report.groupby('k')[['inertia', 'silhouette', 'fit_seconds']].mean().round(3).to_string())
+        print(f"选择 k = {n_clusters}")
+        sweep_report.to_csv("k_selection_sweep.csv", index=False)
+        export_figure(sweep_figure(sweep_report, n_clusters), "k_selection_sweep.html")
+
+    previous_model = load_model(MODEL_PATH)
+    reuse_model = (previous_model is not None and not (REFIT or K_SWEEP) and previous_model.features == features
+                   and previous_model.backend == CLUSTER_BACKEND and previous_model.n_clusters == n_clusters)
+
+    if reuse_model:
+        # Predict-only: nearest saved centroid for the same tracks the backend would cluster
+        model = previous_model
+        step('cluster', f"正在使用已保存的模型分配聚类 (版本 {model.version}, {MODEL_PATH})...")
+        df_clustered = sample_tracks(df) if CLUSTER_BACKEND == 'kmeans' else df.copy()
+        start = time.perf_counter()
+        df_clustered['Cluster_ID'] = model.predict(df_clustered)
+        record(rows=len(df_clustered), model_version=model.version)
+        print(f"聚类分配完成: {len(df_clustered)} 首歌曲, 用时 {(time.perf_counter() - start) * 1e3:.1f} 毫秒")
+
+        step('name_clusters', "正在读取已保存的聚类特征...")
+        cluster_profile, name_map = model.profile(), model.name_map
+    else:
+        if K_SWEEP:
+            # The sweep's best model (fitted on every track) labels every track, so the
+            # inertia and silhouette in k_selection_sweep.csv describe the model in use
+            step('cluster', f"正在使用 k 选择中的最优模型分配聚类 (k = {n_clusters})...")
+            df_clustered = df.copy()
+            df_clustered['Cluster_ID'] = sweep_model.predict(features_scaled_all)
+            scaler = sweep_scaler
+            centroids = sweep_model.cluster_centers_
+            del features_scaled_all
+            record(rows=len(df_clustered), inertia=float(sweep_model.inertia_))
+            print(f"聚类完成: {len(df_clustered)} 首歌曲, inertia {sweep_model.inertia_:.1f}")
+        else:
+            # Standardize the features & K-Means Clustering
+            # ('kmeans' samples 10,000 tracks for performance; 'minibatch' labels every track)
+            step('cluster', f"正在执行K-Means聚类 ({CLUSTER_BACKEND})...")
+            cluster_result = fit_clusters(df, features, backend=CLUSTER_BACKEND, n_clusters=n_clusters,
+                                          random_state=42)
+            df_clustered = cluster_result.frame
+            scaler = cluster_result.scaler
+            centroids = cluster_result.model.cluster_centers_
+            report = cluster_result.report
+            record(rows=report['rows_labelled'], inertia=report['inertia'])
+            print(f"聚类完成: {report['rows_labelled']} 首歌曲, 用时 {report['fit_seconds']:.2f} 秒, "
+                  f"inertia {report['inertia']:.1f}, 峰值内存 {report['peak_memory_mb']:.1f} MB")
+
+        # Keep the previous model's cluster IDs for the clusters that correspond to it
+        if (previous_model is not None and previous_model.features == features
+                and previous_model.n_clusters == n_clusters):
+            mapping = previous_model.match(centroids, scaler.mean_, scaler.scale_)
+            df_clustered['Cluster_ID'] = mapping[df_clustered['Cluster_ID'].to_numpy()]
+            centroids = centroids[np.argsort(mapping)]
+
+        # Profile & Rename Clusters (The "Easy to Understand" Step)
+        step('name_clusters', "正在分析聚类特征...")
+        # Profile each cluster by its feature means and name it after the features
+        # that stand out against the overall means (see clustering.name_clusters)
+        cluster_profile, name_map = name_clusters(df_clustered, features)
+
+        model = ClusterModel.from_fit(df_clustered, features, scaler, centroids, name_map, backend=CLUSTER_BACKEND,
+                                      version=previous_model.version + 1 if previous_model else 1)
+        model.save(MODEL_PATH)
+        print(f"模型已保存: {MODEL_PATH} (版本 {model.version})")
+
+    print("聚类特征分析结果:")
+    for cluster_id, cluster_row in cluster_profile.iterrows():
+        print(f"聚类 {cluster_id}: {name_map[cluster_id]}")
+        print(f"  特征均值: {cluster_row.to_dict()}")
+        print()
+
+    # Apply Renaming
+    df_clustered['Cluster_Name'] = df_clustered['Cluster_ID'].map(name_map)
+
+    # Clean Artists Column (for Hover)
+    df_clustered['artists_cleaned'] = df_clustered['artists'].str.replace(r"[\"\[\]\']", "", regex=True)
+
+    # Project onto the two principal components of the scaled features (reused from the cache when possible)
+    axes = {}
+    if MAP_AXES == 'pca':
+        step('projection', "正在计算二维投影 (incremental PCA)...")
+        projection, fitted = load_or_fit_projection(df, features, dataset_path('data.csv'))
+        clustered_rows = df.index.get_indexer(df_clustered.index)
+        df_clustered['pc1'], df_clustered['pc2'] = np.asarray(projection.coords[clustered_rows]).T
+        axes = dict(x='pc1', y='pc2', x_title=projection.axis_title(0), y_title=projection.axis_title(1))
+        record(rows=len(df), fitted=fitted)
+        print(f"投影: {'拟合用时 %.2f 秒' % projection.fit_seconds if fitted else '从缓存加载'}, "
+              f"解释方差 {projection.pca.explained_variance_ratio_.sum():.0%}")
+    elif MAP_AXES != 'features':
+        raise ValueError(f"unknown ACT4_AXES {MAP_AXES!r}, expected 'features' or 'pca'")
+
+    # Create Visualization
+    # 'auto' picks SVG for small samples, WebGL for larger ones and density bins with
+    # zoom drill-down for very large catalogues (override with ACT4_RENDER)
+    step('figure', "正在创建可视化...")
+    if RENDER_MODE == 'svg' and len(df_clustered) > PLOT_SAMPLE_SIZE:
+        df_plot = df_clustered.sample(n=PLOT_SAMPLE_SIZE, random_state=42)
     else:
-        # Fallback: use the highest feature relative to overall mean
-        relative_scores = (cluster_row - overall_means) / overall_means.std()
-        highest_feature = relative_scores.idxmax()
-        return f"Cluster {cluster_id} (High {highest_feature.title()})"
-
-# Create Name Map with improved naming strategy
-name_map = {}
-for cluster_id, cluster_row in cluster_profile.iterrows():
-    name_map[cluster_id] = get_descriptive_cluster_name(cluster_id, cluster_row, overall_feature_means, top_n=2, threshold_multiplier=0.1)
-
-print("聚类特征分析结果:")
-for cluster_id, cluster_row in cluster_profile.iterrows():
-    print(f"聚类 {cluster_id}: {name_map[cluster_id]}")
-    print(f"  特征均值: {cluster_row.to_dict()}")
-    print()
-
-# Apply Renaming
-df_sample['Cluster_Name'] = df_sample['Cluster_ID'].map(name_map)
-
-# Clean Artists Column (for Hover)
-df_sample['artists_cleaned'] = df_sample['artists'].str.replace(r"[\"\[\]\']", "", regex=True)
-
-# Create Visualization (Plotly Express)
-print("正在创建可视化...")
-fig = px.scatter(
-    df_sample,
-    x='danceability',
-    y='energy',
-    color='Cluster_Name',
-    size='popularity',
-    hover_name='name',
-    hover_data={
-        'artists_cleaned': True, 
-        'year': True, 
-        'Cluster_Name': True, 
-        'danceability': False, 
-        'energy': False, 
-        'popularity': True
-    }
-)
-
-# Aesthetics & Interactivity
-fig.update_layout(
-    template='simple_white',
-    title=dict(
-        text="<b>The Music Universe: AI-Discovered Song Galaxies</b>",
-        font=dict(size=22),
-        x=0.5
-    ),
-    legend_title_text='AI-Discovered Clusters (Click to Toggle)',
-    xaxis_title="Danceability",
-    yaxis_title="Energy",
-    font=dict(family="Arial", size=12)
-)
-
-fig.update_traces(
-    marker=dict(
-        opacity=0.7,
-        line=dict(width=0.5, color='Black')
-    ),
-    hovertemplate="<b>%{hovertext}</b><br>by %{customdata[0]}<br><br><b>Galaxy:</b> %{customdata[2]}<br><b>Year:</b> %{customdata[1]}<br><b>Popularity:</b> %{customdata[3]}<extra></extra>"
-)
-
-# Save File
-print("正在保存HTML文件...")
-fig.write_html("music_universe_named_clusters.html")
-print("完成！文件已保存为 'music_universe_named_clusters.html'")
-
-# Display some statistics
-print(f"\n数据统计:")
-print(f"总样本数: {len(df_sample)}")
-print(f"聚类数量: {len(df_sample['Cluster_Name'].unique())}")
-print(f"聚类分布:")
-cluster_counts = df_sample['Cluster_Name'].value_counts()
-for cluster_name, count in cluster_counts.items():
-    print(f"  {cluster_name}: {count} 首歌曲")
+        df_plot = df_clustered
+    fig, post_script, render_mode = universe_figure(df_plot, mode=RENDER_MODE, **axes)
+    record(rows=len(df_plot), render_mode=render_mode)
+    print(f"渲染模式: {render_mode} ({len(df_plot)} 首歌曲)")
+
+    # Nearest neighbours of the plotted tracks in the full catalogue, for the click panel
+    # (not embedded above SIMILAR_MAX_POINTS plotted tracks, so the index is not even loaded)
+    if NEIGHBOURS_K and render_mode != 'density' and len(df_plot) > SIMILAR_MAX_POINTS:
+        print(f"相似歌曲面板已跳过: 图中有 {len(df_plot)} 首歌曲, 超过上限 {SIMILAR_MAX_POINTS}")
+    elif NEIGHBOURS_K and render_mode != 'density':
+        step('neighbours', "正在查找相似歌曲...")
+        index, built = load_or_build_index(df, features, dataset_path('data.csv'), kind=INDEX_KIND)
+        print(f"近邻索引 ({index.kind}): {len(index)} 首歌曲, {index.nbytes / 1e6:.1f} MB, "
+              + (f"构建用时 {index.build_seconds:.2f} 秒" if built else "从缓存加载"))
+        plot_rows = df.index.get_indexer(df_plot.index)
+        distances, neighbours = index.neighbours_of(plot_rows, k=NEIGHBOURS_K)
+        # Galaxy of each neighbour, which may not be among the clustered tracks
+        neighbour_rows = np.unique(neighbours)
+        catalogue = df.iloc[neighbour_rows].set_axis(neighbour_rows)
+        catalogue['Cluster_Name'] = pd.Series(model.predict(catalogue), index=neighbour_rows).map(name_map)
+        catalogue['artists_cleaned'] = catalogue['artists'].str.replace(r"[\"\[\]\']", "", regex=True)
+        if MAP_AXES == 'pca':
+            catalogue['pc1'], catalogue['pc2'] = np.asarray(projection.coords[neighbour_rows]).T
+        post_script += similar_tracks_script(df_plot, neighbours, distances, catalogue, list(name_map.values()),
+                                             x=axes.get('x', 'danceability'), y=axes.get('y', 'energy'))
+        record(rows=len(plot_rows), k=NEIGHBOURS_K, index_built=built, index_mb=index.nbytes / 1e6)
+
+    # Save File
+    step('export', "正在保存HTML文件...")
+    export_figure(fig, "music_universe_named_clusters.html", post_script=post_script)
+    print("完成！文件已保存为 'music_universe_named_clusters.html'")
+
+    # Display some statistics
+    print("\n数据统计:")
+    print(f"总样本数: {len(df_clustered)} (图中显示 {len(df_plot)})")
+    print(f"聚类数量: {len(df_clustered['Cluster_Name'].unique())}")
+    print("聚类分布:")
+    cluster_counts = df_clustered['Cluster_Name'].value_counts()
+    for cluster_name, count in cluster_counts.items():
+        print(f"  {cluster_name}: {count} 首歌曲")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Act 3: Confidence intervals for the feature-vs-popularity correlations
+Fisher-z intervals in closed form, or percentile bootstrap intervals computed
+with batched resampling (index matrices -> weight matrix -> one GEMM per batch)
+spread across a process pool
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+# Design matrix of the era being resampled, set once per worker process
+_design = None
+
+
+def fisher_z_intervals(corr_df, era_counts, confidence=0.95):
+    """Closed-form Fisher-z intervals for every (era, feature) cell"""
+    z = np.arctanh(corr_df.to_numpy().clip(-0.999999, 0.999999))
+    n = era_counts.reindex(corr_df.index).to_numpy(dtype=float)[:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        half_width = NormalDist().inv_cdf(0.5 + confidence / 2) / np.sqrt(n - 3)
+    lower = pd.DataFrame(np.tanh(z - half_width), index=corr_df.index, columns=corr_df.columns)
+    upper = pd.DataFrame(np.tanh(z + half_width), index=corr_df.index, columns=corr_df.columns)
+    return lower, upper
+
+
+def _build_design(X, y):
+    """
+    Columns [m, x, x², y, y², xy] per feature, each masked to the feature's
+    pairwise-complete rows (m = 1 where both x and y are present) and centred
+    on their means; resample sums are weights @ design
+    """
+    mask = ~(np.isnan(X) | np.isnan(y)[:, None])
+    with np.errstate(invalid='ignore'):
+        X = np.where(mask, X - np.nanmean(np.where(mask, X, np.nan), axis=0), 0.0)
+    y = np.where(mask, (y - np.nanmean(y))[:, None], 0.0)
+    m = mask.astype(np.float64)
+    return np.hstack([m, X, X * X, y, y * y, X * y])
+
+
+def _init_worker(design):
+    global _design
+    _design = design
+
+
+def _resample_batch(seed, batch_size):
+    """Correlations for `batch_size` bootstrap resamples of the current design matrix"""
+    design = _design
+    n = design.shape[0]
+    rng = np.random.default_rng(seed)
+
+    # Index matrix of resampled rows -> how many times each row was drawn
+    idx = rng.integers(0, n, size=(batch_size, n))
+    idx += (np.arange(batch_size) * n)[:, None]
+    weights = np.bincount(idx.ravel(), minlength=batch_size * n).reshape(batch_size, n).astype(np.float64)
+
+    sums = weights @ design
+    # Pairwise-complete count and sums of every feature in each resample
+    cnt, sx, sxx, sy, syy, sxy = np.split(sums, 6, axis=1)
+
+    cov = cnt * sxy - sx * sy
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return cov / np.sqrt((cnt * sxx - sx * sx) * (cnt * syy - sy * sy))
+
+
+def bootstrap_correlations(X, y, n_resamples=1000, batch_size=32, n_jobs=None, seed=42):
+    """
+    Bootstrap distribution of corr(X[:, j], y) for every feature j
+
+    Resamples are drawn in batches; each batch is one weight matrix product.
+    Batches run in a process pool of `n_jobs` workers (1 runs in-process).
+    Like the point estimates, each feature uses the rows where both it and y
+    are present: rows are resampled together and every resample's correlation
+    is computed over its pairwise-complete rows.
+    Returns an array of shape (n_resamples, features).
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Rows without any complete (feature, y) pair do not enter any correlation
+    paired = ~np.isnan(y) & ~np.isnan(X).all(axis=1)
+    design = _build_design(X[paired], y[paired])
+
+    sizes = [batch_size] * (n_resamples // batch_size)
+    if n_resamples % batch_size:
+        sizes.append(n_resamples % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    n_jobs = n_jobs or os.cpu_count()
+
+    if n_jobs == 1:
+        _init_worker(design)
+        batches = [_resample_batch(s, b) for s, b in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(design,)) as pool:
+            batches = list(pool.map(_resample_batch, seeds, sizes))
+    return np.vstack(batches)
+
+
+def bootstrap_intervals(df, features, eras, target='popularity', year_col='year',
+                        n_resamples=1000, confidence=0.95, batch_size=32, n_jobs=None, seed=42):
+    """Percentile bootstrap intervals for every (era, feature) cell; returns (lower, upper)"""
+    alpha = (1 - confidence) / 2
+    labels = [label for label, _, _ in eras]
+    lower = pd.DataFrame(np.nan, index=labels, columns=features)
+    upper = pd.DataFrame(np.nan, index=labels, columns=features)
+
+    years = df[year_col].to_numpy()
+    for i, (label, start, end) in enumerate(eras):
+        in_era = (years >= start) & (years <= end)
+        if in_era.sum() < 2:
+            continue
+        samples = bootstrap_correlations(
+            df.loc[in_era, features].to_numpy(), df.loc[in_era, target].to_numpy(),
+            n_resamples, batch_size, n_jobs, seed + i
+        )
+        lower.loc[label] = np.nanquantile(samples, alpha, axis=0)
+        upper.loc[label] = np.nanquantile(samples, 1 - alpha, axis=0)
+    return lower, upper
@@ -0,0 +1,334 @@
+"""
+Act 3: Feature-vs-popularity correlations for many eras in one pass
+Per-year co-moments are computed once; any era definition is a merge of years.
+PrefixIndex turns them into cumulative sums, so the correlation of any year
+range is an O(features) lookup (used by the interactive era-slider view)
+"""
+
+import numpy as np
+import pandas as pd
+
+# The three eras used in the original heatmap (inclusive year ranges)
+CLASSIC_ERAS = [
+    ('1970-1989 (Classic Era)', 1970, 1989),
+    ('1990-2009 (Transition Era)', 1990, 2009),
+    ('2010-2020 (Modern Era)', 2010, 2020),
+]
+
+
+def decade_eras(start, end, width=10):
+    """Fixed, non-overlapping eras of `width` years covering [start, end]"""
+    return [(f"{s}-{min(s + width - 1, end)}", s, min(s + width - 1, end))
+            for s in range(start, end + 1, width)]
+
+
+def rolling_eras(start, end, window, step=1):
+    """Overlapping rolling windows of `window` years, moved by `step` years"""
+    return [(f"{s}-{s + window - 1}", s, s + window - 1)
+            for s in range(start, end - window + 2, step)]
+
+
+def bin_eras(edges, labels=None):
+    """Eras from a user-supplied list of bin edges: [edges[i], edges[i+1])"""
+    eras = [(f"{lo}-{hi - 1}", lo, hi - 1) for lo, hi in zip(edges[:-1], edges[1:])]
+    if labels is not None:
+        eras = [(label, lo, hi) for label, (_, lo, hi) in zip(labels, eras)]
+    return eras
+
+
+def era_edges(eras):
+    """Inverse of bin_eras: the bin edges of contiguous eras, or None if they leave gaps or overlap"""
+    if not eras:
+        return None
+    edges = [start for _, start, _ in eras] + [eras[-1][2] + 1]
+    if any(end + 1 != next_start for (_, _, end), next_start in zip(eras, edges[1:])) or edges != sorted(set(edges)):
+        return None
+    return edges
+
+
+class CoMoments:
+    """
+    Co-moments of several features (x) against one target (y), per group
+
+    Every array has shape (groups, features): pairwise-complete counts, means,
+    sums of squared deviations (m2) and the co-moment c = sum((x - mx) * (y - my)).
+    Groups are merged with Chan et al.'s parallel formulas, so the statistics
+    stay numerically stable however many groups or chunks are combined.
+    """
+
+    def __init__(self, n, mean_x, mean_y, m2_x, m2_y, c_xy):
+        self.n = n
+        self.mean_x = mean_x
+        self.mean_y = mean_y
+        self.m2_x = m2_x
+        self.m2_y = m2_y
+        self.c_xy = c_xy
+
+    @classmethod
+    def from_arrays(cls, codes, X, y, n_groups):
+        """Per-group co-moments of X (rows × features) against y, rows labelled by `codes`"""
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        n_features = X.shape[1]
+        shape = (n_groups, n_features)
+        n, mean_x, mean_y, m2_x, m2_y, c_xy = (np.zeros(shape) for _ in range(6))
+
+        for j in range(n_features):
+            x = X[:, j]
+            valid = ~(np.isnan(x) | np.isnan(y))
+            g, xv, yv = codes[valid], x[valid], y[valid]
+
+            cnt = np.bincount(g, minlength=n_groups).astype(np.float64)
+            safe = np.where(cnt > 0, cnt, 1)
+            mx = np.bincount(g, weights=xv, minlength=n_groups) / safe
+            my = np.bincount(g, weights=yv, minlength=n_groups) / safe
+            dx = xv - mx[g]
+            dy = yv - my[g]
+
+            n[:, j] = cnt
+            mean_x[:, j] = mx
+            mean_y[:, j] = my
+            m2_x[:, j] = np.bincount(g, weights=dx * dx, minlength=n_groups)
+            m2_y[:, j] = np.bincount(g, weights=dy * dy, minlength=n_groups)
+            c_xy[:, j] = np.bincount(g, weights=dx * dy, minlength=n_groups)
+
+        return cls(n, mean_x, mean_y, m2_x, m2_y, c_xy)
+
+    @classmethod
+    def empty(cls, n_groups, n_features):
+        """Accumulators for groups that have not seen any rows yet"""
+        return cls(*(np.zeros((n_groups, n_features)) for _ in range(6)))
+
+    def combine(self, groups):
+        """Merge the selected groups (index array or boolean mask) into one row"""
+        n = self.n[groups]
+        total = n.sum(axis=0)
+        safe = np.where(total > 0, total, 1)
+        mx = (n * self.mean_x[groups]).sum(axis=0) / safe
+        my = (n * self.mean_y[groups]).sum(axis=0) / safe
+        dx = self.mean_x[groups] - mx
+        dy = self.mean_y[groups] - my
+        return CoMoments(
+            total[None, :], mx[None, :], my[None, :],
+            (self.m2_x[groups] + n * dx * dx).sum(axis=0)[None, :],
+            (self.m2_y[groups] + n * dy * dy).sum(axis=0)[None, :],
+            (self.c_xy[groups] + n * dx * dy).sum(axis=0)[None, :],
+        )
+
+    def merge(self, other):
+        """Group-wise merge with another CoMoments of the same shape (Chan's update)"""
+        n = self.n + other.n
+        safe = np.where(n > 0, n, 1)
+        delta_x = other.mean_x - self.mean_x
+        delta_y = other.mean_y - self.mean_y
+        weight = self.n * other.n / safe
+        return CoMoments(
+            n,
+            self.mean_x + delta_x * other.n / safe,
+            self.mean_y + delta_y * other.n / safe,
+            self.m2_x + other.m2_x + delta_x * delta_x * weight,
+            self.m2_y + other.m2_y + delta_y * delta_y * weight,
+            self.c_xy + other.c_xy + delta_x * delta_y * weight,
+        )
+
+    def take(self, positions, n_groups):
+        """Place these groups at `positions` of a larger, otherwise empty CoMoments"""
+        def spread(a):
+            out = np.zeros((n_groups, a.shape[1]))
+            out[positions] = a
+            return out
+        return CoMoments(*(spread(getattr(self, name))
+                           for name in ('n', 'mean_x', 'mean_y', 'm2_x', 'm2_y', 'c_xy')))
+
+    def correlation(self):
+        """Pearson correlation per (group, feature); NaN where undefined"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r = self.c_xy / np.sqrt(self.m2_x * self.m2_y)
+        return np.where(self.n > 1, r, np.nan)
+
+
+def year_moments(df, features, target='popularity', year_col='year'):
+    """
+    Per-year co-moments of every feature against the target
+
+    Returns (years, moments, row_counts) with one row per distinct year.
+    """
+    years, codes = np.unique(df[year_col].to_numpy(), return_inverse=True)
+    moments = CoMoments.from_arrays(codes, df[features].to_numpy(), df[target].to_numpy(), len(years))
+    row_counts = np.bincount(codes, minlength=len(years))
+    return years, moments, row_counts
+
+
+def stream_year_moments(path, features, target='popularity', year_col='year',
+                        chunksize=500_000, **read_csv_kwargs):
+    """
+    Out-of-core version of year_moments: reads `path` in fixed-size chunks
+
+    Each chunk's per-year co-moments are merged into running accumulators, so
+    peak memory depends on the chunk size, not on the size of the file.
+    """
+    years = np.zeros(0, dtype=np.int64)
+    moments = CoMoments.empty(0, len(features))
+    row_counts = np.zeros(0, dtype=np.int64)
+    reader = pd.read_csv(path, usecols=features + [target, year_col], chunksize=chunksize, **read_csv_kwargs)
+
+    for chunk in reader:
+        chunk = chunk.dropna(subset=[year_col])
+        chunk_years, chunk_moments, chunk_counts = year_moments(chunk, features, target, year_col)
+
+        # Grow the accumulators when the chunk brings years not seen before
+        all_years = np.union1d(years, chunk_years)
+        if len(all_years) > len(years):
+            old_pos = np.searchsorted(all_years, years)
+            moments = moments.take(old_pos, len(all_years))
+            counts = np.zeros(len(all_years), dtype=np.int64)
+            counts[old_pos] = row_counts
+            years, row_counts = all_years, counts
+
+        pos = np.searchsorted(years, chunk_years)
+        moments = moments.merge(chunk_moments.take(pos, len(years)))
+        row_counts[pos] += chunk_counts
+
+    return years, moments, row_counts
+
+
+def combine_eras(years, moments, row_counts, eras, features):
+    """Merge per-year co-moments into eras; returns (corr_df, era_counts)"""
+    if not eras:
+        return pd.DataFrame(columns=features, dtype=float), pd.Series(dtype='int64')
+    labels = [label for label, _, _ in eras]
+    rows = []
+    counts = []
+    for _, start, end in eras:
+        in_era = (years >= start) & (years <= end)
+        rows.append(moments.combine(in_era).correlation()[0])
+        counts.append(int(row_counts[in_era].sum()))
+    corr_df = pd.DataFrame(rows, index=labels, columns=features)
+    return corr_df, pd.Series(counts, index=labels, name='count')
+
+
+class PrefixIndex:
+    """
+    Cumulative per-year sufficient statistics for correlations over any year range
+
+    For every feature: n, sum x, sum y, sum x², sum y² and sum xy (pairwise
+    complete), accumulated over a dense run of years from first_year, so that
+    cum[s][i] covers the years before first_year + i. A range [start, end] is
+    cum[s][end + 1] - cum[s][start]: O(features) whatever the number of rows.
+    x and y are shifted by their overall means before summing, which keeps the
+    raw-sum formula for the correlation well conditioned.
+    """
+
+    STATS = ('n', 'sx', 'sy', 'sxx', 'syy', 'sxy')
+
+    def __init__(self, first_year, features, cum, row_counts, shift_x, shift_y):
+        self.first_year = int(first_year)
+        self.features = list(features)
+        self.cum = cum                  # {stat: (span + 1, features) array}
+        self.row_counts = row_counts    # (span + 1,) cumulative track counts
+        self.shift_x = shift_x
+        self.shift_y = shift_y
+
+    @classmethod
+    def from_year_moments(cls, years, moments, row_counts, features):
+        """Index of the per-year co-moments returned by year_moments / stream_year_moments"""
+        years = np.asarray(years, dtype=np.int64)
+        overall = moments.combine(np.ones(len(years), dtype=bool))
+        shift_x, shift_y = overall.mean_x[0], overall.mean_y[0]
+        n = moments.n
+        dx = np.where(n > 0, moments.mean_x - shift_x, 0)
+        dy = np.where(n > 0, moments.mean_y - shift_y, 0)
+        per_year = {
+            'n': n,
+            'sx': n * dx,
+            'sy': n * dy,
+            'sxx': moments.m2_x + n * dx * dx,
+            'syy': moments.m2_y + n * dy * dy,
+            'sxy': moments.c_xy + n * dx * dy,
+        }
+        span = int(years[-1] - years[0]) + 1 if len(years) else 0
+        pos = years - years[0] + 1 if len(years) else years
+        cum = {}
+        for name, values in per_year.items():
+            dense = np.zeros((span + 1, len(features)))
+            dense[pos] = values
+            cum[name] = np.cumsum(dense, axis=0)
+        counts = np.zeros(span + 1, dtype=np.int64)
+        counts[pos] = row_counts
+        first_year = years[0] if len(years) else 0
+        return cls(first_year, features, cum, np.cumsum(counts), shift_x, shift_y)
+
+    @classmethod
+    def from_frame(cls, df, features, target='popularity', year_col='year'):
+        years, moments, row_counts = year_moments(df, features, target, year_col)
+        return cls.from_year_moments(years, moments, row_counts, features)
+
+    @property
+    def last_year(self):
+        return self.first_year + len(self.row_counts) - 2
+
+    def _bounds(self, start, end):
+        """Positions in the cumulative arrays of the inclusive year range [start, end]"""
+        span = len(self.row_counts) - 1
+        lo = min(max(start - self.first_year, 0), span)
+        hi = min(max(end - self.first_year + 1, lo), span)
+        return lo, hi
+
+    def stats(self, start, end):
+        """{stat: per-feature sums} over the tracks released in [start, end]"""
+        lo, hi = self._bounds(start, end)
+        return {name: self.cum[name][hi] - self.cum[name][lo] for name in self.STATS}
+
+    def count(self, start, end):
+        """Number of tracks released in [start, end]"""
+        lo, hi = self._bounds(start, end)
+        return int(self.row_counts[hi] - self.row_counts[lo])
+
+    def correlation(self, start, end):
+        """Pearson correlation of every feature with the target over [start, end]; NaN where undefined"""
+        s = self.stats(start, end)
+        n = s['n']
+        cov = n * s['sxy'] - s['sx'] * s['sy']
+        var = (n * s['sxx'] - s['sx'] ** 2) * (n * s['syy'] - s['sy'] ** 2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r = cov / np.sqrt(var)
+        return np.where((n > 1) & (var > 0), np.clip(r, -1, 1), np.nan)
+
+    def era_correlations(self, eras):
+        """Same result as combine_eras for these eras, one lookup per era"""
+        if not eras:
+            return pd.DataFrame(columns=self.features, dtype=float), pd.Series(dtype='int64')
+        labels = [label for label, _, _ in eras]
+        corr_df = pd.DataFrame([self.correlation(start, end) for _, start, end in eras],
+                               index=labels, columns=self.features)
+        counts = pd.Series([self.count(start, end) for _, start, end in eras], index=labels, name='count')
+        return corr_df, counts
+
+    def to_json(self):
+        """Page payload: the cumulative arrays flattened row-major (year, feature)"""
+        return {
+            'first_year': self.first_year,
+            'last_year': self.last_year,
+            'features': self.features,
+            'counts': self.row_counts.tolist(),
+            **{name: self.cum[name].ravel().tolist() for name in self.STATS},
+        }
+
+
+def era_correlations(df, features, eras=CLASSIC_ERAS, target='popularity', year_col='year'):
+    """
+    Correlation of every feature with the target for every era
+
+    Returns corr_df (eras × features) and the number of tracks per era.
+    Eras may overlap (rolling windows): each era is a merge of per-year moments.
+    """
+    years, moments, row_counts = year_moments(df, features, target, year_col)
+    return combine_eras(years, moments, row_counts, eras, features)
+
+
+def stream_era_correlations(path, features, eras=CLASSIC_ERAS, target='popularity', year_col='year',
+                            chunksize=500_000, **read_csv_kwargs):
+    """Same result as era_correlations, computed by streaming `path` chunk by chunk"""
+    years, moments, row_counts = stream_year_moments(path, features, target, year_col,
+                                                     chunksize, **read_csv_kwargs)
+    return combine_eras(years, moments, row_counts, eras, features)
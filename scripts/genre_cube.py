@@ -0,0 +1,95 @@
+"""
+Act 1: 预聚合的 年份×流派 计数立方体
+一次向量化计数 (np.bincount) 得到逐年计数，并预先汇总为 5 年与 10 年分辨率；
+可选地按艺人保存稀疏计数。交互页面直接在立方体上切换分辨率与流派子集，无需重新聚合原始数据
+"""
+
+import numpy as np
+import pandas as pd
+
+from genre_grid import interpolate_shares
+
+# 分辨率（年）：逐年、5 年、10 年
+RESOLUTIONS = (1, 5, 10)
+
+
+class GenreCube:
+    """
+    年份×流派 计数立方体及其各分辨率的汇总
+
+    counts[r]: 形状为 (区间数, 流派数) 的整数矩阵，区间起点为 bins[r]；
+    artist_counts: 可选的稀疏按艺人计数 (艺人编码, 年份下标, 流派下标, 计数)。
+    """
+
+    def __init__(self, years, genres, counts, artists=None, artist_counts=None):
+        self.years = np.asarray(years)
+        self.genres = list(genres)
+        self.counts = {1: np.asarray(counts)}
+        self.bins = {1: self.years}
+        for width in RESOLUTIONS[1:]:
+            self.bins[width], self.counts[width] = self._rollup(width)
+        self.artists = artists
+        self.artist_counts = artist_counts
+
+    @classmethod
+    def build(cls, df, years, genres=None, year_col='Year', genre_col='main_genre', artist_col=None):
+        """一次遍历统计 years 范围内每年每个流派的歌曲数（以及可选的按艺人计数）"""
+        years = np.asarray(years)
+        codes, uniques = pd.factorize(df[genre_col], sort=genres is None)
+        if genres is None:
+            genres = list(uniques)
+        else:
+            # 按给定的流派顺序重新编码，未列出的流派不计入
+            codes = pd.Index(genres).get_indexer(uniques)[codes]
+        year_idx = df[year_col].to_numpy() - years[0]
+        keep = (codes >= 0) & (year_idx >= 0) & (year_idx < len(years))
+        year_idx, codes = year_idx[keep].astype(np.int64), codes[keep].astype(np.int64)
+
+        n_genres = len(genres)
+        flat = year_idx * n_genres + codes
+        counts = np.bincount(flat, minlength=len(years) * n_genres).reshape(len(years), n_genres)
+
+        artists = artist_counts = None
+        if artist_col is not None:
+            artist_codes, artists = pd.factorize(df[artist_col].to_numpy()[keep])
+            n_cells = len(years) * n_genres
+            cells, cell_counts = np.unique(artist_codes.astype(np.int64) * n_cells + flat, return_counts=True)
+            artist_counts = np.column_stack([cells // n_cells, cells % n_cells // n_genres, cells % n_genres,
+                                             cell_counts])
+            artists = [str(a) for a in artists]
+        return cls(years, genres, counts.astype(np.int64), artists, artist_counts)
+
+    def _rollup(self, width):
+        """逐年计数按 width 年的区间求和（区间起点对齐到 width 的整数倍）"""
+        starts = self.years // width * width
+        bins, inverse = np.unique(starts, return_inverse=True)
+        rolled = np.zeros((len(bins), len(self.genres)), dtype=np.int64)
+        np.add.at(rolled, inverse, self.counts[1])
+        return bins, rolled
+
+    def counts_frame(self, width=1):
+        """计数宽表：行是区间起点，列是流派"""
+        return pd.DataFrame(self.counts[width], index=pd.Index(self.bins[width], name='Year'),
+                            columns=pd.Index(self.genres, name='main_genre'))
+
+    def shares(self, width=1, genres=None):
+        """所选流派（默认全部）在各区间内的占比宽表，缺失处理与 pivot_genre_grid 相同"""
+        counts = self.counts_frame(width)
+        if genres is not None:
+            counts = counts[list(genres)]
+        totals = counts.sum(axis=1).replace(0, np.nan)
+        return interpolate_shares(counts.div(totals, axis=0).astype('float64'))
+
+    def to_json(self):
+        """页面内嵌用的紧凑表示：整数计数按区间行优先展开，艺人计数为扁平的四元组数组"""
+        payload = {
+            'genres': self.genres,
+            'years': self.years.tolist(),
+            'resolutions': {str(width): {'bins': self.bins[width].tolist(),
+                                         'counts': self.counts[width].ravel().tolist()}
+                            for width in RESOLUTIONS},
+        }
+        if self.artists is not None:
+            payload['artists'] = self.artists
+            payload['artist_counts'] = self.artist_counts.ravel().tolist()
+        return payload
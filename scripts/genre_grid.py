@@ -0,0 +1,90 @@
+"""
+Act 1: 年份×流派 矩阵的补全与插值
+用 pivot + reindex 一次性构建完整矩阵，代替逐年逐流派的布尔过滤循环
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def aggregate_genre_years(df, year_col='Year', genre_col='main_genre'):
+    """每年每个流派的歌曲数 (Count) 及其在当年的占比 (Percentage)，长表"""
+    df_agg = df.groupby([year_col, genre_col]).size().reset_index(name='Count')
+    total_yearly_count = df_agg.groupby(year_col)['Count'].transform('sum')
+    df_agg['Percentage'] = df_agg['Count'] / total_yearly_count
+    return df_agg
+
+
+def pivot_genre_grid(df_agg, years, genres=None):
+    """
+    把聚合长表 (Year, main_genre, Count, Percentage) 展开为完整的 年份×流派 矩阵
+
+    返回 (counts, shares) 两个宽表：行是年份，列是流派。
+    缺失年份的 Count 记为 0；Percentage 中的缺失值与 0 按流派线性插值，
+    首尾用最近的有效值填充，整列都没有数据时记为 0。
+    """
+    if genres is None:
+        genres = df_agg['main_genre'].unique()
+    years = pd.Index(years, name='Year')
+    genres = pd.Index(genres, name='main_genre')
+
+    counts = (
+        df_agg.pivot(index='Year', columns='main_genre', values='Count')
+        .reindex(index=years, columns=genres)
+        .fillna(0)
+        .astype('int64')
+    )
+
+    shares = (
+        df_agg.pivot(index='Year', columns='main_genre', values='Percentage')
+        .reindex(index=years, columns=genres)
+        .astype('float64')
+    )
+    shares = interpolate_shares(shares)
+
+    return counts, shares
+
+
+def interpolate_shares(shares):
+    """占比宽表的缺失处理：0 与缺失值按流派线性插值，首尾用最近的有效值填充，整列都没有数据时记为 0"""
+    shares = shares.replace(0, np.nan)
+    shares = shares.interpolate(method='linear', limit_direction='both')
+    return shares.fillna(0)
+
+
+def grid_to_long(counts, shares):
+    """把宽表还原为 (Year, main_genre, Count, Percentage) 长表，顺序为先年份后流派"""
+    n_years, n_genres = shares.shape
+    return pd.DataFrame({
+        'Year': np.repeat(shares.index.to_numpy(), n_genres),
+        'main_genre': np.tile(shares.columns.to_numpy(), n_years),
+        'Count': counts.to_numpy().ravel(),
+        'Percentage': shares.to_numpy().ravel(),
+    })
+
+
+def complete_genre_grid(df_agg, years, genres=None, wide=False):
+    """
+    补全并插值 年份×流派 数据
+
+    wide=False 时返回与原先循环版本一致的长表；
+    wide=True 时直接返回插值后的占比宽表，可直接用于堆叠面积图。
+    """
+    counts, shares = pivot_genre_grid(df_agg, years, genres)
+    if wide:
+        return shares
+    return grid_to_long(counts, shares)
+
+
+def genre_series_table(shares, decimals=4):
+    """
+    页面内嵌用的 流派 → 占比序列 查找表
+
+    年份只存一份，每个流派一个与年份对齐的占比数组：
+    {'years': [...], 'shares': {流派: [...]}}
+    """
+    return {
+        'years': [int(y) for y in shares.index],
+        'shares': {str(genre): np.round(shares[genre].to_numpy(dtype=np.float64), decimals).tolist()
+                   for genre in shares.columns},
+    }
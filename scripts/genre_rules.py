@@ -0,0 +1,114 @@
+"""
+流派归类：规则表 + 预编译匹配器
+Act 1 和 Act 2 共用，只对去重后的流派字符串做一次匹配，再按编码广播回每一行
+"""
+
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# 一条规则：命中 any_of 中任一关键词，且 requires 全部命中、excludes 都未命中时，归为 label
+GenreRule = namedtuple('GenreRule', ['label', 'any_of', 'requires', 'excludes'])
+
+
+def rule(label, *any_of, requires=(), excludes=()):
+    """便捷构造一条归类规则"""
+    return GenreRule(label, tuple(any_of), tuple(requires), tuple(excludes))
+
+
+# Act 1 (ClassicHit.csv) 的"高保真"流派映射，顺序即优先级
+ACT1_GENRE_RULES = [
+    rule('Pop', 'pop', excludes=('soft rock',)),
+    rule('Soft Rock', 'soft rock'),
+    rule('Alternative Rock', 'alt', requires=('rock',)),
+    rule('Hard Rock', 'hard rock'),
+    rule('Punk', 'punk'),
+    rule('Hip Hop', 'hip hop', 'hip-hop'),
+    rule('R&B', 'r&b', 'rnb'),
+    rule('Funk', 'funk'),
+    rule('Jazz', 'jazz'),
+    rule('Blues', 'blues'),
+    rule('Country', 'country'),
+    rule('Electronic', 'electronic', 'edm'),
+    rule('Rock', 'rock'),  # 通用 Rock 类别
+    rule('Soul', 'soul'),
+    rule('Disco', 'disco'),
+    rule('Reggae', 'reggae'),
+    rule('Folk', 'folk'),
+]
+
+# Act 2 (top50contry.csv) 的 meta-genre 映射，顺序即优先级
+ACT2_GENRE_RULES = [
+    rule('Pop', 'pop'),
+    rule('Hip Hop / Rap', 'rap', 'hip hop'),
+    rule('Latin', 'latin', 'reggaeton', 'colombian', 'argentine', 'panamanian', 'espanol'),
+    rule('Electronic / Dance', 'edm', 'electro', 'house', 'dance'),
+    rule('R&B', 'r&b'),
+    rule('Rock', 'rock', 'wave'),
+    rule('Indie / Alternative', 'indie'),
+    rule('Brazilian', 'sertanejo', 'funk carioca', 'brega funk'),
+    rule('K-Pop', 'k-pop'),
+    rule('J-Pop', 'j-pop'),
+    rule('South Asian', 'desi', 'bollywood', 'punjabi'),
+]
+
+
+class GenreClassifier:
+    """
+    基于有序规则表的流派归类器
+
+    所有关键词编译成一个正则，一次扫描即可得到字符串中出现的全部关键词；
+    结果按原始字符串缓存，同一进程内多次调用之间复用（如增量模式的各批新行）。
+    """
+
+    def __init__(self, rules, default='Other'):
+        self.rules = list(rules)
+        self.default = default
+
+        keywords = sorted({kw for r in self.rules for kw in r.any_of + r.requires + r.excludes},
+                          key=len, reverse=True)
+        # 零宽前瞻，保证重叠出现的关键词（如 'soft rock' 与 'rock'）都能被找到
+        self._pattern = re.compile('(?=(' + '|'.join(re.escape(kw) for kw in keywords) + '))')
+        # 同一位置只返回最长的关键词，它的前缀关键词也一并视为命中
+        self._implied = {kw: frozenset(k for k in keywords if kw.startswith(k)) for kw in keywords}
+
+        self.memo = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _match(self, text):
+        """对单个（已转小写的）字符串求归类结果"""
+        found = set()
+        for m in self._pattern.finditer(text):
+            found |= self._implied[m.group(1)]
+        for r in self.rules:
+            if (any(kw in found for kw in r.any_of)
+                    and all(kw in found for kw in r.requires)
+                    and not any(kw in found for kw in r.excludes)):
+                return r.label
+        return self.default
+
+    def classify_one(self, genre):
+        """归类单个流派字符串，非字符串返回默认类别"""
+        if not isinstance(genre, str):
+            return self.default
+        label = self.memo.get(genre)
+        if label is None:
+            self.misses += 1
+            label = self.memo[genre] = self._match(genre.lower())
+        else:
+            self.hits += 1
+        return label
+
+    def classify(self, genres):
+        """
+        归类整列流派
+
+        先 factorize 得到去重后的字符串，只对它们做匹配，再按编码广播回每一行。
+        """
+        codes, uniques = pd.factorize(genres)
+        labels = np.array([self.classify_one(g) for g in uniques] + [self.default], dtype=object)
+        # 缺失值的编码为 -1，正好取到末尾的默认类别
+        return pd.Series(labels[codes], index=genres.index, name=genres.name)
@@ -0,0 +1,214 @@
+"""
+Act 1: 可增量追加的 年份×流派 计数与占比
+持久保存每个 (年份, 流派) 的歌曲数与插值后的占比。追加一批新歌曲时只累加这批歌曲的计数，
+只重算受影响年份的占比，并只在受影响的区间内重新插值；结果与 pivot_genre_grid 全量重建一致
+
+    state = load_genre_state(state_path(source), source, years, ACT1_GENRE_RULES)
+    batch, end = state.read_appended(source, ['Year', 'Genre'])   # 只解析新追加的行
+    batch['main_genre'] = classifier.classify(batch['Genre'])
+    state.ingest(batch)
+    state.mark_read(source, end)
+    state.save(state_path(source))
+    counts, shares = state.frames()
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_cache import derived_path
+
+# 状态文件格式变化时递增，旧文件会被全量重建
+STATE_FORMAT = 1
+
+# 校验已摄入部分时比较其开头与末尾各这么多字节的哈希
+EDGE_BYTES = 1 << 16
+
+
+def state_path(source_path, cache_dir=None):
+    """源 CSV 对应的状态文件路径，与列式缓存放在同一目录"""
+    return derived_path(source_path, 'genre-state', cache_dir) + '.json'
+
+
+def prefix_hash(path, offset, size=EDGE_BYTES):
+    """
+    文件前 offset 个字节的开头与末尾各 size 个字节的 SHA-1
+
+    只用于确认文件是在已摄入的内容之后追加的；中间的行被改写时识别不出来，需删除状态文件重建。
+    """
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        h.update(f.read(min(size, offset)))
+        start = max(offset - size, 0)
+        f.seek(start)
+        h.update(f.read(offset - start))
+    return h.hexdigest()
+
+
+def _rules_key(rules):
+    """规则表的可比较形式（规则变化后旧的计数作废）"""
+    return json.loads(json.dumps(rules))
+
+
+class GenreShareState:
+    """
+    年份×流派 计数、每年总数与插值后的占比
+
+    counts: 形状为 (年份数, 流派数) 的整数矩阵，列按流派首次出现的顺序追加；
+    shares: 同形状的占比矩阵，缺失处理与 genre_grid.interpolate_shares 相同；
+    offset / prefix_sha1: 源 CSV 中已摄入的字节数及其 prefix_hash。
+    """
+
+    def __init__(self, years, genres=(), counts=None, shares=None, rules=None,
+                 offset=0, prefix_sha1=None, rows_ingested=0):
+        self.years = np.asarray(years, dtype=np.int64)
+        self.genres = list(genres)
+        shape = (len(self.years), len(self.genres))
+        self.counts = np.zeros(shape, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self.shares = np.zeros(shape) if shares is None else np.asarray(shares, dtype=np.float64)
+        self.totals = self.counts.sum(axis=1)
+        self.rules = None if rules is None else _rules_key(rules)
+        self.offset = offset
+        self.prefix_sha1 = prefix_sha1
+        self.rows_ingested = rows_ingested
+
+    def _genre_columns(self, genres):
+        """各流派的列下标，没见过的流派追加为新列"""
+        index = {genre: j for j, genre in enumerate(self.genres)}
+        new = [genre for genre in genres if genre not in index]
+        if new:
+            index.update((genre, len(self.genres) + i) for i, genre in enumerate(new))
+            self.genres.extend(new)
+            padding = np.zeros((len(self.years), len(new)))
+            self.counts = np.hstack([self.counts, padding.astype(np.int64)])
+            self.shares = np.hstack([self.shares, padding])
+        return np.array([index[genre] for genre in genres], dtype=np.int64)
+
+    def ingest(self, batch, year_col='Year', genre_col='main_genre'):
+        """
+        累加一批歌曲（需含 year_col 与已归类的 genre_col），返回受影响的年份
+
+        只有这批歌曲所在年份的占比会变；每个流派只在这些年份两侧最近的
+        有效年份之间重新插值，代价与批量大小而非历史数据量成正比。
+        """
+        year_idx = batch[year_col].to_numpy() - self.years[0]
+        keep = (year_idx >= 0) & (year_idx < len(self.years))
+        year_idx = year_idx[keep].astype(np.int64)
+        codes, uniques = pd.factorize(batch[genre_col].to_numpy()[keep])
+        columns = self._genre_columns([str(genre) for genre in uniques])[codes]
+
+        np.add.at(self.counts, (year_idx, columns), 1)
+        np.add.at(self.totals, year_idx, 1)
+        affected = np.unique(year_idx)
+        self._reinterpolate(affected)
+        self.rows_ingested += int(keep.sum())
+        return self.years[affected]
+
+    def _reinterpolate(self, rows):
+        """重算 rows 这些年份的占比，并在受影响的区间内重新插值"""
+        last = len(self.years) - 1
+        for j in np.flatnonzero((self.counts[rows] > 0).any(axis=0)):
+            column = self.counts[:, j]
+            valid = np.flatnonzero(column)
+            # 占比变化的年份在有效年份中的位置；区间延伸到两侧最近的有效年份（首尾延伸到边界）
+            hits = np.searchsorted(valid, rows[column[rows] > 0])
+            spans = []
+            for hit in hits:
+                lo = valid[hit - 1] if hit > 0 else 0
+                hi = valid[hit + 1] if hit + 1 < len(valid) else last
+                if spans and lo <= spans[-1][1]:
+                    spans[-1][1] = hi
+                else:
+                    spans.append([lo, hi])
+            for lo, hi in spans:
+                points = valid[np.searchsorted(valid, lo):np.searchsorted(valid, hi, side='right')]
+                values = column[points] / self.totals[points]
+                self.shares[lo:hi + 1, j] = np.interp(np.arange(lo, hi + 1), points, values)
+                self.shares[points, j] = values
+
+    def genre_order(self):
+        """与全量聚合相同的流派顺序：按首次出现的年份，同一年内按名称"""
+        first = (self.counts > 0).argmax(axis=0)
+        return sorted(range(len(self.genres)), key=lambda j: (first[j], self.genres[j]))
+
+    def frames(self):
+        """(counts, shares) 宽表，与 pivot_genre_grid 的返回值相同"""
+        order = self.genre_order()
+        index = pd.Index(self.years, name='Year')
+        columns = pd.Index([self.genres[j] for j in order], name='main_genre')
+        return (pd.DataFrame(self.counts[:, order], index=index, columns=columns),
+                pd.DataFrame(self.shares[:, order], index=index, columns=columns))
+
+    def follows(self, path):
+        """path 是否为已摄入的文件追加新行之后的样子（已摄入部分的开头与末尾未变）"""
+        return (self.prefix_sha1 is not None and os.path.getsize(path) >= self.offset
+                and prefix_hash(path, self.offset) == self.prefix_sha1)
+
+    def read_appended(self, path, columns=None, encoding='utf-8'):
+        """解析 path 中已摄入位置之后追加的行，返回 (新行, 文件末尾位置)"""
+        with open(path, 'rb') as f:
+            header = f.readline().decode(encoding)
+            f.seek(self.offset)
+            data = f.read()
+        names = next(csv.reader([header]))
+        end = self.offset + len(data)
+        if not data.strip():
+            return pd.DataFrame(columns=columns or names), end
+        return pd.read_csv(io.BytesIO(data), header=None, names=names, usecols=columns, encoding=encoding), end
+
+    def mark_read(self, path, offset):
+        """记录源文件已摄入到 offset 字节"""
+        self.offset = offset
+        self.prefix_sha1 = prefix_hash(path, offset)
+
+    def to_dict(self):
+        return {
+            'format': STATE_FORMAT,
+            'rules': self.rules,
+            'years': self.years.tolist(),
+            'genres': self.genres,
+            'counts': self.counts.tolist(),
+            'shares': self.shares.tolist(),
+            'offset': self.offset,
+            'prefix_sha1': self.prefix_sha1,
+            'rows_ingested': self.rows_ingested,
+        }
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('format') != STATE_FORMAT:
+            raise ValueError(f"{path} has format {state.get('format')!r}, expected {STATE_FORMAT}")
+        n_years = len(state['years'])
+        counts = np.asarray(state['counts'], dtype=np.int64).reshape(n_years, len(state['genres']))
+        shares = np.asarray(state['shares'], dtype=np.float64).reshape(counts.shape)
+        return cls(state['years'], state['genres'], counts, shares, state['rules'],
+                   state['offset'], state['prefix_sha1'], state['rows_ingested'])
+
+
+def load_genre_state(path, source_path, years, rules):
+    """
+    可以继续追加的已保存状态；没有状态、格式/年份/规则不同或源文件不是只追加了新行时返回 None
+    """
+    if not os.path.exists(path) or not os.path.exists(source_path):
+        return None
+    try:
+        state = GenreShareState.load(path)
+    except (ValueError, KeyError) as exc:
+        print(f"忽略已保存的流派状态 {path}: {exc}")
+        return None
+    if state.years.tolist() != list(years) or state.rules != _rules_key(rules) or not state.follows(source_path):
+        return None
+    return state
@@ -0,0 +1,22 @@
+"""
+Act 2 仪表盘的 gunicorn 配置
+
+进程数和线程数通过环境变量调整：
+    WEB_CONCURRENCY   worker 进程数（默认 CPU 核数 × 2 + 1）
+    GUNICORN_THREADS  每个 worker 的线程数（默认 4）
+    PORT              监听端口（默认 8050）
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8050')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+
+# 在 master 中加载应用：构建产物只读取一次，worker fork 后共享内存
+preload_app = True
+
+timeout = 30
+keepalive = 5
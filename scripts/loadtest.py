@@ -0,0 +1,147 @@
+"""
+Act 2 仪表盘的本地压测工具
+
+对每个 worker 数启动一次 gunicorn（或直接压测已运行的地址），
+并发发送与下拉框切换相同的回调请求，统计 p50/p99 延迟和每秒请求数。
+
+    python loadtest.py --workers 1 2 4 8 --requests 5000 --concurrency 32
+    python loadtest.py --url http://127.0.0.1:8050 --requests 2000
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+CALLBACK_PATH = '/_dash-update-component'
+COUNTRIES = ['Global Average', 'japan', 'brazil', 'usa', 'india', 'germany', 'colombia', 'world']
+
+
+def callback_body(country):
+    """与浏览器中切换国家时相同的回调请求体"""
+    return json.dumps({
+        'output': 'genre-detail-chart.figure',
+        'outputs': {'id': 'genre-detail-chart', 'property': 'figure'},
+        'inputs': [{'id': 'country-dropdown', 'property': 'value', 'value': country}],
+        'changedPropIds': ['country-dropdown.value'],
+        'state': [],
+    }).encode('utf-8')
+
+
+def post_callback(url, body):
+    request = urllib.request.Request(
+        url + CALLBACK_PATH, data=body,
+        headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'}
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def wait_for_port(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"服务器在 {timeout} 秒内未能启动 (port {port})")
+
+
+def run_load(url, n_requests, concurrency):
+    """并发发送 n_requests 个回调请求，返回延迟统计"""
+    bodies = [callback_body(c) for c in COUNTRIES]
+    latencies = np.zeros(n_requests)
+    errors = [0]
+    counter = iter(range(n_requests))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                post_callback(url, bodies[i % len(bodies)])
+            except OSError:
+                with lock:
+                    errors[0] += 1
+            latencies[i] = time.perf_counter() - start
+
+    # 预热：每个国家先请求一次
+    for body in bodies:
+        post_callback(url, body)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'requests': n_requests,
+        'concurrency': concurrency,
+        'errors': errors[0],
+        'p50_ms': float(np.percentile(latencies, 50) * 1e3),
+        'p99_ms': float(np.percentile(latencies, 99) * 1e3),
+        'rps': n_requests / elapsed,
+    }
+
+
+def run_with_gunicorn(workers, threads, port, n_requests, concurrency):
+    """以指定 worker 数启动 gunicorn，压测后关闭"""
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads), PORT=str(port))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:server'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(port)
+        return run_load(f'http://127.0.0.1:{port}', n_requests, concurrency)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='压测已运行的服务器，不再自行启动 gunicorn')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4, help='每个 worker 的线程数')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--port', type=int, default=8051)
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    results = []
+    if args.url:
+        results.append(dict(run_load(args.url.rstrip('/'), args.requests, args.concurrency), workers=None))
+    else:
+        for workers in args.workers:
+            print(f"正在压测 {workers} 个 worker × {args.threads} 线程...")
+            result = run_with_gunicorn(workers, args.threads, args.port, args.requests, args.concurrency)
+            results.append(dict(result, workers=workers, threads=args.threads))
+
+    print(f"{'workers':>8} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9} {'errors':>7}")
+    for r in results:
+        print(f"{str(r['workers'] or '-'):>8} {r['p50_ms']:9.2f} {r['p99_ms']:9.2f} {r['rps']:9.0f} {r['errors']:7d}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
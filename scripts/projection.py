@@ -0,0 +1,112 @@
+"""
+Act 4: 2-D projection of the nine scaled audio features for the music universe map
+Incremental PCA fitted chunk by chunk over every track of the loaded frame: the
+scaled copy of the features is never held for more than one chunk of rows, but the
+frame itself is in memory (dv_4-2.py loads the whole catalogue anyway). Each track's
+coordinates are written to a memory-mapped .npy next to the columnar cache and
+reused across runs until data.csv or the features change.
+
+    projection, fitted = load_or_fit_projection(df, features, dataset_path('data.csv'))
+    xy = projection.coords[rows]          # cached coordinates of catalogue rows
+    projection.transform(new_tracks)      # project tracks that are not in the catalogue
+"""
+
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+from sklearn.decomposition import IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+
+from clustering import iter_chunks
+from data_cache import derived_path, source_signature, source_unchanged
+
+# Bumped whenever the cached files change layout, so old projections are refitted
+PROJECTION_FORMAT = 1
+
+
+class Projection:
+    """Fitted scaler + 2-component PCA, with the memory-mapped coordinates of every catalogue track"""
+
+    def __init__(self, features, scaler, pca, coords, fit_seconds):
+        self.features = list(features)
+        self.scaler = scaler
+        self.pca = pca
+        self.coords = coords
+        self.fit_seconds = fit_seconds
+
+    def transform(self, X):
+        """2-D coordinates of raw (unscaled) feature rows"""
+        if hasattr(X, 'columns'):
+            X = X[self.features]
+        return self.pca.transform(self.scaler.transform(X)).astype(np.float32)
+
+    def axis_title(self, component, top_n=2):
+        """'PC 1 (31% of variance): +energy, -acousticness' - the features that load most on the axis"""
+        loadings = self.pca.components_[component]
+        top = np.argsort(-np.abs(loadings))[:top_n]
+        terms = ', '.join(f"{'+' if loadings[i] > 0 else '-'}{self.features[i]}" for i in top)
+        return f"PC {component + 1} ({self.pca.explained_variance_ratio_[component]:.0%} of variance): {terms}"
+
+
+def fit_projection(df, features, prefix, chunksize=100_000):
+    """
+    Fit the scaler and the incremental PCA one chunk of rows at a time, then
+    write every track's coordinates to <prefix>.npy
+
+    Three passes over the in-memory frame (scaler, PCA, transform); only one
+    scaled chunk is held at a time on top of the frame, and the coordinates go
+    straight to disk.
+    """
+    start = time.perf_counter()
+    X = df[features]
+    scaler = StandardScaler()
+    for rows in iter_chunks(len(df), chunksize):
+        scaler.partial_fit(X.iloc[rows])
+
+    pca = IncrementalPCA(n_components=2)
+    for rows in iter_chunks(len(df), chunksize):
+        # partial_fit needs at least n_components rows
+        if len(rows) >= pca.n_components:
+            pca.partial_fit(scaler.transform(X.iloc[rows]))
+
+    tmp_path = prefix + '.tmp.npy'
+    coords = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(len(df), 2))
+    for rows in iter_chunks(len(df), chunksize):
+        coords[rows] = pca.transform(scaler.transform(X.iloc[rows]))
+    coords.flush()
+    del coords
+    os.replace(tmp_path, prefix + '.npy')
+    return scaler, pca, time.perf_counter() - start
+
+
+def load_or_fit_projection(df, features, source_path, cache_dir=None, chunksize=100_000):
+    """
+    The cached projection of `source_path`'s tracks, refitted when it is missing or stale
+
+    The projection is reused while the source file's content hash, the features
+    and the number of rows are unchanged. Returns (projection, fitted) where
+    `fitted` is False when it was loaded from disk.
+    """
+    prefix = derived_path(source_path, 'projection', cache_dir)
+    model_path, meta_path = prefix + '.pkl', prefix + '.meta.json'
+    key = {'features': list(features), 'rows': len(df), 'format': PROJECTION_FORMAT}
+    if all(os.path.exists(p) for p in (model_path, meta_path, prefix + '.npy')):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if all(meta.get(k) == v for k, v in key.items()) and source_unchanged(meta, source_path):
+            with open(model_path, 'rb') as f:
+                scaler, pca = pickle.load(f)
+            coords = np.load(prefix + '.npy', mmap_mode='r')
+            return Projection(features, scaler, pca, coords, meta['fit_seconds']), False
+
+    os.makedirs(os.path.dirname(prefix), exist_ok=True)
+    scaler, pca, fit_seconds = fit_projection(df, features, prefix, chunksize)
+    with open(model_path, 'wb') as f:
+        pickle.dump((scaler, pca), f, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(key, **source_signature(source_path), fit_seconds=fit_seconds), f)
+    coords = np.load(prefix + '.npy', mmap_mode='r')
+    return Projection(features, scaler, pca, coords, fit_seconds), True
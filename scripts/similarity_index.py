@@ -0,0 +1,199 @@
+"""
+Act 4: "Songs like this" - nearest-neighbour index over the scaled audio features
+'kdtree'   - scikit-learn KD-tree (the default; exact and fast for the 9 features)
+'balltree' - scikit-learn ball tree (exact; degrades more gracefully with more features)
+'brute'    - float32 matrix scanned with one matrix product per chunk of queries,
+             for feature sets too wide for a tree to prune
+
+The index is built over every track of the catalogue, persisted next to the
+columnar cache and rebuilt only when data.csv, the features or the backend change.
+
+    index = load_or_build_index(df, features, dataset_path('data.csv'))
+    distances, rows = index.query(df[features].iloc[:100], k=10)   # batch query
+    index.similar('7xPhfUan2yNtyFG0cUWkt8', k=10)                  # by track id
+"""
+
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+from sklearn.neighbors import BallTree, KDTree
+from sklearn.preprocessing import StandardScaler
+
+from data_cache import derived_path, source_signature, source_unchanged
+
+KINDS = ('kdtree', 'balltree', 'brute')
+
+# Bumped whenever the pickled layout changes, so old index files are rebuilt
+INDEX_FORMAT = 1
+
+# Rows per chunk of a batch query
+QUERY_CHUNK = 4096
+# Entries per block of the brute backend's query x catalogue distance matrix (64 MB of float32)
+BRUTE_BLOCK = 1 << 24
+
+
+class SimilarityIndex:
+    """Exact k-nearest-neighbour search over standardized features"""
+
+    def __init__(self, kind, features, scaler, tree, data, ids, build_seconds):
+        self.kind = kind
+        self.features = list(features)
+        self.scaler = scaler
+        self.tree = tree        # KDTree / BallTree, None for 'brute'
+        self.data = data        # scaled float32 matrix, only kept for 'brute'
+        self.ids = ids
+        self.build_seconds = build_seconds
+        self._rows = None
+        self._sq_norms = None
+
+    @classmethod
+    def build(cls, df, features, kind='kdtree', leaf_size=40, id_col='id'):
+        """Scale the features of every track and build the index; ids come from `id_col` when present"""
+        if kind not in KINDS:
+            raise ValueError(f"unknown index kind {kind!r}, expected one of {KINDS}")
+        start = time.perf_counter()
+        scaler = StandardScaler()
+        X = scaler.fit_transform(df[features].to_numpy(dtype=np.float64))
+        if kind == 'brute':
+            tree, data = None, X.astype(np.float32)
+        else:
+            tree, data = (KDTree if kind == 'kdtree' else BallTree)(X, leaf_size=leaf_size), None
+        ids = df[id_col].astype(str).to_numpy(dtype=object) if id_col in df.columns else None
+        return cls(kind, features, scaler, tree, data, ids, time.perf_counter() - start)
+
+    def __len__(self):
+        return len(self._stored_data())
+
+    @property
+    def nbytes(self):
+        """Memory held by the index structure (tree arrays or the brute-force matrix)"""
+        if self.tree is None:
+            return self.data.nbytes
+        return sum(np.asarray(a).nbytes for a in self.tree.get_arrays())
+
+    def _scaled(self, X):
+        if hasattr(X, 'columns'):
+            X = X[self.features]
+        return self.scaler.transform(np.asarray(X, dtype=np.float64).reshape(-1, len(self.features)))
+
+    def _search(self, X, k):
+        """Neighbours of already-scaled rows, closest first"""
+        k = min(k, len(self))
+        if self.tree is not None:
+            return self.tree.query(X, k=k)
+        X = X.astype(np.float32)
+        if self._sq_norms is None:
+            self._sq_norms = np.einsum('ij,ij->i', self.data, self.data)
+        # Distance blocks of at most BRUTE_BLOCK entries
+        step = max(1, BRUTE_BLOCK // len(self.data))
+        parts = [self._brute_block(X[start:start + step], k) for start in range(0, len(X), step)]
+        return np.vstack([d for d, _ in parts]), np.vstack([r for _, r in parts])
+
+    def _brute_block(self, X, k):
+        # |x - y|² = |x|² - 2 x·y + |y|²; only the k smallest are sorted
+        d2 = X @ self.data.T
+        d2 *= -2
+        d2 += self._sq_norms[None, :]
+        d2 += np.einsum('ij,ij->i', X, X)[:, None]
+        part = np.argpartition(d2, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(d2, part, axis=1).argsort(axis=1)
+        rows = np.take_along_axis(part, order, axis=1)
+        distances = np.sqrt(np.maximum(np.take_along_axis(d2, rows, axis=1), 0))
+        return distances.astype(np.float64), rows
+
+    def query(self, X, k=10, chunksize=QUERY_CHUNK):
+        """
+        Top-k most similar catalogue rows for each row of raw (unscaled) feature values
+
+        X is a DataFrame holding the index features or an array of shape
+        (n, n_features); returns (distances, rows), each of shape (n, k).
+        """
+        X = self._scaled(X)
+        parts = [self._search(X[start:start + chunksize], k) for start in range(0, len(X), chunksize)]
+        if not parts:
+            return np.empty((0, k)), np.empty((0, k), dtype=np.intp)
+        return np.vstack([d for d, _ in parts]), np.vstack([r for _, r in parts])
+
+    def neighbours_of(self, rows, k=10, chunksize=QUERY_CHUNK):
+        """
+        Top-k neighbours of catalogue rows, leaving out the track itself
+
+        Returns (distances, rows), each of shape (len(rows), k).
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        k = min(k, len(self) - 1)
+        X = self._stored_rows(rows)
+        distances = np.empty((len(rows), k))
+        neighbours = np.empty((len(rows), k), dtype=np.intp)
+        for start in range(0, len(rows), chunksize):
+            d, r = self._search(X[start:start + chunksize], k + 1)
+            own = rows[start:start + chunksize, None]
+            # Drop the query track wherever it appears (exact duplicates can tie with it),
+            # otherwise the farthest of the k + 1
+            keep = r != own
+            keep[keep.all(axis=1), -1] = False
+            distances[start:start + len(d)] = d[keep].reshape(len(d), -1)[:, :k]
+            neighbours[start:start + len(d)] = r[keep].reshape(len(d), -1)[:, :k]
+        return distances, neighbours
+
+    def _stored_data(self):
+        """The scaled feature matrix as stored in the index"""
+        return self.data if self.tree is None else np.asarray(self.tree.get_arrays()[0])
+
+    def _stored_rows(self, rows):
+        return self._stored_data()[rows].astype(np.float64)
+
+    def row_of(self, track_id):
+        """Catalogue row of a track id"""
+        if self.ids is None:
+            raise KeyError("the index was built without track ids")
+        if self._rows is None:
+            self._rows = {track_id: row for row, track_id in enumerate(self.ids)}
+        return self._rows[track_id]
+
+    def similar(self, track_id, k=10):
+        """[(track id, distance), ...] of the k tracks most similar to `track_id`"""
+        distances, rows = self.neighbours_of([self.row_of(track_id)], k)
+        return [(self.ids[row], float(d)) for row, d in zip(rows[0], distances[0])]
+
+    def save(self, path):
+        state = {key: value for key, value in self.__dict__.items() if not key.startswith('_')}
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump({'format': INDEX_FORMAT, **state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if state.pop('format', None) != INDEX_FORMAT:
+            raise ValueError(f"{path} was written by another version of the index: rebuild it")
+        return cls(**state)
+
+
+def load_or_build_index(df, features, source_path, kind='kdtree', cache_dir=None, **options):
+    """
+    The persisted index of `source_path`'s tracks, rebuilt when it is missing or stale
+
+    The index is reused while the source file's content hash, the features and
+    the number of rows are unchanged. Returns (index, built) where `built` is
+    False when the index was loaded from disk.
+    """
+    prefix = derived_path(source_path, f'neighbours-{kind}', cache_dir)
+    index_path, meta_path = prefix + '.pkl', prefix + '.meta.json'
+    key = {'features': list(features), 'rows': len(df), 'format': INDEX_FORMAT}
+    if os.path.exists(index_path) and os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if all(meta.get(k) == v for k, v in key.items()) and source_unchanged(meta, source_path):
+            return SimilarityIndex.load(index_path), False
+
+    index = SimilarityIndex.build(df, features, kind=kind, **options)
+    os.makedirs(os.path.dirname(prefix), exist_ok=True)
+    index.save(index_path)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(key, **source_signature(source_path)), f)
+    return index, True
@@ -0,0 +1,226 @@
+"""
+阶段计时与内存记录：代替各脚本中的 print 进度信息
+
+    step('load', "正在加载数据...")      # 线性脚本：结束上一步、开始下一步
+    record(rows=len(df))                 # 给当前阶段附加行数等信息
+    with stage('fit'): ...               # 嵌套阶段（也可作为函数装饰器）
+
+MUSIC_TRACE 未设置时只打印进度信息，几乎没有额外开销。
+MUSIC_TRACE=json / chrome / json,chrome 时记录每个阶段的墙钟时间、CPU 时间、
+峰值 RSS 与行数，在进程结束时写出 <脚本名>.trace.json（Chrome 格式为
+<脚本名>.chrome-trace.json，可在 chrome://tracing 或 Perfetto 中打开）；
+再加上 malloc（如 MUSIC_TRACE=json,malloc）会同时用 tracemalloc 记录各阶段的
+Python 内存增量与峰值（开销较大，仅在排查内存时使用）。
+"""
+
+import atexit
+import json
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import ContextDecorator
+from datetime import datetime, timezone
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:  # Windows
+    HAS_RESOURCE = False
+
+OPTIONS = {o.strip() for o in os.environ.get('MUSIC_TRACE', '').lower().split(',')} - {'', '0', 'off'}
+if '1' in OPTIONS:
+    OPTIONS = (OPTIONS - {'1'}) | {'json'}
+ENABLED = bool(OPTIONS)
+TRACE_MALLOC = 'malloc' in OPTIONS
+
+
+def _peak_rss_mb():
+    """进程到目前为止的峰值 RSS（MB）"""
+    if not HAS_RESOURCE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+class Tracer:
+    """记录嵌套阶段的计时与内存，结束时写出 JSON / Chrome trace"""
+
+    def __init__(self, trace_malloc=False):
+        self.records = []
+        self.trace_malloc = trace_malloc
+        self._stack = []
+        self._step = None
+        self._finished = False
+        self._t0 = time.perf_counter()
+        self._started = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        if trace_malloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def start(self, name):
+        frame = {
+            'name': name,
+            'depth': len(self._stack),
+            'parent': self._stack[-1]['name'] if self._stack else None,
+            'wall': time.perf_counter(),
+            'cpu': time.process_time(),
+            'rss': _peak_rss_mb(),
+            'fields': {},
+        }
+        if self.trace_malloc:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]['malloc_peak'] = max(self._stack[-1]['malloc_peak'], peak)
+            tracemalloc.reset_peak()
+            frame['malloc_start'] = current
+            frame['malloc_peak'] = current
+        self._stack.append(frame)
+        return frame['fields']
+
+    def stop(self):
+        frame = self._stack.pop()
+        wall = time.perf_counter()
+        rss = _peak_rss_mb()
+        entry = {
+            'name': frame['name'],
+            'depth': frame['depth'],
+            'parent': frame['parent'],
+            'start_s': frame['wall'] - self._t0,
+            'wall_s': wall - frame['wall'],
+            'cpu_s': time.process_time() - frame['cpu'],
+        }
+        if rss is not None:
+            entry['peak_rss_mb'] = rss
+            entry['rss_growth_mb'] = rss - frame['rss']
+        if self.trace_malloc:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(frame['malloc_peak'], peak)
+            entry['malloc_delta_mb'] = (current - frame['malloc_start']) / 1e6
+            entry['malloc_peak_mb'] = (peak - frame['malloc_start']) / 1e6
+            if self._stack:
+                self._stack[-1]['malloc_peak'] = max(self._stack[-1]['malloc_peak'], peak)
+            tracemalloc.reset_peak()
+        entry.update(frame['fields'])
+        self.records.append(entry)
+
+    def step(self, name):
+        """结束上一个顶层步骤并开始下一个"""
+        if self._step is not None:
+            self.stop()
+        self._step = name
+        return self.start(name)
+
+    def annotate(self, **fields):
+        if self._stack:
+            self._stack[-1]['fields'].update(fields)
+
+    def note_malloc_peak(self, peak):
+        """计入在别处调用 tracemalloc.reset_peak() 之前达到的峰值"""
+        if self.trace_malloc and self._stack:
+            self._stack[-1]['malloc_peak'] = max(self._stack[-1]['malloc_peak'], peak)
+
+    def finish(self, directory='.'):
+        """结束仍在进行的阶段并写出 trace 文件（只执行一次）"""
+        if self._finished:
+            return
+        self._finished = True
+        while self._stack:
+            self.stop()
+        script = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python'
+        total = time.perf_counter() - self._t0
+
+        if 'json' in OPTIONS:
+            with open(os.path.join(directory, f'{script}.trace.json'), 'w', encoding='utf-8') as f:
+                json.dump({'script': script, 'pid': os.getpid(), 'started': self._started,
+                           'total_s': total, 'stages': self.records}, f, indent=1, ensure_ascii=False)
+        if 'chrome' in OPTIONS:
+            events = [{
+                'name': r['name'], 'cat': 'stage', 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                'ts': r['start_s'] * 1e6, 'dur': r['wall_s'] * 1e6,
+                'args': {k: v for k, v in r.items() if k not in ('name', 'start_s', 'wall_s', 'parent', 'depth')},
+            } for r in self.records]
+            with open(os.path.join(directory, f'{script}.chrome-trace.json'), 'w', encoding='utf-8') as f:
+                json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+        print(self.summary(total))
+
+    def summary(self, total):
+        lines = [f"\n阶段耗时（共 {total:.2f} 秒）:", f"{'stage':<28} {'wall s':>8} {'cpu s':>8} {'peak RSS MB':>12}"]
+        for r in sorted(self.records, key=lambda r: r['start_s']):
+            rss = f"{r['peak_rss_mb']:12.1f}" if 'peak_rss_mb' in r else f"{'-':>12}"
+            lines.append(f"{'  ' * r['depth'] + r['name']:<28} {r['wall_s']:8.3f} {r['cpu_s']:8.3f} {rss}")
+        return '\n'.join(lines)
+
+
+class _Null:
+    """关闭记录时 step()/stage 返回的占位对象"""
+
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+_NULL = _Null()
+# 只在主进程中记录：spawn 方式启动的进程池 worker 会重新导入脚本（__mp_main__），
+# 不应各自打印空的耗时表并覆盖 trace 文件；build.py 的阶段进程用 enable() 显式开启
+TRACER = Tracer(TRACE_MALLOC) if ENABLED and multiprocessing.parent_process() is None else None
+if TRACER is not None:
+    atexit.register(TRACER.finish)
+
+
+def enable():
+    """在子进程中开始一份新的记录（MUSIC_TRACE 开启时），之后由 finish() 写出"""
+    global TRACER
+    if ENABLED:
+        TRACER = Tracer(TRACE_MALLOC)
+    return TRACER
+
+
+def step(name, message=None):
+    """线性脚本的步骤边界：打印进度信息，记录开启时结束上一步并开始计时下一步"""
+    if message is not None:
+        print(message)
+    if TRACER is None:
+        return _NULL
+    return TRACER.step(name)
+
+
+def record(**fields):
+    """给当前阶段附加信息，例如 record(rows=len(df))"""
+    if TRACER is not None:
+        TRACER.annotate(**fields)
+
+
+def note_malloc_peak(peak):
+    """自行测量内存并重置 tracemalloc 峰值的代码在重置前调用，当前阶段的 malloc 峰值不会因此偏小"""
+    if TRACER is not None:
+        TRACER.note_malloc_peak(peak)
+
+
+def finish():
+    """立即写出 trace（在不会执行 atexit 的进程中调用，如进程池的工作进程）"""
+    if TRACER is not None:
+        TRACER.finish()
+
+
+class stage(ContextDecorator):
+    """嵌套阶段：with stage('fit'): ... 或 @stage('fit')"""
+
+    def __init__(self, name, message=None):
+        self.name = name
+        self.message = message
+
+    def __enter__(self):
+        if self.message is not None:
+            print(self.message)
+        if TRACER is None:
+            return _NULL
+        return TRACER.start(self.name)
+
+    def __exit__(self, *exc):
+        if TRACER is not None:
+            TRACER.stop()
+        return False
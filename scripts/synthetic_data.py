@@ -0,0 +1,193 @@
+"""
+Schema-faithful synthetic versions of the three inputs, at any size
+
+    ClassicHit.csv   (Act 1)    - classic_hits(n_rows)
+    top50contry.csv  (Act 2)    - top50_by_country(n_rows)
+    data.csv         (Acts 3-4) - spotify_tracks(n_rows)
+
+Column names, order and value ranges follow the real files. Genre and country
+labels are drawn with the frequencies of the checked-in CSVs (built-in lists
+are used when those are not available), and popularity is tied to the year and
+a few audio features so the correlations and clusters have structure.
+
+    python synthetic_data.py --rows 1000000 --out-dir /tmp/synthetic
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+REFERENCE_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# Fallback vocabularies when the reference CSVs are not available
+CLASSIC_GENRES = ['Pop', 'Metal', 'Country', 'R&B', 'Rock', 'Alt. Rock', 'Jazz', 'Punk', 'Rap', 'EDM',
+                  'Blues', 'Disco', 'Today', 'Folk', 'Reggae', 'Funk', 'SKA', 'World', 'Gospel']
+TOP50_GENRES = ['adult standards', 'latin', 'dance pop', 'pop', 'album rock', 'desi pop', 'french hip hop',
+                'canadian pop', 'j-pop', 'new wave pop', 'australian pop', 'pop rap', 'indonesian pop',
+                'israeli pop', 'latin pop', 'k-pop', 'brazilian funk', 'edm', 'r&b', 'indie pop']
+TOP50_COUNTRIES = ['world', 'africa', 'argentina', 'australia', 'belgium', 'bolivia', 'brazil', 'canada',
+                   'germany', 'colombia', 'chile', 'spain', 'usa', 'france', 'india', 'indonesia', 'israel',
+                   'italy', 'japan', 'malasya']
+
+SPOTIFY_COLUMNS = ['valence', 'year', 'acousticness', 'artists', 'danceability', 'duration_ms', 'energy',
+                   'explicit', 'id', 'instrumentalness', 'key', 'liveness', 'loudness', 'mode', 'name',
+                   'popularity', 'release_date', 'speechiness', 'tempo']
+
+FILE_NAMES = {'classic_hits': 'ClassicHit.csv', 'top50': 'top50contry.csv', 'spotify': 'data.csv'}
+
+
+def reference_frequencies(file_name, column, fallback, encoding='utf-8'):
+    """Value frequencies of `column` in the real CSV, or uniform over `fallback`"""
+    path = os.path.join(REFERENCE_DATA_DIR, file_name)
+    if os.path.exists(path):
+        counts = pd.read_csv(path, usecols=[column], encoding=encoding)[column].value_counts()
+        return counts.index.to_numpy(dtype=object), (counts / counts.sum()).to_numpy()
+    return np.array(fallback, dtype=object), np.full(len(fallback), 1 / len(fallback))
+
+
+def _labels(rng, values, p, n_rows):
+    """Categorical column drawn from (values, p) without building n_rows Python strings"""
+    codes = rng.choice(len(values), size=n_rows, p=p)
+    return pd.Categorical.from_codes(codes, categories=pd.Index(values).astype(str))
+
+
+def _pooled_names(rng, prefix, n_rows, pool_size, template='{prefix} {i}'):
+    """Repeated names drawn from a pool of min(n_rows, pool_size) distinct strings"""
+    pool = [template.format(prefix=prefix, i=i) for i in range(max(1, min(n_rows, pool_size)))]
+    return pd.Categorical.from_codes(rng.integers(0, len(pool), n_rows), categories=pool)
+
+
+def _unit(rng, a, b, n_rows):
+    return rng.beta(a, b, n_rows).round(3)
+
+
+def classic_hits(n_rows, seed=0):
+    """ClassicHit.csv: one row per track with Year and a coarse Genre label"""
+    rng = np.random.default_rng(seed)
+    genres, p = reference_frequencies('ClassicHit.csv', 'Genre', CLASSIC_GENRES)
+    return pd.DataFrame({
+        'Track': _pooled_names(rng, 'Track', n_rows, 200_000),
+        'Artist': _pooled_names(rng, 'Artist', n_rows, 20_000),
+        'Year': np.clip(np.round(rng.normal(1985, 19.5, n_rows)), 1899, 2024).astype(np.int64),
+        'Duration': np.clip(rng.normal(241_000, 100_000, n_rows), 23_000, 3_000_000).astype(np.int64),
+        'Time_Signature': rng.choice([3, 4, 5], n_rows, p=[0.08, 0.9, 0.02]),
+        'Danceability': _unit(rng, 5, 4, n_rows),
+        'Energy': _unit(rng, 3, 2, n_rows),
+        'Key': rng.integers(0, 12, n_rows),
+        'Loudness': np.clip(rng.normal(-9.2, 4.3, n_rows), -47, 0.9).round(3),
+        'Mode': rng.integers(0, 2, n_rows),
+        'Speechiness': _unit(rng, 1, 12, n_rows),
+        'Acousticness': _unit(rng, 0.6, 1.4, n_rows),
+        'Instrumentalness': _unit(rng, 0.2, 2, n_rows),
+        'Liveness': _unit(rng, 1.2, 4.8, n_rows),
+        'Valence': _unit(rng, 2.2, 1.7, n_rows),
+        'Tempo': np.clip(rng.normal(120.7, 29, n_rows), 0, 220).round(3),
+        'Popularity': np.clip(np.round(rng.normal(43, 20.8, n_rows)), 0, 98).astype(np.int64),
+        'Genre': _labels(rng, genres, p, n_rows),
+    })
+
+
+def top50_by_country(n_rows, seed=0):
+    """top50contry.csv: charting songs with their Spotify 'top genre' and country"""
+    rng = np.random.default_rng(seed)
+    genres, p_genre = reference_frequencies('top50contry.csv', 'top genre', TOP50_GENRES, 'latin1')
+    countries, p_country = reference_frequencies('top50contry.csv', 'country', TOP50_COUNTRIES, 'latin1')
+    return pd.DataFrame({
+        'Unnamed: 0': np.arange(1, n_rows + 1),
+        'title': _pooled_names(rng, 'Song', n_rows, 200_000),
+        'artist': _pooled_names(rng, 'Artist', n_rows, 20_000),
+        'top genre': _labels(rng, genres, p_genre, n_rows),
+        'year': np.clip(np.round(2019 - rng.exponential(8, n_rows)), 1942, 2019).astype(np.int64),
+        'added': '1969-12-31',
+        'bpm': np.clip(rng.normal(124, 27, n_rows), 47, 205).round(),
+        'nrgy': np.clip(rng.normal(62, 17, n_rows), 10, 98).round(),
+        'dnce': np.clip(rng.normal(64, 13, n_rows), 16, 95).round(),
+        'dB': np.clip(rng.normal(-6.8, 2.6, n_rows), -23, 0).round(),
+        'live': np.clip(rng.exponential(20, n_rows), 2, 98).round(),
+        'val': np.clip(rng.normal(60, 21, n_rows), 5, 98).round(),
+        'dur': np.clip(rng.normal(206, 40, n_rows), 85, 464).astype(np.int64),
+        'acous': np.clip(rng.exponential(35, n_rows), 0, 99).round(),
+        'spch': np.clip(rng.exponential(8.7, n_rows), 2, 56).round(),
+        'pop': np.clip(np.round(rng.normal(81, 10, n_rows)), 0, 100).astype(np.int64),
+        'country': _labels(rng, countries, p_country, n_rows),
+    })
+
+
+def spotify_tracks(n_rows, seed=0):
+    """
+    data.csv (Spotify 1921-2020): audio features, year and popularity per track
+
+    Features drift with the year (louder, more energetic, less acoustic music
+    later on), and popularity depends on the year and on those features, so each
+    era has its own correlation pattern.
+    """
+    rng = np.random.default_rng(seed)
+    year = np.clip(np.round(2020 - rng.gamma(2.0, 16.0, n_rows)), 1921, 2020).astype(np.int64)
+    t = (year - 1921) / 99
+
+    energy = np.clip(rng.beta(2, 2, n_rows) * 0.6 + 0.35 * t, 0, 1)
+    acousticness = np.clip(rng.beta(1, 1, n_rows) * (1 - 0.7 * t), 0, 1)
+    loudness = np.clip(-20 + 12 * t + 4 * rng.standard_normal(n_rows), -60, 3.9)
+    danceability = np.clip(rng.beta(5, 4, n_rows) + 0.1 * t, 0, 1)
+    valence = rng.beta(2.2, 1.8, n_rows)
+    speechiness = rng.beta(1, 12, n_rows)
+    instrumentalness = rng.beta(0.2, 1.5, n_rows)
+    liveness = rng.beta(1.2, 4.5, n_rows)
+    tempo = np.clip(rng.normal(117, 30, n_rows), 0, 244)
+
+    popularity = (10 + 50 * t + 12 * (energy - 0.5) * t - 10 * (acousticness - 0.5) * (1 - t)
+                  + 8 * (danceability - 0.6) - 6 * instrumentalness + rng.normal(0, 12, n_rows))
+
+    n_artists = max(1, min(n_rows // 5, 30_000))
+    return pd.DataFrame({
+        'valence': valence,
+        'year': year,
+        'acousticness': acousticness,
+        'artists': _pooled_names(rng, 'Artist', n_rows, n_artists, template="['{prefix} {i}']"),
+        'danceability': danceability,
+        'duration_ms': np.clip(rng.normal(230_000, 120_000, n_rows), 5_000, 5_000_000).astype(np.int64),
+        'energy': energy,
+        'explicit': (rng.random(n_rows) < 0.08 * (1 + 3 * t)).astype(np.int64),
+        'id': 'syn' + pd.Series(np.arange(n_rows)).astype(str),
+        'instrumentalness': instrumentalness,
+        'key': rng.integers(0, 12, n_rows),
+        'liveness': liveness,
+        'loudness': loudness,
+        'mode': rng.integers(0, 2, n_rows),
+        'name': _pooled_names(rng, 'Song', n_rows, 500_000),
+        'popularity': np.clip(np.round(popularity), 0, 100).astype(np.int64),
+        'release_date': year.astype(str),
+        'speechiness': speechiness,
+        'tempo': tempo,
+    })[SPOTIFY_COLUMNS]
+
+
+GENERATORS = {'classic_hits': classic_hits, 'top50': top50_by_country, 'spotify': spotify_tracks}
+
+
+def write_dataset(name, n_rows, out_dir, seed=0):
+    """Write one synthetic dataset under its real file name; returns the path"""
+    path = os.path.join(out_dir, FILE_NAMES[name])
+    encoding = 'latin1' if name == 'top50' else 'utf-8'
+    GENERATORS[name](n_rows, seed).to_csv(path, index=False, encoding=encoding)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000, help='rows per dataset')
+    parser.add_argument('--datasets', nargs='+', default=list(GENERATORS), choices=list(GENERATORS))
+    parser.add_argument('--out-dir', default='synthetic_data')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    for name in args.datasets:
+        path = write_dataset(name, args.rows, args.out_dir, args.seed)
+        print(f"{path}: {args.rows} rows, {os.path.getsize(path) / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
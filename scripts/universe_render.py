@@ -0,0 +1,400 @@
+"""
+Act 4: Rendering modes for the music universe scatter
+'svg'     - the original Plotly Express scatter (small samples)
+'webgl'   - one Scattergl trace per cluster, hover strings dictionary-encoded
+'density' - per-cluster 2-D bins drawn server-side, with level-of-detail
+            drill-down to a capped sample of tracks per bin when zoomed into a
+            small region
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Point-count thresholds of the 'auto' mode
+SVG_MAX_POINTS = 10_000
+WEBGL_MAX_POINTS = 200_000
+# Zoomed-in regions with at most this many tracks are drawn point by point
+DRILL_MAX_POINTS = 20_000
+# Tracks embedded per density bin for the drill-down: the page holds at most
+# bins² × DRILL_PER_BIN tracks, however large the catalogue
+DRILL_PER_BIN = 3
+# Coordinates are embedded as integers of value × COORD_SCALE
+COORD_SCALE = 1000
+
+HOVER_TEMPLATE = ("<b>%{hovertext}</b><br>by %{customdata[0]}<br><br><b>Galaxy:</b> %{customdata[2]}"
+                  "<br><b>Year:</b> %{customdata[1]}<br><b>Popularity:</b> %{customdata[3]}<extra></extra>")
+
+
+def choose_render_mode(n_points):
+    """SVG for small samples, WebGL up to WEBGL_MAX_POINTS, density bins beyond"""
+    if n_points <= SVG_MAX_POINTS:
+        return 'svg'
+    if n_points <= WEBGL_MAX_POINTS:
+        return 'webgl'
+    return 'density'
+
+
+def style_figure(fig, x_title, y_title):
+    """Aesthetics & Interactivity shared by every mode"""
+    fig.update_layout(
+        template='simple_white',
+        title=dict(
+            text="<b>The Music Universe: AI-Discovered Song Galaxies</b>",
+            font=dict(size=22),
+            x=0.5
+        ),
+        legend_title_text='AI-Discovered Clusters (Click to Toggle)',
+        xaxis_title=x_title,
+        yaxis_title=y_title,
+        font=dict(family="Arial", size=12)
+    )
+    return fig
+
+
+def svg_figure(df_plot, x='danceability', y='energy', x_title="Danceability", y_title="Energy"):
+    """The original SVG scatter: outlined markers sized by popularity, full hover payload"""
+    fig = px.scatter(
+        df_plot,
+        x=x,
+        y=y,
+        color='Cluster_Name',
+        size='popularity',
+        hover_name='name',
+        hover_data={
+            'artists_cleaned': True,
+            'year': True,
+            'Cluster_Name': True,
+            x: False,
+            y: False,
+            'popularity': True
+        }
+    )
+    style_figure(fig, x_title, y_title)
+    fig.update_traces(
+        marker=dict(
+            opacity=0.7,
+            line=dict(width=0.5, color='Black')
+        ),
+        hovertemplate=HOVER_TEMPLATE
+    )
+    return fig, ''
+
+
+def _cluster_order(df):
+    """Cluster names in order of appearance, with their default Plotly Express colours"""
+    names = list(pd.unique(df['Cluster_Name']))
+    palette = px.colors.qualitative.Plotly
+    return names, {name: palette[i % len(palette)] for i, name in enumerate(names)}
+
+
+def _size_ref(popularity, size_max=20):
+    """Same area scaling Plotly Express uses for size='popularity'"""
+    return 2.0 * max(float(np.max(popularity)), 1.0) / size_max ** 2
+
+
+def encode_points(df, x, y):
+    """
+    Compact column arrays for the page: rounded integer coordinates, cluster
+    codes, and dictionary-encoded artists and track names
+    """
+    names, _ = _cluster_order(df)
+    artist_codes, artists = pd.factorize(df['artists_cleaned'])
+    name_codes, track_names = pd.factorize(df['name'])
+    return {
+        'scale': COORD_SCALE,
+        'x': np.round(df[x].to_numpy(dtype=np.float64) * COORD_SCALE).astype(int).tolist(),
+        'y': np.round(df[y].to_numpy(dtype=np.float64) * COORD_SCALE).astype(int).tolist(),
+        'c': pd.Categorical(df['Cluster_Name'], categories=names).codes.tolist(),
+        'a': artist_codes.tolist(),
+        'n': name_codes.tolist(),
+        'yr': df['year'].astype(int).tolist(),
+        'p': df['popularity'].astype(int).tolist(),
+        'artists': [str(a) for a in artists],
+        'names': [str(n) for n in track_names],
+        'clusters': names,
+    }
+
+
+# Expands the dictionary-encoded hover columns of the WebGL traces in the browser
+WEBGL_DECODE_JS = """
+var gd = document.getElementById('{plot_id}');
+var dicts = %s;
+var update = {hovertext: [], customdata: []};
+gd.data.forEach(function(trace) {
+    var cd = trace.customdata || [];
+    update.hovertext.push(cd.map(function(row) { return dicts.names[row[4]]; }));
+    update.customdata.push(cd.map(function(row) {
+        return [dicts.artists[row[0]], row[1], trace.name, row[3]];
+    }));
+});
+Plotly.restyle(gd, update);
+"""
+
+
+def webgl_figure(df, x='danceability', y='energy', x_title="Danceability", y_title="Energy"):
+    """One Scattergl trace per cluster; artist and track names are sent once as dictionaries"""
+    names, colors = _cluster_order(df)
+    artist_codes, artists = pd.factorize(df['artists_cleaned'])
+    name_codes, track_names = pd.factorize(df['name'])
+    sizeref = _size_ref(df['popularity'])
+
+    fig = go.Figure()
+    cluster = df['Cluster_Name'].to_numpy()
+    for name in names:
+        rows = cluster == name
+        customdata = np.column_stack([
+            artist_codes[rows], df['year'].to_numpy()[rows], np.zeros(rows.sum(), dtype=int),
+            df['popularity'].to_numpy()[rows], name_codes[rows]
+        ])
+        fig.add_trace(go.Scattergl(
+            x=np.round(df[x].to_numpy()[rows], 3), y=np.round(df[y].to_numpy()[rows], 3),
+            mode='markers', name=name, legendgroup=name,
+            marker=dict(color=colors[name], size=df['popularity'].to_numpy()[rows], sizemode='area',
+                        sizeref=sizeref, opacity=0.7),
+            customdata=customdata, hovertemplate=HOVER_TEMPLATE
+        ))
+    style_figure(fig, x_title, y_title)
+    dicts = {'artists': [str(a) for a in artists], 'names': [str(n) for n in track_names]}
+    return fig, WEBGL_DECODE_JS % json.dumps(dicts, ensure_ascii=False).replace('</', '<\\/')
+
+
+# Level-of-detail: when the visible region holds few enough tracks, draw them
+# individually on top of the density bins; zooming back out removes them again
+DENSITY_DRILL_JS = """
+var gd = document.getElementById('{plot_id}');
+var pts = %s;
+var maxPoints = %d;
+var nBase = gd.data.length;
+var colors = gd.data.map(function(trace) { return trace.marker.color; });
+
+function drill() {
+    var xr = gd.layout.xaxis.range, yr = gd.layout.yaxis.range;
+    var x0 = Math.min(xr[0], xr[1]) * pts.scale, x1 = Math.max(xr[0], xr[1]) * pts.scale;
+    var y0 = Math.min(yr[0], yr[1]) * pts.scale, y1 = Math.max(yr[0], yr[1]) * pts.scale;
+    var visible = [];
+    for (var i = 0; i < pts.x.length; i++) {
+        if (pts.x[i] >= x0 && pts.x[i] <= x1 && pts.y[i] >= y0 && pts.y[i] <= y1) {
+            visible.push(i);
+            if (visible.length > maxPoints) break;
+        }
+    }
+    var extra = [];
+    for (var t = nBase; t < gd.data.length; t++) extra.push(t);
+    var ready = extra.length ? Plotly.deleteTraces(gd, extra) : Promise.resolve();
+    if (visible.length > maxPoints) return ready;
+
+    var traces = pts.clusters.map(function(name, c) {
+        return {type: 'scattergl', mode: 'markers', name: name, legendgroup: name, showlegend: false,
+                x: [], y: [], hovertext: [], customdata: [], hovertemplate: %s,
+                marker: {color: colors[c], size: 6, opacity: 0.8}};
+    });
+    visible.forEach(function(i) {
+        var trace = traces[pts.c[i]];
+        trace.x.push(pts.x[i] / pts.scale);
+        trace.y.push(pts.y[i] / pts.scale);
+        trace.hovertext.push(pts.names[pts.n[i]]);
+        trace.customdata.push([pts.artists[pts.a[i]], pts.yr[i], pts.clusters[pts.c[i]], pts.p[i]]);
+    });
+    return ready.then(function() { return Plotly.addTraces(gd, traces); });
+}
+
+gd.on('plotly_relayout', function(event) {
+    if (Object.keys(event).some(function(key) { return key.indexOf('axis') >= 0; })) drill();
+});
+"""
+
+
+def sample_per_bin(bin_ids, per_bin, random_state=0):
+    """Sorted positions of at most `per_bin` random rows for every bin id"""
+    order = np.random.default_rng(random_state).permutation(len(bin_ids))
+    order = order[np.argsort(bin_ids[order], kind='stable')]
+    sorted_ids = bin_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    return np.sort(order[rank < per_bin])
+
+
+def density_figure(df, x='danceability', y='energy', x_title="Danceability", y_title="Energy", bins=120,
+                   per_bin=DRILL_PER_BIN):
+    """
+    Per-cluster 2-D histogram drawn as one marker per occupied bin (area ~ track
+    count), plus an embedded compact table of at most `per_bin` sampled tracks per
+    bin for drill-down on zoom
+    """
+    names, colors = _cluster_order(df)
+    xs = df[x].to_numpy(dtype=np.float64)
+    ys = df[y].to_numpy(dtype=np.float64)
+    x_edges = np.linspace(np.nanmin(xs), np.nanmax(xs), bins + 1)
+    y_edges = np.linspace(np.nanmin(ys), np.nanmax(ys), bins + 1)
+    x_centres = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centres = (y_edges[:-1] + y_edges[1:]) / 2
+
+    counts = {}
+    cluster = df['Cluster_Name'].to_numpy()
+    for name in names:
+        rows = cluster == name
+        counts[name], _, _ = np.histogram2d(xs[rows], ys[rows], bins=[x_edges, y_edges])
+    sizeref = 2.0 * max(c.max() for c in counts.values()) / 18 ** 2
+
+    fig = go.Figure()
+    for name in names:
+        ix, iy = np.nonzero(counts[name])
+        n = counts[name][ix, iy]
+        fig.add_trace(go.Scattergl(
+            x=np.round(x_centres[ix], 4), y=np.round(y_centres[iy], 4), mode='markers',
+            name=name, legendgroup=name,
+            marker=dict(color=colors[name], size=n, sizemode='area', sizeref=sizeref, sizemin=1, opacity=0.5),
+            customdata=n.astype(int),
+            hovertemplate=f"<b>{name}</b><br>%{{customdata}} tracks in this bin<extra></extra>"
+        ))
+    style_figure(fig, x_title, y_title)
+    fig.update_layout(annotations=[dict(
+        text=f"Density view of {len(df):,} tracks - zoom in to see up to {per_bin} sample songs per bin",
+        xref='paper', yref='paper', x=0.5, y=1.02, showarrow=False, font=dict(size=12, color='gray')
+    )])
+
+    # Drill-down sample: spatial bins over the same edges, so dense regions are capped
+    finite = np.flatnonzero(np.isfinite(xs) & np.isfinite(ys))
+    ix = np.clip(np.searchsorted(x_edges, xs[finite], side='right') - 1, 0, bins - 1)
+    iy = np.clip(np.searchsorted(y_edges, ys[finite], side='right') - 1, 0, bins - 1)
+    sample = finite[sample_per_bin(ix * bins + iy, per_bin)]
+    drill = encode_points(df.iloc[sample], x, y)
+    # Keep the cluster codes in the order of the density traces
+    drill['c'] = pd.Categorical(df['Cluster_Name'].to_numpy()[sample], categories=names).codes.tolist()
+    drill['clusters'] = names
+    points = json.dumps(drill, ensure_ascii=False).replace('</', '<\\/')
+    script = DENSITY_DRILL_JS % (points, DRILL_MAX_POINTS, json.dumps(HOVER_TEMPLATE))
+    return fig, script
+
+
+# Click a track to list its nearest neighbours in the full catalogue (precomputed
+# with similarity_index) and mark them on the chart; the neighbour lists are embedded
+# in the page, so this is skipped when more than SIMILAR_MAX_POINTS tracks are plotted
+SIMILAR_MAX_POINTS = 50_000
+
+SIMILAR_TRACKS_JS = """
+var gd = document.getElementById('{plot_id}');
+var similar = %s;
+var nBase = gd.data.length;
+
+function clearSimilar() {
+    var panel = document.getElementById('similar-panel');
+    if (panel) panel.remove();
+    var extra = [];
+    for (var t = nBase; t < gd.data.length; t++) extra.push(t);
+    return extra.length ? Plotly.deleteTraces(gd, extra) : Promise.resolve();
+}
+
+gd.on('plotly_click', function(event) {
+    var point = event.points[0];
+    var rows = similar.traces[point.curveNumber];
+    if (point.curveNumber >= nBase || !rows || rows[point.pointNumber] === undefined) return;
+    var row = rows[point.pointNumber];
+    var picks = [];
+    for (var j = 0; j < similar.k; j++) {
+        picks.push({t: similar.nb[row * similar.k + j], d: similar.d[row * similar.k + j] / 100});
+    }
+    var tracks = similar.tracks;
+
+    // One list at a time: replace the previous panel and markers
+    clearSimilar().then(function() {
+        var panel = document.createElement('div');
+        panel.id = 'similar-panel';
+        panel.style.cssText = 'position: fixed; top: 80px; right: 20px; width: 340px; max-height: 70%%;' +
+            'overflow: auto; background: white; border: 2px solid #333; border-radius: 10px; padding: 12px 16px;' +
+            'box-shadow: 0 4px 20px rgba(0,0,0,0.3); z-index: 1000; font-family: Arial; font-size: 12px;';
+        var close = document.createElement('button');
+        close.textContent = '×';
+        close.style.cssText = 'position: absolute; top: 8px; right: 8px; background: #ff4444; color: white;' +
+            'border: none; border-radius: 50%%; width: 24px; height: 24px; cursor: pointer;';
+        close.onclick = clearSimilar;
+        var title = document.createElement('h4');
+        title.style.margin = '0 24px 8px 0';
+        title.textContent = 'Songs like "' + point.hovertext + '"';
+        var list = document.createElement('ol');
+        list.style.paddingLeft = '20px';
+        picks.forEach(function(pick) {
+            var item = document.createElement('li');
+            var name = document.createElement('b');
+            name.textContent = tracks.names[tracks.n[pick.t]];
+            item.appendChild(name);
+            item.appendChild(document.createTextNode(
+                ' by ' + tracks.artists[tracks.a[pick.t]] + ' (' + tracks.yr[pick.t] + ') - ' +
+                similar.clusters[tracks.c[pick.t]] + ', distance ' + pick.d.toFixed(2)));
+            list.appendChild(item);
+        });
+        panel.appendChild(close);
+        panel.appendChild(title);
+        panel.appendChild(list);
+        document.body.appendChild(panel);
+
+        return Plotly.addTraces(gd, {
+            type: gd.data[0].type, mode: 'markers', name: 'Similar songs', showlegend: false,
+            x: picks.map(function(pick) { return tracks.x[pick.t] / similar.scale; }),
+            y: picks.map(function(pick) { return tracks.y[pick.t] / similar.scale; }),
+            hovertext: picks.map(function(pick) { return tracks.names[tracks.n[pick.t]]; }),
+            hovertemplate: '<b>%%{hovertext}</b><extra>similar</extra>',
+            marker: {symbol: 'star', size: 14, color: 'gold', line: {width: 1, color: 'black'}}
+        });
+    });
+});
+"""
+
+
+def similar_tracks_script(df, neighbours, distances, catalogue, clusters, x='danceability', y='energy'):
+    """
+    Click handler listing each plotted track's nearest neighbours
+
+    df: the plotted tracks, in plot order; neighbours/distances: (len(df), k) catalogue
+    rows and distances (SimilarityIndex.neighbours_of); catalogue: DataFrame indexed
+    by catalogue row holding at least the neighbour rows, with name, artists_cleaned,
+    year, Cluster_Name and the x/y columns; clusters: every galaxy name. Meant for
+    the 'svg' and 'webgl' modes (one trace per cluster); returns '' when more than
+    SIMILAR_MAX_POINTS tracks are plotted.
+    """
+    if len(df) > SIMILAR_MAX_POINTS:
+        return ''
+    names, _ = _cluster_order(df)
+    cluster = df['Cluster_Name'].to_numpy()
+    # Plot-row positions behind each trace's points (one trace per cluster, in legend order)
+    traces = [np.flatnonzero(cluster == name).tolist() for name in names]
+
+    unique_rows, local = np.unique(neighbours, return_inverse=True)
+    tracks = catalogue.loc[unique_rows]
+    artist_codes, artists = pd.factorize(tracks['artists_cleaned'])
+    name_codes, track_names = pd.factorize(tracks['name'])
+    cluster_codes = {name: code for code, name in enumerate(clusters)}
+    payload = {
+        'k': neighbours.shape[1],
+        'scale': COORD_SCALE,
+        'traces': traces,
+        'clusters': list(clusters),
+        'nb': local.reshape(-1).tolist(),
+        'd': np.round(distances.reshape(-1) * 100).astype(int).tolist(),  # hundredths
+        'tracks': {
+            'n': name_codes.tolist(),
+            'a': artist_codes.tolist(),
+            'names': [str(n) for n in track_names],
+            'artists': [str(a) for a in artists],
+            'yr': tracks['year'].astype(int).tolist(),
+            'c': [cluster_codes[name] for name in tracks['Cluster_Name']],
+            'x': np.round(tracks[x].to_numpy(dtype=np.float64) * COORD_SCALE).astype(int).tolist(),
+            'y': np.round(tracks[y].to_numpy(dtype=np.float64) * COORD_SCALE).astype(int).tolist(),
+        },
+    }
+    return SIMILAR_TRACKS_JS % json.dumps(payload, ensure_ascii=False).replace('</', '<\\/')
+
+
+def universe_figure(df, mode='auto', **axes):
+    """Build the scatter in the requested mode; returns (fig, post_script, mode)"""
+    if mode == 'auto':
+        mode = choose_render_mode(len(df))
+    builders = {'svg': svg_figure, 'webgl': webgl_figure, 'density': density_figure}
+    if mode not in builders:
+        raise ValueError(f"unknown render mode {mode!r}, expected 'auto' or one of {sorted(builders)}")
+    fig, script = builders[mode](df, **axes)
+    return fig, script, mode
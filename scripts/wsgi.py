@@ -0,0 +1,19 @@
+"""
+Act 2 仪表盘的生产环境入口
+
+    python dv_2-5.py --artifact        # 构建：写出 top50_dashboard.json（或运行 build.py）
+    gunicorn -c gunicorn.conf.py wsgi:server
+    waitress-serve --threads=8 --port=8050 wsgi:server
+
+服务进程只读取构建产物（路径可用 ACT2_ARTIFACT 指定），不导入 pandas，也不读取原始 CSV。
+"""
+
+import os
+
+# 默认使用生产配置：关闭调试与热重载，开启压缩和静态资源缓存
+os.environ.setdefault('ACT2_ENV', 'production')
+
+import dashboard_server  # noqa: E402  (需在设置环境变量之后导入)
+
+app = dashboard_server.app
+server = dashboard_server.server